@@ -0,0 +1,101 @@
+"""
+Shared corpus loader for the question generators
+Loads the extracted slides, slide categories, image map and the existing
+question database once and keeps them as a pickle snapshot
+(extracted_content/.corpus.pickle). Later runs load the snapshot in a few
+milliseconds instead of re-reading and re-parsing the JSON files.
+
+The snapshot is rebuilt automatically when any source file's size or
+mtime changes, or when the corpus layout (SCHEMA) changes.
+
+Usage:
+    from corpus import load_corpus
+    corpus = load_corpus()
+    corpus.slides, corpus.categories, corpus.image_map, corpus.existing_questions
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+base_dir = Path(__file__).parent
+SNAPSHOT_PATH = base_dir / 'extracted_content' / '.corpus.pickle'
+
+# Corpus field -> source file, relative to Textbook_LT/
+SOURCES = {
+    'slides': 'extracted_content/all_slides.json',
+    'categories': 'extracted_content/categorized_slides.json',
+    'image_map': 'extracted_content/image_map.json',
+    'existing_data': '../nephro_questions_bilingual.json',
+}
+
+# Bump when the fields or their layout change; the schema hash invalidates old snapshots
+SCHEMA_VERSION = 1
+SCHEMA = hashlib.sha256(json.dumps([SCHEMA_VERSION, sorted(SOURCES),
+                                    ['slides_by_number', 'existing_questions']]).encode('utf-8')).hexdigest()
+
+class Corpus:
+    """Everything the generators read, plus lookups built once"""
+
+    def __init__(self, slides, categories, image_map, existing_data):
+        self.slides = slides
+        self.categories = categories
+        self.image_map = image_map
+        self.existing_data = existing_data
+        self.existing_questions = existing_data.get('questions', [])
+        self.slides_by_number = {slide['slide_number']: slide for slide in slides}
+
+    def slide(self, number):
+        """Slide dict by 1-based slide number, or None"""
+        return self.slides_by_number.get(number)
+
+def source_fingerprint():
+    """Size and mtime of every source file (None for missing files)"""
+    fingerprint = {}
+    for name, relative in SOURCES.items():
+        try:
+            st = os.stat(base_dir / relative)
+        except FileNotFoundError:
+            fingerprint[name] = None
+        else:
+            fingerprint[name] = (st.st_size, st.st_mtime_ns)
+    return fingerprint
+
+def build_corpus():
+    """Read every source file; a missing file gives an empty value"""
+    values = {}
+    for name, relative in SOURCES.items():
+        path = base_dir / relative
+        if not path.exists():
+            print(f"[WARN] Corpus source not found: {relative}")
+            values[name] = [] if name == 'slides' else {}
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            values[name] = json.load(f)
+    return Corpus(**values)
+
+def load_corpus(rebuild=False):
+    """The corpus from the snapshot if it is current, otherwise rebuilt from the sources"""
+    fingerprint = source_fingerprint()
+    header = {'schema': SCHEMA, 'sources': fingerprint}
+
+    if not rebuild:
+        try:
+            with open(SNAPSHOT_PATH, 'rb') as f:
+                # The header is a separate pickle, so a stale snapshot is rejected
+                # without unpickling the corpus itself
+                if pickle.load(f) == header:
+                    return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            pass
+
+    corpus = build_corpus()
+    SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = SNAPSHOT_PATH.with_name(f'{SNAPSHOT_PATH.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(corpus, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, SNAPSHOT_PATH)
+    return corpus
@@ -0,0 +1,195 @@
+"""
+Near-duplicate question detection
+Finds questions whose assertion + reason say nearly the same thing, in
+English or Lithuanian, without comparing every pair:
+
+  1. each question's EN and LT text is folded and cut into character
+     5-gram shingles
+  2. the shingles get a 128-value MinHash signature (one-permutation
+     hashing, so one hash per shingle)
+  3. signatures are split into LSH bands; only questions sharing a band
+     bucket are compared, by exact Jaccard similarity of their shingles
+  4. pairs at or above the threshold are joined into clusters (union-find)
+
+DuplicateIndex keeps the LSH buckets of a bank, so a few new or edited
+questions can be checked against it without looking at the rest.
+
+Usage:
+    python dedup_questions.py [database.json ...] [--threshold 0.7]
+"""
+
+import argparse
+import json
+import zlib
+from collections import defaultdict
+
+from keyword_matcher import fold
+
+SHINGLE_SIZE = 5
+NUM_HASHES = 128
+# 32 bands x 4 rows: the LSH S-curve crosses 50% near (1/32)^(1/4) = 0.42, so pairs at
+# 0.7 share a bucket with probability 1 - (1 - 0.7^4)^32 > 99.9%; the extra candidates
+# below the threshold are dropped by the exact Jaccard check
+BANDS = 32
+ROWS = NUM_HASHES // BANDS
+DEFAULT_THRESHOLD = 0.7
+MAX_HASH = (1 << 32) - 1
+
+def question_text(question, lang):
+    side = question.get(lang, {})
+    return f"{side.get('assertion', '')} {side.get('reason', '')}"
+
+def shingles(question):
+    """Character shingles of the EN and LT assertion + reason, tagged by language"""
+    result = set()
+    for lang in ('en', 'lt'):
+        text = fold(question_text(question, lang)).strip()
+        if len(text) < SHINGLE_SIZE:
+            text = text.ljust(SHINGLE_SIZE)
+        result.update(f'{lang}:{text[start:start + SHINGLE_SIZE]}'
+                      for start in range(len(text) - SHINGLE_SIZE + 1))
+    return result
+
+def minhash(shingle_set):
+    """One-permutation MinHash: the smallest shingle CRC-32 in each of NUM_HASHES bins.
+
+    Empty bins borrow the value of the next non-empty bin (densification)
+    so every position is comparable.
+    """
+    bins = [MAX_HASH] * NUM_HASHES
+    for value in map(zlib.crc32, map(str.encode, shingle_set)):
+        slot = value % NUM_HASHES
+        if value < bins[slot]:
+            bins[slot] = value
+    if all(value == MAX_HASH for value in bins):
+        return tuple(bins)
+    for slot in range(NUM_HASHES):
+        offset = 1
+        while bins[slot] == MAX_HASH:
+            donor = bins[(slot + offset) % NUM_HASHES]
+            if donor != MAX_HASH:
+                bins[slot] = donor ^ offset  # distinguish borrowed values by distance
+                break
+            offset += 1
+    return tuple(bins)
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def band_keys(signature):
+    """LSH bucket keys of a MinHash signature, one per band"""
+    return [(band, signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+class DuplicateIndex:
+    """LSH buckets of the questions added so far, for checking others one at a time"""
+
+    def __init__(self):
+        self.buckets = defaultdict(list)
+        self.shingle_sets = {}
+
+    def add(self, key, question):
+        shingle_set = shingles(question)
+        self.shingle_sets[key] = shingle_set
+        for bucket in band_keys(minhash(shingle_set)):
+            self.buckets[bucket].append(key)
+
+    def query(self, question, threshold=DEFAULT_THRESHOLD):
+        """(key, similarity) of the most similar question added, if at or above the threshold, else None"""
+        shingle_set = shingles(question)
+        candidates = {key for bucket in band_keys(minhash(shingle_set)) for key in self.buckets.get(bucket, ())}
+        best = None
+        for key in sorted(candidates):
+            similarity = jaccard(shingle_set, self.shingle_sets[key])
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (key, round(similarity, 3))
+        return best
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        if parent != item:
+            parent = self.parent[item] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+def find_duplicates(questions, threshold=DEFAULT_THRESHOLD):
+    """Clusters of near-duplicate questions.
+
+    Returns one {'indexes': [...], 'ids': [...], 'pairs': [[id_a, id_b, similarity], ...]}
+    per cluster, where indexes are positions in `questions`, ordered by
+    their first question.
+    """
+    shingle_sets = [shingles(question) for question in questions]
+
+    buckets = defaultdict(list)
+    for index, shingle_set in enumerate(shingle_sets):
+        for bucket in band_keys(minhash(shingle_set)):
+            buckets[bucket].append(index)
+
+    candidates = set()
+    for members in buckets.values():
+        if len(members) > 1:
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    candidates.add((a, b))
+
+    clusters = UnionFind()
+    pairs = {}
+    for a, b in candidates:
+        similarity = jaccard(shingle_sets[a], shingle_sets[b])
+        if similarity >= threshold:
+            clusters.union(a, b)
+            pairs[(a, b)] = round(similarity, 3)
+
+    grouped = defaultdict(list)
+    for index in clusters.parent:
+        grouped[clusters.find(index)].append(index)
+    pairs_by_root = defaultdict(list)
+    for (a, b), similarity in sorted(pairs.items()):
+        pairs_by_root[clusters.find(a)].append([questions[a].get('id'), questions[b].get('id'), similarity])
+
+    return [
+        {'indexes': sorted(members),
+         'ids': [questions[index].get('id') for index in sorted(members)],
+         'pairs': pairs_by_root[root]}
+        for root, members in sorted(grouped.items())
+    ]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find near-duplicate questions')
+    parser.add_argument('databases', nargs='*', default=['../nephro_questions_enhanced.json'],
+                        help='Question files to check together')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Jaccard similarity at which two questions count as duplicates')
+    parser.add_argument('--output', help='Write the clusters to this JSON file')
+    args = parser.parse_args()
+
+    questions = []
+    for path in args.databases:
+        with open(path, 'r', encoding='utf-8') as f:
+            questions.extend(json.load(f)['questions'])
+
+    clusters = find_duplicates(questions, args.threshold)
+    print(f"[OK] {len(questions)} questions, {len(clusters)} near-duplicate clusters "
+          f"(threshold {args.threshold})")
+    for cluster in clusters:
+        print(f"  Cluster {cluster['ids']}:")
+        for index in cluster['indexes']:
+            question = questions[index]
+            print(f"    #{question.get('id')}: {question['en']['assertion'][:70]}")
+        for a, b, similarity in cluster['pairs']:
+            print(f"    #{a} ~ #{b}: {similarity}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(clusters, f, indent=2, ensure_ascii=False)
+        print(f"[OK] Saved: {args.output}")
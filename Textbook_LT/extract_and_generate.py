@@ -1,89 +1,46 @@
 """
 Comprehensive PowerPoint Content Extraction and Question Generation
 Extracts content from 150+ slides and generates bilingual questions
+
+Slide extraction is split into slide ranges that run in a process pool
+(each worker opens both decks itself); results are merged back in slide
+order, so the output is identical to a serial run (--serial).
+
+Extraction is incremental: each slide is fingerprinted from its XML, its
+relationships and the media it uses (read straight from the .pptx zip),
+and only slides whose fingerprint is not in
+extracted_content/.extraction_cache.json are parsed again. The slides
+added, changed or removed since the last run are written to
+extracted_content/changes.json for the question generators. --full
+ignores the cache.
 """
 
 from pptx import Presentation
+import argparse
+import hashlib
 import os
 import json
-from datetime import datetime
+import posixpath
 import re
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 
-print("=" * 70)
-print("NEPHROPATHOLOGY CONTENT EXTRACTION & QUESTION GENERATION")
-print("=" * 70)
-print()
-
-# Create output directories
-os.makedirs('extracted_content', exist_ok=True)
-os.makedirs('extracted_images', exist_ok=True)
-os.makedirs('generated_questions', exist_ok=True)
-
-print("Loading PowerPoint presentations...")
-prs_en = Presentation('SlidesForSelfStudy_Nephropathology_EN_2024.pptx')
-prs_lt = Presentation('SlidesForSelfStudy_Nephropathology_LT_2024.pptx')
-
-print(f"✓ English: {len(prs_en.slides)} slides")
-print(f"✓ Lithuanian: {len(prs_lt.slides)} slides")
-print()
-
-# ============================================================================
-# STAGE 1: EXTRACT ALL SLIDE CONTENT
-# ============================================================================
-
-print("STAGE 1: Extracting slide content...")
-print("-" * 70)
-
-slide_content = []
-total_images = 0
-
-for i, (slide_en, slide_lt) in enumerate(zip(prs_en.slides, prs_lt.slides[:len(prs_en.slides)])):
-    # Extract English text
-    en_text = []
-    for shape in slide_en.shapes:
-        if hasattr(shape, 'text') and shape.text.strip():
-            en_text.append(shape.text.strip())
-
-    # Extract Lithuanian text
-    lt_text = []
-    for shape in slide_lt.shapes:
-        if hasattr(shape, 'text') and shape.text.strip():
-            lt_text.append(shape.text.strip())
-
-    # Count images
-    img_count = sum(1 for shape in slide_en.shapes if hasattr(shape, 'image'))
-    total_images += img_count
-
-    slide_data = {
-        'slide_number': i + 1,
-        'en_text': en_text,
-        'lt_text': lt_text,
-        'image_count': img_count,
-        'has_images': img_count > 0
-    }
-
-    slide_content.append(slide_data)
-
-    if (i + 1) % 25 == 0:
-        print(f"  Processed {i + 1} slides...")
-
-print(f"✓ Extracted content from {len(slide_content)} slides")
-print(f"✓ Found {total_images} images total")
-print()
-
-# Save slide content
-with open('extracted_content/all_slides.json', 'w', encoding='utf-8') as f:
-    json.dump(slide_content, f, indent=2, ensure_ascii=False)
-
-print("✓ Saved: extracted_content/all_slides.json")
-print()
+from extract_images import IMAGE_MAP_PATH, extract_images
+from keyword_matcher import KeywordMatcher
+from text_alignment import align_shapes, aligned_text, shape_record
 
-# ============================================================================
-# STAGE 2: IDENTIFY TEACHING TOPICS
-# ============================================================================
+EN_DECK = 'SlidesForSelfStudy_Nephropathology_EN_2024.pptx'
+LT_DECK = 'SlidesForSelfStudy_Nephropathology_LT_2024.pptx'
+CACHE_PATH = 'extracted_content/.extraction_cache.json'
+CHANGES_PATH = 'extracted_content/changes.json'
+CACHE_VERSION = 2
 
-print("STAGE 2: Identifying teaching topics...")
-print("-" * 70)
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+PRESENTATION_NS = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
 
 # Keywords for different diseases/topics
 disease_keywords = {
@@ -102,99 +59,348 @@ disease_keywords = {
     'AIN': ['interstitial nephritis', 'ain'],
     'LUPUS': ['lupus', 'sle', 'wire loop']
 }
+# Disease keywords match anywhere in a word, like the substring test they replace, so slides
+# keep their categories ('podocyte' still finds 'podocytes', 'sclerosis' 'glomerulosclerosis')
+disease_matcher = KeywordMatcher({disease: [f'*{keyword}*' for keyword in keywords]
+                                  for disease, keywords in disease_keywords.items()})
+
+# Wording that marks a text as a key fact worth a question
+fact_matcher = KeywordMatcher({
+    'fact': ['characteristic*', 'feature*', 'finding*', 'shows', 'presents with']
+})
+
+def rels_path(part):
+    """Zip name of a part's relationships file (ppt/slides/slide1.xml -> ppt/slides/_rels/slide1.xml.rels)"""
+    folder, name = posixpath.split(part)
+    return f'{folder}/_rels/{name}.rels'
+
+def part_targets(deck, part):
+    """Relationship id -> zip name of every internal part that `part` points to"""
+    try:
+        rels = ET.fromstring(deck.read(rels_path(part)))
+    except KeyError:
+        return {}
+    folder = posixpath.dirname(part)
+    return {rel.get('Id'): posixpath.normpath(posixpath.join(folder, rel.get('Target')))
+            for rel in rels.iter(f'{PKG_REL_NS}Relationship') if rel.get('TargetMode') != 'External'}
+
+def slide_fingerprints(path):
+    """SHA-256 per slide, in presentation order.
+
+    Covers the slide's XML and relationships, plus the name, CRC-32 and
+    size of each media file it uses (from the zip directory, so images are
+    not decompressed).
+    """
+    with zipfile.ZipFile(path) as deck:
+        infos = {info.filename: info for info in deck.infolist()}
+        presentation = ET.fromstring(deck.read('ppt/presentation.xml'))
+        targets = part_targets(deck, 'ppt/presentation.xml')
+        fingerprints = []
+        for slide_id in presentation.iter(f'{PRESENTATION_NS}sldId'):
+            part = targets[slide_id.get(f'{REL_NS}id')]
+            digest = hashlib.sha256(deck.read(part))
+            rels = rels_path(part)
+            if rels in infos:
+                digest.update(deck.read(rels))
+            for target in sorted(set(part_targets(deck, part).values())):
+                info = infos.get(target)
+                if info is not None and target.startswith('ppt/media/'):
+                    digest.update(f'{target}:{info.CRC}:{info.file_size}'.encode('utf-8'))
+            fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+def text_shapes(slide):
+    """Alignment records of every shape with text on a slide, in shape order"""
+    return [shape_record(shape) for shape in slide.shapes if hasattr(shape, 'text') and shape.text.strip()]
+
+def extract_slide(slide_en, slide_lt, slide_number):
+    en_shapes = text_shapes(slide_en)
+    lt_shapes = text_shapes(slide_lt)
 
-# Categorize slides by topic
-categorized_slides = {disease: [] for disease in disease_keywords.keys()}
-categorized_slides['OTHER'] = []
-
-for slide in slide_content:
-    all_text = ' '.join(slide['en_text']).lower()
-    categorized = False
-
-    for disease, keywords in disease_keywords.items():
-        if any(keyword in all_text for keyword in keywords):
-            categorized_slides[disease].append(slide['slide_number'])
-            categorized = True
-            break
+    # Count images
+    img_count = sum(1 for shape in slide_en.shapes if hasattr(shape, 'image'))
 
-    if not categorized and slide['en_text']:  # Has content but not categorized
-        categorized_slides['OTHER'].append(slide['slide_number'])
+    return {
+        'slide_number': slide_number,
+        'en_text': [shape['text'] for shape in en_shapes],
+        'lt_text': [shape['text'] for shape in lt_shapes],
+        'image_count': img_count,
+        'has_images': img_count > 0,
+        # [lt_text index or None, confidence] for each en_text entry
+        'alignment': align_shapes(en_shapes, lt_shapes)
+    }
 
-# Print categorization
-for disease, slides in categorized_slides.items():
-    if slides:
-        print(f"  {disease}: {len(slides)} slides")
+def extract_range(en_path, lt_path, indexes):
+    """Extract the slides at these 0-based indexes; runs in a worker process"""
+    prs_en = Presentation(en_path)
+    prs_lt = Presentation(lt_path)
+    return [extract_slide(prs_en.slides[i], prs_lt.slides[i], i + 1) for i in indexes]
+
+def split_indexes(indexes, parts):
+    """Split a list of slide indexes into at most `parts` contiguous chunks"""
+    size = max(1, -(-len(indexes) // parts))
+    return [indexes[start:start + size] for start in range(0, len(indexes), size)]
+
+def extract_slides(en_path, lt_path, indexes, workers=1):
+    """Content of the slides at `indexes` (0-based) in both decks, ordered by slide_number.
+
+    workers=1 extracts in this process.
+    """
+    if workers <= 1 or len(indexes) <= 1:
+        return extract_range(en_path, lt_path, indexes)
+
+    # One chunk per worker: every worker has to load both decks, which costs
+    # about as much as walking all their slides
+    chunks = split_indexes(indexes, workers)
+    slide_content = []
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(extract_range, en_path, lt_path, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            slides = future.result()
+            slide_content.extend(slides)
+            done += len(slides)
+            print(f"  Processed {done}/{len(indexes)} slides...")
+    slide_content.sort(key=lambda slide: slide['slide_number'])
+    return slide_content
+
+def load_cache(path):
+    """Cached slides as a list of {'fingerprint', 'slide'} in slide order ([] if unusable)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if cache.get('version') != CACHE_VERSION:
+        return []
+    return cache.get('slides', [])
+
+def save_cache(path, fingerprints, slide_content):
+    entries = [{'fingerprint': fingerprint, 'slide': slide}
+               for fingerprint, slide in zip(fingerprints, slide_content)]
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'slides': entries}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def extract_incremental(en_path, lt_path, workers=1, full=False):
+    """Extract every slide, reusing cached content for slides whose fingerprint is unchanged.
+
+    Returns (slide_content, fingerprints, changes).
+    """
+    en_fingerprints = slide_fingerprints(en_path)
+    lt_fingerprints = slide_fingerprints(lt_path)
+    print(f"✓ English: {len(en_fingerprints)} slides")
+    print(f"✓ Lithuanian: {len(lt_fingerprints)} slides")
+    fingerprints = [hashlib.sha256((en + lt).encode('ascii')).hexdigest()
+                    for en, lt in zip(en_fingerprints, lt_fingerprints)]
+
+    previous = [] if full else load_cache(CACHE_PATH)
+    cached = {entry['fingerprint']: entry['slide'] for entry in previous}
+    stale = [i for i, fingerprint in enumerate(fingerprints) if fingerprint not in cached]
+    print(f"✓ {len(fingerprints) - len(stale)} slides unchanged, {len(stale)} to extract")
+
+    extracted = {slide['slide_number']: slide for slide in extract_slides(en_path, lt_path, stale, workers)}
+    slide_content = []
+    for i, fingerprint in enumerate(fingerprints):
+        if i + 1 in extracted:
+            slide_content.append(extracted[i + 1])
+        else:
+            # The same slide may have moved; renumber the cached copy
+            slide = cached[fingerprint]
+            slide_content.append({'slide_number': i + 1,
+                                  **{key: value for key, value in slide.items() if key != 'slide_number'}})
+
+    old_fingerprints = [entry['fingerprint'] for entry in previous]
+    changes = {
+        'generated': datetime.now().isoformat(),
+        'full_rebuild': full or not previous,
+        'slides': len(fingerprints),
+        'added': list(range(len(old_fingerprints) + 1, len(fingerprints) + 1)),
+        'changed': [i + 1 for i, fingerprint in enumerate(fingerprints[:len(old_fingerprints)])
+                    if fingerprint != old_fingerprints[i]],
+        'removed': list(range(len(fingerprints) + 1, len(old_fingerprints) + 1)),
+        'extracted': [i + 1 for i in stale],
+    }
+    return slide_content, fingerprints, changes
 
-print()
-print("✓ Slides categorized by topic")
-print()
+def categorize_slides(slide_content):
+    """Slide numbers per disease; the first disease whose keyword appears wins"""
+    categorized_slides = {disease: [] for disease in disease_keywords.keys()}
+    categorized_slides['OTHER'] = []
 
-# Save categorization
-with open('extracted_content/slide_categories.json', 'w', encoding='utf-8') as f:
-    json.dump(categorized_slides, f, indent=2)
+    for slide in slide_content:
+        disease = disease_matcher.first(' '.join(slide['en_text']))
 
-print("✓ Saved: extracted_content/slide_categories.json")
-print()
+        if disease:
+            categorized_slides[disease].append(slide['slide_number'])
+        elif slide['en_text']:  # Has content but not categorized
+            categorized_slides['OTHER'].append(slide['slide_number'])
 
-# ============================================================================
-# STAGE 3: EXTRACT KEY FACTS FOR QUESTIONS
-# ============================================================================
+    return categorized_slides
 
-print("STAGE 3: Extracting key facts...")
-print("-" * 70)
+def extract_key_facts(slide_content):
+    key_facts = []
 
-key_facts = []
+    for slide in slide_content:
+        if not slide['en_text'] or len(slide['en_text']) < 2:
+            continue
 
-for slide in slide_content:
-    if not slide['en_text'] or len(slide['en_text']) < 2:
-        continue
+        # Look for bullet points or numbered lists
+        for i, text_en in enumerate(slide['en_text']):
+            # Get the Lithuanian text aligned with it, if any
+            text_lt, _ = aligned_text(slide, i)
+
+            # Skip titles and very short text
+            if len(text_en.split()) < 5:
+                continue
+
+            # Look for characteristic patterns
+            if fact_matcher.first(text_en):
+                key_facts.append({
+                    'slide': slide['slide_number'],
+                    'en': text_en,
+                    'lt': text_lt,
+                    'has_image': slide['has_images']
+                })
 
-    # Look for bullet points or numbered lists
-    for i, text_en in enumerate(slide['en_text']):
-        # Get corresponding Lithuanian text if available
-        text_lt = slide['lt_text'][i] if i < len(slide['lt_text']) else ""
+    return key_facts
 
-        # Skip titles and very short text
-        if len(text_en.split()) < 5:
-            continue
+def main(workers=None, serial=False, full=False, images=True):
+    print("=" * 70)
+    print("NEPHROPATHOLOGY CONTENT EXTRACTION & QUESTION GENERATION")
+    print("=" * 70)
+    print()
 
-        # Look for characteristic patterns
-        if any(word in text_en.lower() for word in ['characteristic', 'feature', 'finding', 'shows', 'presents with']):
-            key_facts.append({
-                'slide': slide['slide_number'],
-                'en': text_en,
-                'lt': text_lt,
-                'has_image': slide['has_images']
-            })
-
-print(f"✓ Extracted {len(key_facts)} key facts")
-print()
-
-# Save key facts
-with open('extracted_content/key_facts.json', 'w', encoding='utf-8') as f:
-    json.dump(key_facts, f, indent=2, ensure_ascii=False)
-
-print("✓ Saved: extracted_content/key_facts.json")
-print()
-
-# ============================================================================
-# SUMMARY
-# ============================================================================
-
-print("=" * 70)
-print("EXTRACTION COMPLETE!")
-print("=" * 70)
-print()
-print("Summary:")
-print(f"  - Slides processed: {len(slide_content)}")
-print(f"  - Images found: {total_images}")
-print(f"  - Key facts: {len(key_facts)}")
-print(f"  - Topics identified: {sum(1 for v in categorized_slides.values() if v)}")
-print()
-print("Output files:")
-print("  ✓ extracted_content/all_slides.json")
-print("  ✓ extracted_content/slide_categories.json")
-print("  ✓ extracted_content/key_facts.json")
-print()
-print("Next: Run image extraction and question generation scripts")
-print("=" * 70)
+    # Create output directories
+    os.makedirs('extracted_content', exist_ok=True)
+    os.makedirs('extracted_images', exist_ok=True)
+    os.makedirs('generated_questions', exist_ok=True)
+
+    # ============================================================================
+    # STAGE 1: EXTRACT ALL SLIDE CONTENT
+    # ============================================================================
+
+    print("STAGE 1: Extracting slide content...")
+    print("-" * 70)
+
+    workers = 1 if serial else (workers or os.cpu_count() or 1)
+    started = time.perf_counter()
+    slide_content, fingerprints, changes = extract_incremental(EN_DECK, LT_DECK, workers=workers, full=full)
+    elapsed = time.perf_counter() - started
+    total_images = sum(slide['image_count'] for slide in slide_content)
+
+    print(f"✓ Extracted content from {len(changes['extracted'])} slides, "
+          f"{len(slide_content) - len(changes['extracted'])} from cache")
+    print(f"✓ Found {total_images} images total")
+    print(f"✓ {len(slide_content) / elapsed:.1f} slides/second "
+          f"({'serial' if workers == 1 else f'{workers} workers'}, {elapsed:.1f}s)")
+    print(f"✓ Changes since last run: {len(changes['added'])} added, "
+          f"{len(changes['changed'])} changed, {len(changes['removed'])} removed")
+    print()
+
+    # Save slide content
+    with open('extracted_content/all_slides.json', 'w', encoding='utf-8') as f:
+        json.dump(slide_content, f, indent=2, ensure_ascii=False)
+
+    save_cache(CACHE_PATH, fingerprints, slide_content)
+    with open(CHANGES_PATH, 'w', encoding='utf-8') as f:
+        json.dump(changes, f, indent=2)
+
+    print("✓ Saved: extracted_content/all_slides.json")
+    print("✓ Saved: extracted_content/changes.json")
+    print()
+
+    # ============================================================================
+    # STAGE 2: IDENTIFY TEACHING TOPICS
+    # ============================================================================
+
+    print("STAGE 2: Identifying teaching topics...")
+    print("-" * 70)
+
+    # Categorize slides by topic
+    categorized_slides = categorize_slides(slide_content)
+
+    # Print categorization
+    for disease, slides in categorized_slides.items():
+        if slides:
+            print(f"  {disease}: {len(slides)} slides")
+
+    print()
+    print("✓ Slides categorized by topic")
+    print()
+
+    # Save categorization
+    with open('extracted_content/slide_categories.json', 'w', encoding='utf-8') as f:
+        json.dump(categorized_slides, f, indent=2)
+
+    print("✓ Saved: extracted_content/slide_categories.json")
+    print()
+
+    # ============================================================================
+    # STAGE 3: EXTRACT KEY FACTS FOR QUESTIONS
+    # ============================================================================
+
+    print("STAGE 3: Extracting key facts...")
+    print("-" * 70)
+
+    key_facts = extract_key_facts(slide_content)
+
+    print(f"✓ Extracted {len(key_facts)} key facts")
+    print()
+
+    # Save key facts
+    with open('extracted_content/key_facts.json', 'w', encoding='utf-8') as f:
+        json.dump(key_facts, f, indent=2, ensure_ascii=False)
+
+    print("✓ Saved: extracted_content/key_facts.json")
+    print()
+
+    # ============================================================================
+    # STAGE 4: EXTRACT IMAGES
+    # ============================================================================
+
+    if images:
+        print("STAGE 4: Extracting images...")
+        print("-" * 70)
+
+        image_summary = extract_images(EN_DECK, workers=workers)
+
+        print(f"✓ Extracted {image_summary['images']} images ({image_summary['unique_images']} unique)")
+        print(f"✓ Duplicates linked instead of copied: {image_summary['duplicate_bytes'] / 1e6:.1f} MB")
+        print(f"✓ Saved: {IMAGE_MAP_PATH}")
+        print()
+
+    # ============================================================================
+    # SUMMARY
+    # ============================================================================
+
+    print("=" * 70)
+    print("EXTRACTION COMPLETE!")
+    print("=" * 70)
+    print()
+    print("Summary:")
+    print(f"  - Slides processed: {len(slide_content)}")
+    print(f"  - Images found: {total_images}")
+    print(f"  - Key facts: {len(key_facts)}")
+    print(f"  - Topics identified: {sum(1 for v in categorized_slides.values() if v)}")
+    print()
+    print("Output files:")
+    print("  ✓ extracted_content/all_slides.json")
+    print("  ✓ extracted_content/slide_categories.json")
+    print("  ✓ extracted_content/key_facts.json")
+    print("  ✓ extracted_content/changes.json")
+    if images:
+        print(f"  ✓ {IMAGE_MAP_PATH} (+ extracted_images/)")
+    print()
+    print("Next: Run question generation scripts")
+    print("=" * 70)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extract slide content from the EN/LT decks')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--serial', action='store_true', help='Extract in this process, one slide at a time')
+    parser.add_argument('--full', action='store_true', help='Ignore the extraction cache and re-extract every slide')
+    parser.add_argument('--no-images', action='store_true', help='Skip image extraction (STAGE 4)')
+    args = parser.parse_args()
+    main(workers=args.workers, serial=args.serial, full=args.full, images=not args.no_images)
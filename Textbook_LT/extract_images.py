@@ -0,0 +1,195 @@
+"""
+Slide image extraction
+Copies every picture on the English deck's slides to
+extracted_images/<TOPIC>/<TOPIC>_slide<N>_img<K>.<ext> and writes
+extracted_content/image_map.json ({"<slide>": {"topic": ..., "images": [...]}}),
+the format generate_questions*.py read.
+
+Pictures are streamed from the .pptx zip straight to disk in a thread
+pool and hashed while they are written; a picture whose bytes were already
+written (the same media reused on several slides, or an identical copy)
+becomes a hardlink to the first file instead of another copy.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+DECK = 'SlidesForSelfStudy_Nephropathology_EN_2024.pptx'
+IMAGES_DIR = 'extracted_images'
+IMAGE_MAP_PATH = 'extracted_content/image_map.json'
+CATEGORY_FILES = ('extracted_content/slide_categories.json', 'extracted_content/categorized_slides.json')
+DEFAULT_TOPIC = 'OTHER'
+CHUNK_SIZE = 1024 * 1024
+
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+PRESENTATION_NS = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+DRAWING_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+
+def part_targets(deck, part):
+    """Relationship id -> zip name of every internal part that `part` points to"""
+    folder, name = posixpath.split(part)
+    try:
+        rels = ET.fromstring(deck.read(f'{folder}/_rels/{name}.rels'))
+    except KeyError:
+        return {}
+    return {rel.get('Id'): posixpath.normpath(posixpath.join(folder, rel.get('Target')))
+            for rel in rels.iter(f'{PKG_REL_NS}Relationship') if rel.get('TargetMode') != 'External'}
+
+def slide_pictures(deck):
+    """Media zip names of the pictures on each slide, in presentation and shape order"""
+    presentation = ET.fromstring(deck.read('ppt/presentation.xml'))
+    slide_parts = part_targets(deck, 'ppt/presentation.xml')
+    pictures = []
+    for slide_id in presentation.iter(f'{PRESENTATION_NS}sldId'):
+        part = slide_parts[slide_id.get(f'{REL_NS}id')]
+        targets = part_targets(deck, part)
+        slide = ET.fromstring(deck.read(part))
+        media = []
+        for pic in slide.iter(f'{PRESENTATION_NS}pic'):
+            blip = pic.find(f'.//{DRAWING_NS}blip')
+            target = targets.get(blip.get(f'{REL_NS}embed')) if blip is not None else None
+            if target:
+                media.append(target)
+        pictures.append(media)
+    return pictures
+
+def load_topics(slide_total):
+    """Topic (category name) of each slide number, from the STAGE 2 categories file"""
+    topics = {}
+    for path in CATEGORY_FILES:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            categories = json.load(f)
+        for topic, slides in categories.items():
+            for slide in slides:
+                # slide_categories.json lists numbers, categorized_slides.json dicts
+                number = slide['slide'] if isinstance(slide, dict) else slide
+                topics.setdefault(number, topic)
+        break
+    return {number: topics.get(number, DEFAULT_TOPIC) for number in range(1, slide_total + 1)}
+
+def image_name(topic, slide_number, index, member):
+    extension = posixpath.splitext(member)[1].lower()
+    if extension == '.jpeg':
+        extension = '.jpg'
+    return f'{topic}_slide{slide_number}_img{index}{extension}'
+
+def link_or_copy(source, dest):
+    if dest.exists():
+        dest.unlink()
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
+
+class ImageExtractor:
+    """Streams picture blobs out of one deck; one ZipFile handle per worker thread"""
+
+    def __init__(self, deck_path):
+        self.deck_path = deck_path
+        self._local = threading.local()
+
+    def _deck(self):
+        deck = getattr(self._local, 'deck', None)
+        if deck is None:
+            deck = self._local.deck = zipfile.ZipFile(self.deck_path)
+        return deck
+
+    def write(self, member, dest):
+        """Copy one zip member to `dest` in chunks; returns (sha256, size)"""
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = dest.with_name(dest.name + '.tmp')
+        with self._deck().open(member) as source, open(tmp_path, 'wb') as out:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, dest)
+        return digest.hexdigest(), size
+
+def extract_images(deck_path=DECK, workers=8):
+    """Extract all slide pictures and write image_map.json; returns a summary dict"""
+    with zipfile.ZipFile(deck_path) as deck:
+        pictures = slide_pictures(deck)
+    topics = load_topics(len(pictures))
+
+    # Every picture occurrence, and the first occurrence of each media part
+    occurrences = []
+    first_dest = {}
+    image_map = {}
+    for slide_number, media in enumerate(pictures, 1):
+        topic = topics[slide_number]
+        names = []
+        for index, member in enumerate(media, 1):
+            name = image_name(topic, slide_number, index, member)
+            dest = Path(IMAGES_DIR) / topic / name
+            occurrences.append((member, dest))
+            first_dest.setdefault(member, dest)
+            names.append(name)
+        if names:
+            image_map[str(slide_number)] = {'topic': topic, 'images': names}
+
+    for _, dest in occurrences:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+
+    extractor = ImageExtractor(deck_path)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {member: pool.submit(extractor.write, member, dest) for member, dest in first_dest.items()}
+        written = {member: future.result() for member, future in futures.items()}
+
+    # Identical bytes under different media parts: keep the first file, link the rest
+    canonical = {}
+    for member, dest in first_dest.items():
+        sha256, size = written[member]
+        if sha256 in canonical:
+            link_or_copy(canonical[sha256], dest)
+        else:
+            canonical[sha256] = dest
+
+    # The same media part on several slides
+    for member, dest in occurrences:
+        if dest != first_dest[member]:
+            link_or_copy(first_dest[member], dest)
+
+    with open(IMAGE_MAP_PATH, 'w', encoding='utf-8') as f:
+        json.dump(image_map, f, indent=2, ensure_ascii=False)
+
+    total_bytes = sum(written[member][1] for member, _ in occurrences)
+    unique_bytes = sum(size for sha256, size in set(written.values()))
+    return {
+        'images': len(occurrences),
+        'slides_with_images': len(image_map),
+        'unique_images': len(canonical),
+        'unique_bytes': unique_bytes,
+        'duplicate_bytes': total_bytes - unique_bytes,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extract slide images and write image_map.json')
+    parser.add_argument('--deck', default=DECK, help='Deck to extract from')
+    parser.add_argument('--workers', type=int, default=8, help='Parallel extraction threads')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("IMAGE EXTRACTION")
+    print("=" * 70)
+    started = time.perf_counter()
+    summary = extract_images(args.deck, workers=args.workers)
+    print(f"✓ {summary['images']} images on {summary['slides_with_images']} slides "
+          f"({summary['unique_images']} unique) in {time.perf_counter() - started:.1f}s")
+    print(f"✓ Duplicates linked instead of copied: {summary['duplicate_bytes'] / 1e6:.1f} MB")
+    print(f"✓ Saved: {IMAGE_MAP_PATH}")
+    print("=" * 70)
@@ -7,27 +7,23 @@ import json
 import random
 from datetime import datetime
 
+from corpus import load_corpus
+from keyword_matcher import KeywordMatcher
+from text_alignment import aligned_text
+
 print("=" * 70)
 print("QUESTION GENERATION - Starting...")
 print("=" * 70)
 print()
 
-# Load extracted content
-print("Loading extracted content...")
-with open('extracted_content/all_slides.json', 'r', encoding='utf-8') as f:
-    slides = json.load(f)
-
-with open('extracted_content/categorized_slides.json', 'r', encoding='utf-8') as f:
-    categories = json.load(f)
-
-with open('extracted_content/image_map.json', 'r', encoding='utf-8') as f:
-    image_map = json.load(f)
-
-# Load existing questions as templates
-print("Loading existing questions...")
-with open('../nephro_questions_bilingual.json', 'r', encoding='utf-8') as f:
-    existing_data = json.load(f)
-    existing_questions = existing_data['questions']
+# Load extracted content and existing questions (used as templates)
+print("Loading extracted content and existing questions...")
+corpus = load_corpus()
+slides = corpus.slides
+categories = corpus.categories
+image_map = corpus.image_map
+existing_data = corpus.existing_data
+existing_questions = corpus.existing_questions
 
 print(f"Existing questions: {len(existing_questions)}")
 print()
@@ -56,29 +52,26 @@ templates = {
     }
 }
 
-# Content patterns to extract from slides
+# Content patterns to extract from slides, checked in this order
+fact_matcher = KeywordMatcher({
+    # Characteristic findings
+    'finding': ['characteristic*', 'typical*', 'pathognomonic', 'diagnostic*'],
+    # Mechanisms
+    'mechanism': ['because', 'due to', 'caused by', 'results from'],
+    # Microscopy descriptions
+    'microscopy': ['light microscopy', 'electron microscopy', 'immunofluorescence'],
+    # Clinical features
+    'clinical': ['presents with', 'clinical*', 'syndrome*', 'proteinuria'],
+})
+
 def extract_key_facts(slide_content):
     """Extract potential question content from slide text"""
     facts = []
 
     for text in slide_content.get('en_text', []):
-        text_lower = text.lower()
-
-        # Look for characteristic findings
-        if any(word in text_lower for word in ['characteristic', 'typical', 'pathognomonic', 'diagnostic']):
-            facts.append(('finding', text))
-
-        # Look for mechanisms
-        elif any(word in text_lower for word in ['because', 'due to', 'caused by', 'results from']):
-            facts.append(('mechanism', text))
-
-        # Look for microscopy descriptions
-        elif any(word in text_lower for word in ['light microscopy', 'electron microscopy', 'immunofluorescence']):
-            facts.append(('microscopy', text))
-
-        # Look for clinical features
-        elif any(word in text_lower for word in ['presents with', 'clinical', 'syndrome', 'proteinuria']):
-            facts.append(('clinical', text))
+        kind = fact_matcher.first(text)
+        if kind:
+            facts.append((kind, text))
 
     return facts
 
@@ -116,7 +109,9 @@ for topic, config in topics_to_generate.items():
 
     for slide_info in topic_slides[:target_count]:  # Limit per topic
         slide_num = slide_info['slide']
-        slide_data = slides[slide_num - 1]
+        slide_data = corpus.slide(slide_num)
+        if slide_data is None:
+            continue
 
         en_text = slide_data.get('en_text', [])
         lt_text = slide_data.get('lt_text', [])
@@ -134,11 +129,16 @@ for topic, config in topics_to_generate.items():
 
         # Create assertion from first substantive text
         assertion_en = en_text[0] if en_text else ""
-        assertion_lt = lt_text[0] if lt_text else ""
+        assertion_lt, _ = aligned_text(slide_data, 0)
+        if not assertion_lt:  # No Lithuanian shape matches it
+            continue
 
         # Create reason from second text or elaborate on first
         reason_en = en_text[1] if len(en_text) > 1 else f"This finding is characteristic of the disease pathophysiology"
-        reason_lt = lt_text[1] if len(lt_text) > 1 else f"Šis radinys būdingas ligos patofizologijai"
+        reason_lt = aligned_text(slide_data, 1)[0] if len(en_text) > 1 else ""
+        if not reason_lt:
+            reason_en = f"This finding is characteristic of the disease pathophysiology"
+            reason_lt = f"Šis radinys būdingas ligos patofizologijai"
 
         # Skip if text is too short or too long
         if len(assertion_en.split()) < 5 or len(assertion_en.split()) > 50:
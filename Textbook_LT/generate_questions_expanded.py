@@ -6,19 +6,18 @@ Comprehensive coverage across all nephropathology topics
 import json
 from datetime import datetime
 
+from corpus import load_corpus
+
 print("=" * 70)
 print("EXPANDED QUESTION GENERATION - Target 50+ Questions")
 print("=" * 70)
 print()
 
-# Load extracted content
-with open('extracted_content/image_map.json', 'r', encoding='utf-8') as f:
-    image_map = json.load(f)
-
-# Load existing questions
-with open('../nephro_questions_bilingual.json', 'r', encoding='utf-8') as f:
-    existing_data = json.load(f)
-    existing_questions = existing_data['questions']
+# Load extracted content and existing questions
+corpus = load_corpus()
+image_map = corpus.image_map
+existing_data = corpus.existing_data
+existing_questions = corpus.existing_questions
 
 question_id = len(existing_questions) + 1
 
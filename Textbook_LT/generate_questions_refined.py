@@ -11,26 +11,22 @@ import json
 import re
 from datetime import datetime
 
+from corpus import load_corpus
+from text_alignment import aligned_text
+
 print("=" * 70)
 print("REFINED QUESTION GENERATION")
 print("=" * 70)
 print()
 
-# Load extracted content
+# Load extracted content and existing questions
 print("Loading extracted content...")
-with open('extracted_content/all_slides.json', 'r', encoding='utf-8') as f:
-    slides = json.load(f)
-
-with open('extracted_content/categorized_slides.json', 'r', encoding='utf-8') as f:
-    categories = json.load(f)
-
-with open('extracted_content/image_map.json', 'r', encoding='utf-8') as f:
-    image_map = json.load(f)
-
-# Load existing questions
-with open('../nephro_questions_bilingual.json', 'r', encoding='utf-8') as f:
-    existing_data = json.load(f)
-    existing_questions = existing_data['questions']
+corpus = load_corpus()
+slides = corpus.slides
+categories = corpus.categories
+image_map = corpus.image_map
+existing_data = corpus.existing_data
+existing_questions = corpus.existing_questions
 
 print(f"Slides: {len(slides)}")
 print(f"Existing questions: {len(existing_questions)}")
@@ -127,13 +123,10 @@ curated_questions = []
 question_id = len(existing_questions) + 1
 
 # Helper function to find corresponding text in paired language
-def find_best_match(en_texts, lt_texts, en_index):
-    """Try to find matching LT text for EN text at index"""
-    if en_index < len(lt_texts):
-        return lt_texts[en_index]
-    elif len(lt_texts) > 0:
-        return lt_texts[0]
-    return ""
+def find_best_match(slide, en_index):
+    """LT text aligned with the slide's EN text at index ("" if none matches)"""
+    lt_text, _ = aligned_text(slide, en_index)
+    return lt_text
 
 print("Creating high-quality question templates...")
 print("-" * 70)
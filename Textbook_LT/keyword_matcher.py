@@ -0,0 +1,105 @@
+"""
+Multi-keyword matcher for slide text
+Compiles labelled keyword lists (diseases, fact types, ...) into one
+Aho-Corasick automaton, so each text is scanned once however many
+keywords there are, and every label that matched comes back with a score.
+
+Text and keywords are lowercased and diacritic-folded (ą->a, č->c, ė->e,
+š->s, ...), so Lithuanian text matches keywords typed with or without
+diacritics. Keywords match whole words; a trailing '*' makes a keyword a
+prefix ('glomerul*' matches 'glomerulus' and 'glomerular'), a leading one
+a suffix ('*sclerosis' matches 'glomerulosclerosis'), and both a plain
+substring.
+"""
+
+import re
+import unicodedata
+from collections import deque
+
+def fold(text):
+    """Lowercase, strip diacritics and collapse whitespace"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', stripped)
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over {label: [keywords]}.
+
+    Labels keep the order they were given in; it breaks ties in best().
+    """
+
+    def __init__(self, groups):
+        self.labels = list(groups)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # state -> [(label, keyword, length, prefix, suffix)]
+        for label, keywords in groups.items():
+            for keyword in keywords:
+                self._add(label, keyword)
+        self._build_failure_links()
+
+    def scan(self, text):
+        """Yield (label, keyword, start) for every match in `text`, in text order"""
+        folded = fold(text)
+        state = 0
+        for end, ch in enumerate(folded, 1):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for label, keyword, length, prefix, suffix in self._out[state]:
+                start = end - length
+                if not suffix and start > 0 and folded[start - 1].isalnum():
+                    continue
+                if not prefix and end < len(folded) and folded[end].isalnum():
+                    continue
+                yield label, keyword, start
+
+    def scores(self, text):
+        """{label: number of keyword hits} for the labels found in `text`, in label order"""
+        counts = {}
+        for label, _, _ in self.scan(text):
+            counts[label] = counts.get(label, 0) + 1
+        return {label: counts[label] for label in self.labels if label in counts}
+
+    def best(self, text):
+        """Label with the most hits (earliest label on a tie), or None"""
+        scores = self.scores(text)
+        if not scores:
+            return None
+        return max(scores, key=lambda label: (scores[label], -self.labels.index(label)))
+
+    def first(self, text):
+        """First label, in label order, with any hit, or None"""
+        return next(iter(self.scores(text)), None)
+
+    def _add(self, label, keyword):
+        prefix = keyword.endswith('*')
+        suffix = keyword.startswith('*')
+        folded = fold(keyword.strip('*')).strip()
+        if not folded:
+            return
+        state = 0
+        for ch in folded:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((label, keyword, len(folded), prefix, suffix))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                if self._fail[nxt] == nxt:
+                    self._fail[nxt] = 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
@@ -1,125 +1,513 @@
 """
 Merge expanded questions with existing database
 Create final enhanced question database with 120 total questions
+
+New questions that nearly duplicate an existing question, or an earlier
+new one, are dropped (see dedup_questions.py); --keep-duplicates only
+reports them. Only questions that are new or changed since the last merge
+are checked, against an LSH index of the questions kept; earlier
+decisions stand for the rest (--full checks everything again).
+
+The merge is incremental and keeps question IDs stable:
+  - every source question has an identity (manual questions: their ID in
+    nephro_questions_bilingual.json; generated ones: source slide + folded
+    EN assertion), and generated_questions/question_ids.json maps each
+    identity to the ID it was given. IDs come from that allocator, never
+    from the generators (which all number from len(existing) + 1), and
+    are never reused. They are given out in source order before
+    near-duplicates are dropped, so a dropped question keeps its ID
+    reserved instead of shifting the ones after it.
+  - a generated question whose assertion was edited (a new identity) takes
+    over the ID of the question it replaces: a question from the same
+    slide that is gone from the source and is still a near-duplicate of it.
+  - the same file records per-field fingerprints of each question as last
+    merged (source and bank copy), so the enhanced bank is only touched
+    where a source question was inserted, changed or removed, and only in
+    the fields that changed. The changeset is written to
+    generated_questions/merge_changeset.json.
+  - a field edited in the enhanced bank (e.g. an image set in the image
+    management portal) keeps the edit; if the same field changed in the
+    source too, that is a conflict and the bank copy wins unless
+    --prefer-source is given.
+  - when neither source file changed since the last merge, nothing is
+    read or written (--full forces a merge).
 """
 
+import argparse
+import hashlib
 import json
+import os
+import shutil
+from collections import defaultdict
 from datetime import datetime
 
-print("=" * 70)
-print("MERGING QUESTIONS INTO FINAL DATABASE")
-print("=" * 70)
-print()
+from dedup_questions import DEFAULT_THRESHOLD, DuplicateIndex
+from keyword_matcher import fold
+
+EXISTING_PATH = '../nephro_questions_bilingual.json'
+NEW_PATH = 'generated_questions/expanded_questions.json'
+OUTPUT_PATH = '../nephro_questions_enhanced.json'
+BACKUP_PATH = '../nephro_questions_bilingual_backup.json'
+DUPLICATES_PATH = 'generated_questions/duplicate_clusters.json'
+IDS_PATH = 'generated_questions/question_ids.json'
+STATE_PATH = 'generated_questions/.merge_state.json'
+CHANGESET_PATH = 'generated_questions/merge_changeset.json'
+IDS_VERSION = 1
+
+def load_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def write_json_atomic(path, data, indent=2):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def file_stats(paths):
+    stats = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            stats[path] = None
+        else:
+            stats[path] = [st.st_size, st.st_mtime_ns]
+    return stats
+
+def identity(question, manual):
+    """Key that stays the same across generator runs"""
+    if manual:
+        return f"manual:{question['id']}"
+    assertion = hashlib.sha256(fold(question['en']['assertion']).strip().encode('utf-8')).hexdigest()[:16]
+    return f"slide:{question.get('source_slide', '')}:{assertion}"
+
+def field_values(question):
+    """{field: value} with the en/lt blocks split per field ('en.assertion', ...), without the ID"""
+    fields = {}
+    for key, value in question.items():
+        if key == 'id':
+            continue
+        if key in ('en', 'lt') and isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                fields[f'{key}.{sub_key}'] = sub_value
+        else:
+            fields[key] = value
+    return fields
+
+def fingerprint(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+
+def field_fingerprints(question):
+    return {field: fingerprint(value) for field, value in field_values(question).items()}
+
+def set_field(question, field, value):
+    """Set (or with value None, remove) one field of `question` in place"""
+    target = question
+    if '.' in field:
+        lang, field = field.split('.', 1)
+        target = question.setdefault(lang, {})
+    if value is None:
+        target.pop(field, None)
+    else:
+        target[field] = value
+
+class IdAllocator:
+    """identity -> question ID, persisted in IDS_PATH together with the
+    field fingerprints of every question as it was last merged"""
+
+    def __init__(self, path=IDS_PATH):
+        self.path = path
+        data = load_json(path, {})
+        if data.get('version') != IDS_VERSION:
+            data = {}
+        self.next_id = data.get('next_id', 1)
+        self.ids = data.get('ids', {})
+        self.merged = {int(qid): fingerprints for qid, fingerprints in data.get('merged', {}).items()}
+        # Questions left out as near-duplicates: source fingerprints and the question they duplicate
+        self.dropped = {int(qid): entry for qid, entry in data.get('dropped', {}).items()}
+        self.taken = set(self.ids.values())
+
+    def reserve(self, question_ids):
+        """Keep the allocator above IDs it did not hand out (manual questions)"""
+        if question_ids:
+            self.next_id = max(self.next_id, max(question_ids) + 1)
+
+    def assign(self, key, preferred=None):
+        """ID for `key`; returns (id, conflict) where conflict is set when
+        `preferred` was already given to another identity"""
+        if key in self.ids:
+            return self.ids[key], None
+        conflict = None
+        if preferred is not None and preferred not in self.taken:
+            qid = preferred
+        else:
+            if preferred is not None:
+                conflict = f"ID {preferred} already belongs to another question"
+            qid = self.next_id
+        self.next_id = max(self.next_id, qid + 1)
+        self.ids[key] = qid
+        self.taken.add(qid)
+        return qid, conflict
+
+    def rename(self, old_key, key):
+        """Give the ID of `old_key` to `key` (the same question with an edited assertion)"""
+        self.ids[key] = self.ids.pop(old_key)
+        return self.ids[key]
+
+    def save(self):
+        write_json_atomic(self.path, {
+            'version': IDS_VERSION,
+            'next_id': self.next_id,
+            'ids': self.ids,
+            'merged': {str(qid): fingerprints for qid, fingerprints in sorted(self.merged.items())},
+            'dropped': {str(qid): entry for qid, entry in sorted(self.dropped.items())},
+        })
+
+def slide_of(key):
+    """Source slide of a generated question's identity ('slide:<n>:<hash>')"""
+    return key.split(':')[1] if key.startswith('slide:') else None
+
+def incoming_questions(existing_questions, new_questions, bank, allocator, keep_duplicates, threshold, full=False):
+    """Source questions with their allocated IDs, minus near-duplicates.
+
+    Returns (questions, clusters, dropped, conflicts).
+    """
+    allocator.reserve([q['id'] for q in existing_questions])
+    combined = [(question, True) for question in existing_questions] + [(question, False) for question in new_questions]
+
+    # Identities, then IDs in source order, before anything is dropped
+    conflicts = []
+    entries = []
+    seen = set()
+    for question, manual in combined:
+        key = identity(question, manual)
+        if key in seen:
+            conflicts.append({'id': question.get('id'), 'reason': f"same identity as an earlier question ({key}), skipped"})
+            continue
+        seen.add(key)
+        entries.append((question, manual, key))
+
+    # An edited assertion gives a new identity: hand it the ID of the question it
+    # replaces (same slide, gone from the source, still similar to its bank copy)
+    bank_by_id = {q['id']: q for q in bank}
+    orphans = defaultdict(list)
+    for key, qid in allocator.ids.items():
+        if slide_of(key) is not None and key not in seen and qid in bank_by_id:
+            orphans[slide_of(key)].append(key)
+    for question, manual, key in entries:
+        if manual or key in allocator.ids or not orphans.get(slide_of(key)):
+            continue
+        index = DuplicateIndex()
+        for old_key in orphans[slide_of(key)]:
+            index.add(old_key, bank_by_id[allocator.ids[old_key]])
+        match = index.query(question, threshold)
+        if match:
+            qid = allocator.rename(match[0], key)
+            orphans[slide_of(key)].remove(match[0])
+            print(f"  #{qid}: assertion edited on slide {slide_of(key)} (similarity {match[1]:.2f}), ID kept")
+
+    questions = []
+    for question, manual, key in entries:
+        qid, conflict = allocator.assign(key, question['id'] if manual else None)
+        if conflict:
+            conflicts.append({'id': qid, 'reason': f"manual question {question['id']}: {conflict}, assigned {qid}"})
+        questions.append({**question, 'id': qid})
+
+    # Near-duplicates: decisions for unchanged questions stand; new and changed
+    # ones are checked against the index of the questions kept so far
+    print("Checking for near-duplicate questions...")
+    source_fps = {q['id']: field_fingerprints(q) for q in questions}
+    manual_ids = {q['id'] for q, (_, manual, _) in zip(questions, entries) if manual}
+
+    def unchanged(qid, record):
+        return not full and record is not None and record.get('source') == source_fps[qid]
+
+    kept_before = {qid for qid in source_fps if unchanged(qid, allocator.merged.get(qid))}
+    dropped_before = {qid: entry for qid, entry in allocator.dropped.items()
+                      if qid in source_fps and unchanged(qid, entry) and entry['duplicate_of'] in kept_before}
+    index = DuplicateIndex()
+    for question in questions:
+        if question['id'] in kept_before or question['id'] in manual_ids:
+            index.add(question['id'], question)
+    drops = {}
+    checked = 0
+    for question in questions:
+        qid = question['id']
+        if qid in dropped_before:
+            drops[qid] = dropped_before[qid]
+            continue
+        if qid in kept_before or qid in manual_ids:
+            continue
+        checked += 1
+        match = index.query(question, threshold)
+        if match:
+            drops[qid] = {'source': source_fps[qid], 'duplicate_of': match[0], 'similarity': match[1]}
+        if not match or keep_duplicates:
+            index.add(qid, question)
+    print(f"Checked {checked} new or changed questions")
 
-# Load existing questions
-print("Loading existing questions...")
-with open('../nephro_questions_bilingual.json', 'r', encoding='utf-8') as f:
-    existing_data = json.load(f)
+    clusters = [{'ids': [entry['duplicate_of'], qid], 'pairs': [[entry['duplicate_of'], qid, entry['similarity']]]}
+                for qid, entry in sorted(drops.items())]
+    for cluster in clusters:
+        a, b, similarity = cluster['pairs'][0]
+        print(f"  #{b} ~ #{a} {similarity:.2f}" + ("" if keep_duplicates else f" -> dropped {b}"))
+    write_json_atomic(DUPLICATES_PATH, clusters)
+    print(f"Near-duplicates: {len(clusters)} (saved: {DUPLICATES_PATH})")
+    if keep_duplicates:
+        drops = {}
+    elif drops:
+        print(f"Dropped near-duplicates: {len(drops)}")
+    allocator.dropped = drops
+    return [q for q in questions if q['id'] not in drops], clusters, len(drops), conflicts
+
+def merge_fields(bank_question, question, source_fps, bank_fps, last, prefer_source):
+    """Three-way merge of one question, field by field.
+
+    Fields whose source changed since the last merge are taken from the
+    source, unless the bank copy of that field was edited too (a conflict:
+    the bank wins without --prefer-source). Returns (question, conflicts).
+    """
+    result = json.loads(json.dumps(bank_question))
+    source_fields = field_values(question)
+    conflicts = []
+    for field in list(source_fps) + [f for f in last['source'] if f not in source_fps]:
+        if source_fps.get(field) == last['source'].get(field):
+            continue
+        bank_edited = bank_fps.get(field) != last['bank'].get(field)
+        if bank_edited and bank_fps.get(field) != source_fps.get(field) and not prefer_source:
+            conflicts.append(field)
+            continue
+        set_field(result, field, source_fields.get(field))
+    return result, conflicts
+
+def compute_changeset(bank, incoming, allocator, prefer_source):
+    """Inserts, updates and deletes that bring `bank` in line with `incoming`.
+
+    allocator.merged holds the field fingerprints of each question's source
+    and bank copy as last merged. A question whose source fingerprints are
+    unchanged is skipped without looking at the bank copy; changed ones are
+    merged field by field (merge_fields). Returns (changes, merged) with
+    the fingerprints to record.
+    """
+    bank_index = {q['id']: index for index, q in enumerate(bank)}
+    changes = {'inserted': [], 'updated': [], 'deleted': [], 'conflicts': [], 'unchanged': 0}
+    merged = {}
+    for question in incoming:
+        qid = question['id']
+        source_fps = field_fingerprints(question)
+        if qid not in bank_index:
+            changes['inserted'].append(question)
+            merged[qid] = {'source': source_fps, 'bank': source_fps}
+            continue
+        last = allocator.merged.get(qid)
+        if last and last['source'] == source_fps:
+            changes['unchanged'] += 1
+            merged[qid] = last
+            continue
+        bank_question = bank[bank_index[qid]]
+        bank_fps = field_fingerprints(bank_question)
+        if bank_fps == source_fps or (last is None and not prefer_source):
+            # Identical, or merged before this ledger existed: the bank copy is the baseline
+            changes['unchanged'] += 1
+            merged[qid] = {'source': source_fps, 'bank': bank_fps}
+            continue
+        result, conflicts = merge_fields(bank_question, question, source_fps, bank_fps,
+                                         last or {'source': {}, 'bank': {}}, prefer_source)
+        if conflicts:
+            changes['conflicts'].append({'id': qid, 'reason': f"edited in the bank and in the source, bank kept: {', '.join(conflicts)}"})
+        if result != bank_question:
+            changes['updated'].append(result)
+        else:
+            changes['unchanged'] += 1
+        merged[qid] = {'source': source_fps, 'bank': field_fingerprints(result)}
+
+    # Only questions a merge put in the bank go away with their source
+    incoming_ids = {q['id'] for q in incoming}
+    for qid, last in allocator.merged.items():
+        if qid in incoming_ids or qid not in bank_index:
+            continue
+        if prefer_source or field_fingerprints(bank[bank_index[qid]]) == last['bank']:
+            changes['deleted'].append(qid)
+        else:
+            changes['conflicts'].append({'id': qid, 'reason': 'removed from the source but edited in the bank, bank kept'})
+    return changes, merged
+
+def apply_changeset(bank, changes):
+    deleted = set(changes['deleted'])
+    updated = {q['id']: q for q in changes['updated']}
+    result = [updated.get(q['id'], q) for q in bank if q['id'] not in deleted]
+    return result + changes['inserted']
+
+def print_statistics(all_questions, disease_translations):
+    print("Statistics by disease:")
+    disease_counts = {}
+    for q in all_questions:
+        disease_id = q.get('disease_id', 'UNKNOWN')
+        disease_counts[disease_id] = disease_counts.get(disease_id, 0) + 1
+
+    for disease_id in sorted(disease_counts.keys()):
+        disease_name_en = disease_translations.get(disease_id, {}).get('en', disease_id)
+        count = disease_counts[disease_id]
+        print(f"  {disease_name_en}: {count}")
+
+    print()
+    print(f"Questions with images: {sum(1 for q in all_questions if 'image' in q)}")
+    print()
+
+    # Difficulty distribution
+    difficulty_counts = {}
+    for q in all_questions:
+        diff = q.get('difficulty', 'medium')
+        difficulty_counts[diff] = difficulty_counts.get(diff, 0) + 1
+
+    print("Difficulty distribution:")
+    for diff in ['easy', 'medium', 'hard']:
+        count = difficulty_counts.get(diff, 0)
+        percentage = round(count / len(all_questions) * 100) if all_questions else 0
+        print(f"  {diff.capitalize()}: {count} ({percentage}%)")
+
+    print()
+
+def main(full=False, keep_duplicates=False, threshold=DEFAULT_THRESHOLD, prefer_source=False):
+    print("=" * 70)
+    print("MERGING QUESTIONS INTO FINAL DATABASE")
+    print("=" * 70)
+    print()
+
+    stats = file_stats([EXISTING_PATH, NEW_PATH, OUTPUT_PATH, IDS_PATH])
+    state = load_json(STATE_PATH, {})
+    if not full and state.get('stats') == stats and stats[OUTPUT_PATH] is not None:
+        print("Sources unchanged since the last merge, nothing to do (--full to merge anyway)")
+        print("=" * 70)
+        return
+
+    # Load existing questions
+    print("Loading existing questions...")
+    existing_data = load_json(EXISTING_PATH)
     existing_questions = existing_data['questions']
     existing_translations = existing_data.get('interface_translations', {})
     disease_translations = existing_data.get('disease_translations', {})
+    print(f"Existing questions: {len(existing_questions)}")
 
-print(f"Existing questions: {len(existing_questions)}")
-
-# Load new expanded questions
-print("Loading new expanded questions...")
-with open('generated_questions/expanded_questions.json', 'r', encoding='utf-8') as f:
-    new_data = json.load(f)
-    new_questions = new_data['questions']
-
-print(f"New questions: {len(new_questions)}")
-print()
-
-# Combine questions
-all_questions = existing_questions + new_questions
-print(f"Total questions: {len(all_questions)}")
-print()
-
-# Create statistics
-print("Statistics by disease:")
-disease_counts = {}
-for q in all_questions:
-    disease_id = q.get('disease_id', 'UNKNOWN')
-    disease_counts[disease_id] = disease_counts.get(disease_id, 0) + 1
-
-for disease_id in sorted(disease_counts.keys()):
-    disease_name_en = disease_translations.get(disease_id, {}).get('en', disease_id)
-    count = disease_counts[disease_id]
-    print(f"  {disease_name_en}: {count}")
-
-print()
-print(f"Questions with images: {sum(1 for q in all_questions if 'image' in q)}")
-print()
-
-# Difficulty distribution
-difficulty_counts = {}
-for q in all_questions:
-    diff = q.get('difficulty', 'medium')
-    difficulty_counts[diff] = difficulty_counts.get(diff, 0) + 1
-
-print("Difficulty distribution:")
-for diff in ['easy', 'medium', 'hard']:
-    count = difficulty_counts.get(diff, 0)
-    percentage = round(count / len(all_questions) * 100)
-    print(f"  {diff.capitalize()}: {count} ({percentage}%)")
-
-print()
-
-# Create merged database
-merged_data = {
-    'metadata': {
-        'title': 'Nephropathology Assessment - Enhanced Bilingual (EN/LT)',
-        'languages': ['en', 'lt'],
-        'total_questions': len(all_questions),
-        'created': existing_data['metadata']['created'],
-        'updated': datetime.now().isoformat(),
-        'version': '4.0-enhanced-with-images',
-        'translation_method': 'Google Translate with medical terminology preservation + manual editing',
-        'enhancement_source': 'SlidesForSelfStudy_Nephropathology 2024',
-        'questions_with_images': sum(1 for q in all_questions if 'image' in q),
-        'generation_methods': [
-            'Original manual creation (68 questions)',
-            'PowerPoint extraction and curation (52 questions)'
-        ]
-    },
-    'interface_translations': existing_translations,
-    'disease_translations': disease_translations,
-    'questions': all_questions
-}
-
-# Save merged database
-output_path = '../nephro_questions_enhanced.json'
-with open(output_path, 'w', encoding='utf-8') as f:
-    json.dump(merged_data, f, indent=2, ensure_ascii=False)
-
-print(f"Saved enhanced database: {output_path}")
-print()
-
-# Create backup of original
-import shutil
-backup_path = '../nephro_questions_bilingual_backup.json'
-shutil.copy('../nephro_questions_bilingual.json', backup_path)
-print(f"Created backup: {backup_path}")
-print()
-
-print("=" * 70)
-print("MERGE COMPLETE!")
-print("=" * 70)
-print()
-print("Summary:")
-print(f"  Original questions: {len(existing_questions)}")
-print(f"  New questions: {len(new_questions)}")
-print(f"  Total questions: {len(all_questions)}")
-print(f"  Questions with images: {sum(1 for q in all_questions if 'image' in q)}")
-print()
-print("Files created:")
-print(f"  - {output_path}")
-print(f"  - {backup_path}")
-print()
-print("Next steps:")
-print("  1. Review: nephro_questions_enhanced.json")
-print("  2. Test with instructor portal")
-print("  3. Test with student portal")
-print("  4. Update portals to display images")
-print()
-print("=" * 70)
+    # Load new expanded questions
+    print("Loading new expanded questions...")
+    new_questions = load_json(NEW_PATH)['questions']
+    print(f"New questions: {len(new_questions)}")
+    print()
+
+    bank_data = load_json(OUTPUT_PATH, {})
+    bank = bank_data.get('questions', [])
+
+    allocator = IdAllocator()
+    incoming, clusters, dropped, id_conflicts = incoming_questions(
+        existing_questions, new_questions, bank, allocator, keep_duplicates, threshold, full)
+    print()
+    changes, merged = compute_changeset(bank, incoming, allocator, prefer_source)
+    changes['conflicts'] = id_conflicts + changes['conflicts']
+
+    print(f"Changeset: {len(changes['inserted'])} inserted, {len(changes['updated'])} updated, "
+          f"{len(changes['deleted'])} deleted, {changes['unchanged']} unchanged")
+    for conflict in changes['conflicts']:
+        print(f"  [CONFLICT] #{conflict['id']}: {conflict['reason']}")
+    print()
+
+    allocator.merged = merged
+    all_questions = apply_changeset(bank, changes)
+    changed = changes['inserted'] or changes['updated'] or changes['deleted'] or not bank_data
+    if changed:
+        print(f"Total questions: {len(all_questions)}")
+        print()
+        print_statistics(all_questions, disease_translations)
+
+        manual_ids = {qid for key, qid in allocator.ids.items() if key.startswith('manual:')}
+        generated = sum(1 for q in all_questions if q['id'] not in manual_ids)
+        merged_data = {
+            'metadata': {
+                'title': 'Nephropathology Assessment - Enhanced Bilingual (EN/LT)',
+                'languages': ['en', 'lt'],
+                'total_questions': len(all_questions),
+                'created': existing_data['metadata']['created'],
+                'updated': datetime.now().isoformat(),
+                'version': '4.0-enhanced-with-images',
+                'translation_method': 'Google Translate with medical terminology preservation + manual editing',
+                'enhancement_source': 'SlidesForSelfStudy_Nephropathology 2024',
+                'questions_with_images': sum(1 for q in all_questions if 'image' in q),
+                'near_duplicates_removed': dropped,
+                'generation_methods': [
+                    f'Original manual creation ({len(all_questions) - generated} questions)',
+                    f'PowerPoint extraction and curation ({generated} questions)'
+                ]
+            },
+            'interface_translations': existing_translations,
+            'disease_translations': disease_translations,
+            'questions': all_questions
+        }
+
+        # Save merged database
+        write_json_atomic(OUTPUT_PATH, merged_data)
+        print(f"Saved enhanced database: {OUTPUT_PATH}")
+        print()
+
+        # Create backup of original
+        shutil.copy(EXISTING_PATH, BACKUP_PATH)
+        print(f"Created backup: {BACKUP_PATH}")
+        print()
+    else:
+        print("Enhanced database already up to date")
+        print()
+
+    allocator.save()
+    write_json_atomic(CHANGESET_PATH, {
+        'merged': datetime.now().isoformat(),
+        'inserted': [q['id'] for q in changes['inserted']],
+        'updated': [q['id'] for q in changes['updated']],
+        'deleted': changes['deleted'],
+        'conflicts': changes['conflicts'],
+        'unchanged': changes['unchanged'],
+    })
+    write_json_atomic(STATE_PATH, {'stats': file_stats([EXISTING_PATH, NEW_PATH, OUTPUT_PATH, IDS_PATH])})
+
+    print("=" * 70)
+    print("MERGE COMPLETE!")
+    print("=" * 70)
+    print()
+    print("Summary:")
+    print(f"  Original questions: {len(existing_questions)}")
+    print(f"  New questions: {len(new_questions)}")
+    print(f"  Near-duplicates dropped: {dropped}")
+    print(f"  Inserted / updated / deleted: {len(changes['inserted'])} / {len(changes['updated'])} / {len(changes['deleted'])}")
+    print(f"  Conflicts: {len(changes['conflicts'])}")
+    print(f"  Total questions: {len(all_questions)}")
+    print(f"  Questions with images: {sum(1 for q in all_questions if 'image' in q)}")
+    print()
+    print("Files created:")
+    if changed:
+        print(f"  - {OUTPUT_PATH}")
+        print(f"  - {BACKUP_PATH}")
+    print(f"  - {IDS_PATH}")
+    print(f"  - {CHANGESET_PATH}")
+    print()
+    print("Next steps:")
+    print("  1. Review: nephro_questions_enhanced.json")
+    print("  2. Test with instructor portal")
+    print("  3. Test with student portal")
+    print("  4. Update portals to display images")
+    print()
+    print("=" * 70)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Merge expanded questions into the enhanced database')
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help='Report near-duplicate questions but keep them all')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Similarity at which two questions count as near-duplicates')
+    parser.add_argument('--full', action='store_true',
+                        help='Merge even if the source files look unchanged')
+    parser.add_argument('--prefer-source', action='store_true',
+                        help='On a conflict, overwrite the bank edit with the changed source question')
+    args = parser.parse_args()
+    main(full=args.full, keep_duplicates=args.keep_duplicates, threshold=args.threshold,
+         prefer_source=args.prefer_source)
@@ -0,0 +1,167 @@
+"""
+EN/LT slide text alignment
+Pairs the text shapes of an English slide with those of the same
+Lithuanian slide instead of trusting that both decks list their shapes in
+the same order.
+
+Each EN/LT pair of shapes gets a score from 0 to 1 built from:
+  - structure: same shape id, same placeholder (title, body, ...)
+  - geometry: overlap of the two shapes' boxes on the slide
+  - length ratio: a translation is about as long as its source
+  - anchors: numbers, stains and acronyms (IgG, C3, 40x, FSGS) survive translation
+Pairs that agree on structure are taken first; the remaining shapes are
+aligned in reading order by dynamic programming, which allows skipped
+shapes on either side. The score of a pair is its confidence.
+"""
+
+import math
+import re
+
+# Feature weights; structure is a bonus on top of the weighted mean
+GEOMETRY_WEIGHT = 0.45
+LENGTH_WEIGHT = 0.25
+ANCHOR_WEIGHT = 0.30
+SAME_SHAPE_BONUS = 0.15
+SAME_PLACEHOLDER_BONUS = 0.15
+# LT text runs slightly longer than the EN source
+EXPECTED_LENGTH_RATIO = 1.05
+# Pairs scoring below this are left unmatched
+MIN_CONFIDENCE = 0.35
+# Structural pairs must still look plausible
+STRUCTURAL_MIN_SCORE = 0.5
+
+ANCHOR_PATTERN = re.compile(r'[\w-]*\d[\w-]*|\b[A-Z][A-Za-z]?[A-Z]+\w*')
+
+def shape_record(shape):
+    """What the aligner needs to know about one text shape"""
+    placeholder = None
+    if shape.is_placeholder:
+        placeholder = shape.placeholder_format.idx
+    box = None
+    if None not in (shape.left, shape.top, shape.width, shape.height):
+        box = (int(shape.left), int(shape.top), int(shape.width), int(shape.height))
+    return {
+        'text': shape.text.strip(),
+        'shape_id': shape.shape_id,
+        'placeholder': placeholder,
+        'box': box,
+    }
+
+def anchors(text):
+    return {token.lower() for token in ANCHOR_PATTERN.findall(text)}
+
+def box_overlap(a, b):
+    """Intersection over union of two (left, top, width, height) boxes"""
+    left = max(a[0], b[0])
+    top = max(a[1], b[1])
+    right = min(a[0] + a[2], b[0] + b[2])
+    bottom = min(a[1] + a[3], b[1] + b[3])
+    if right <= left or bottom <= top:
+        return 0.0
+    intersection = (right - left) * (bottom - top)
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / union if union > 0 else 0.0
+
+def pair_score(en, lt, en_anchors, lt_anchors):
+    """Confidence (0..1) that `lt` is the translation of `en`"""
+    features = []
+    if en['box'] and lt['box']:
+        features.append((GEOMETRY_WEIGHT, box_overlap(en['box'], lt['box'])))
+
+    en_len = max(len(en['text']), 1)
+    lt_len = max(len(lt['text']), 1)
+    ratio = lt_len / (en_len * EXPECTED_LENGTH_RATIO)
+    features.append((LENGTH_WEIGHT, math.exp(-abs(math.log(ratio)) * 1.5)))
+
+    if en_anchors or lt_anchors:
+        shared = len(en_anchors & lt_anchors) / len(en_anchors | lt_anchors)
+        features.append((ANCHOR_WEIGHT, shared))
+
+    score = sum(weight * value for weight, value in features) / sum(weight for weight, _ in features)
+    if en['shape_id'] is not None and en['shape_id'] == lt['shape_id']:
+        score += SAME_SHAPE_BONUS
+    if en['placeholder'] is not None and en['placeholder'] == lt['placeholder']:
+        score += SAME_PLACEHOLDER_BONUS
+    return min(score, 1.0)
+
+def align_shapes(en_shapes, lt_shapes):
+    """Pair EN shapes with LT shapes.
+
+    Returns one [lt_index, confidence] per EN shape; lt_index is None
+    (confidence 0.0) when no LT shape fits.
+    """
+    en_anchors = [anchors(shape['text']) for shape in en_shapes]
+    lt_anchors = [anchors(shape['text']) for shape in lt_shapes]
+    scores = [[pair_score(en, lt, en_anchors[i], lt_anchors[j]) for j, lt in enumerate(lt_shapes)]
+              for i, en in enumerate(en_shapes)]
+
+    result = [[None, 0.0] for _ in en_shapes]
+    used_lt = set()
+
+    # Structural pass: same shape id or placeholder, best scores first
+    structural = []
+    for i, en in enumerate(en_shapes):
+        for j, lt in enumerate(lt_shapes):
+            same_id = en['shape_id'] is not None and en['shape_id'] == lt['shape_id']
+            same_placeholder = en['placeholder'] is not None and en['placeholder'] == lt['placeholder']
+            if (same_id or same_placeholder) and scores[i][j] >= STRUCTURAL_MIN_SCORE:
+                structural.append((scores[i][j], i, j))
+    for score, i, j in sorted(structural, key=lambda item: (-item[0], item[1], item[2])):
+        if result[i][0] is None and j not in used_lt:
+            result[i] = [j, round(score, 3)]
+            used_lt.add(j)
+
+    # Dynamic programming over what is left, keeping reading order
+    rest_en = [i for i in range(len(en_shapes)) if result[i][0] is None]
+    rest_lt = [j for j in range(len(lt_shapes)) if j not in used_lt]
+    for i, j in monotone_alignment(rest_en, rest_lt, scores):
+        result[i] = [j, round(scores[i][j], 3)]
+    return result
+
+def monotone_alignment(en_indexes, lt_indexes, scores):
+    """Order-preserving pairs of en_indexes/lt_indexes maximizing the summed score.
+
+    Either side may skip a shape; only pairs scoring at least
+    MIN_CONFIDENCE are ever used.
+    """
+    n, m = len(en_indexes), len(lt_indexes)
+    if not n or not m:
+        return []
+    best = [[0.0] * (m + 1) for _ in range(n + 1)]
+    for a in range(n - 1, -1, -1):
+        row, below = best[a], best[a + 1]
+        for b in range(m - 1, -1, -1):
+            value = max(below[b], row[b + 1])
+            score = scores[en_indexes[a]][lt_indexes[b]]
+            if score >= MIN_CONFIDENCE:
+                value = max(value, score + below[b + 1])
+            row[b] = value
+
+    pairs = []
+    a = b = 0
+    while a < n and b < m:
+        score = scores[en_indexes[a]][lt_indexes[b]]
+        if score >= MIN_CONFIDENCE and best[a][b] == score + best[a + 1][b + 1]:
+            pairs.append((en_indexes[a], lt_indexes[b]))
+            a += 1
+            b += 1
+        elif best[a][b] == best[a + 1][b]:
+            a += 1
+        else:
+            b += 1
+    return pairs
+
+def aligned_text(slide, en_index):
+    """(LT text, confidence) paired with slide['en_text'][en_index].
+
+    Falls back to the LT text at the same position (confidence None) for
+    slides extracted before alignment existed.
+    """
+    alignment = slide.get('alignment')
+    if alignment is None:
+        lt_text = slide['lt_text'][en_index] if en_index < len(slide['lt_text']) else ""
+        return lt_text, None
+    lt_index, confidence = alignment[en_index]
+    if lt_index is None:
+        return "", confidence
+    return slide['lt_text'][lt_index], confidence
@@ -0,0 +1,219 @@
+"""
+Responsive image builder
+Makes smaller copies of every image in question_images/ (several widths,
+in AVIF, WebP and JPEG) under question_images/derived/, and writes
+image_derivatives.json, which the portals use to build srcset lists so a
+gallery card or phone screen downloads a ~30 KB image instead of the
+full-resolution slide.
+
+Derived files are named by the source's SHA-256 plus a hash of the width
+and encoder settings (<sha>-<width>.<12 hex>.<ext>), so only new or changed
+images are rebuilt, files left over from old versions are removed, and the
+proxy serves them as immutable (static_assets.HASHED_NAME).
+
+Requires Pillow (pip install Pillow). AVIF is written when Pillow supports
+it (Pillow 11.2+, or the pillow-avif-plugin package); otherwise WebP and
+JPEG only.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # reported by build()
+    Image = None
+
+try:
+    import pillow_avif  # noqa: F401  (registers the AVIF plugin on older Pillow)
+except ImportError:
+    pass
+
+current_dir = Path(__file__).resolve().parent
+DEFAULT_SOURCE = current_dir / 'question_images'
+DEFAULT_MANIFEST = current_dir / 'image_derivatives.json'
+DERIVED_DIRNAME = 'derived'
+WIDTHS = (320, 640, 1280)
+SOURCE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+# Format name for Pillow, file extension, MIME type, save options
+FORMATS = {
+    'avif': ('AVIF', '.avif', 'image/avif', {'quality': 50, 'speed': 6}),
+    'webp': ('WEBP', '.webp', 'image/webp', {'quality': 75, 'method': 6}),
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+MANIFEST_VERSION = 1
+
+def file_sha256(path):
+    """SHA-256 of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def site_path(path):
+    """Path as the portals request it (relative to the portal folder)"""
+    return path.relative_to(current_dir).as_posix() if path.is_relative_to(current_dir) else path.as_posix()
+
+def available_formats():
+    """Output formats this Pillow build can write, best first"""
+    Image.init()
+    return [name for name, (pil_format, _, _, _) in FORMATS.items() if pil_format in Image.SAVE]
+
+def target_widths(width):
+    """Widths to build for an image `width` pixels wide (never upscaled)"""
+    widths = [w for w in WIDTHS if w < width]
+    return widths + [width] if len(widths) < len(WIDTHS) else widths
+
+def output_name(sha256, width, name):
+    """File name of one variant; the content hash covers everything that decides its bytes"""
+    pil_format, extension, _, options = FORMATS[name]
+    settings = json.dumps([sha256, width, pil_format, options], sort_keys=True).encode('utf-8')
+    return f'{sha256[:16]}-{width}.{hashlib.sha256(settings).hexdigest()[:12]}{extension}'
+
+def build_one(source, sha256, derived_dir, formats):
+    """Build every width/format of one source image (runs in a worker process).
+
+    Returns the manifest entry for the image.
+    """
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        width, height = image.size
+
+        variants = {name: [] for name in formats}
+        for target in target_widths(width):
+            resized = image if target == width else image.resize(
+                (target, max(1, round(height * target / width))), Image.LANCZOS)
+            for name in formats:
+                pil_format, _, _, options = FORMATS[name]
+                frame = resized.convert('RGB') if pil_format == 'JPEG' else resized
+                out = derived_dir / output_name(sha256, target, name)
+                if not out.exists():
+                    # Per-process name: a concurrent run may be writing the same output
+                    tmp_path = out.with_name(f'{out.name}.{os.getpid()}.tmp')
+                    frame.save(tmp_path, pil_format, **options)
+                    os.replace(tmp_path, out)
+                variants[name].append({
+                    'width': target,
+                    'src': site_path(out),
+                    'bytes': out.stat().st_size,
+                })
+    return {'sha256': sha256, 'width': width, 'height': height, 'variants': variants}
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('images', {})
+
+def is_current(entry, st, formats):
+    """True if the manifest entry still describes this file and its outputs exist"""
+    if not entry or entry.get('size') != st.st_size or entry.get('mtime_ns') != st.st_mtime_ns:
+        return False
+    if sorted(entry['variants']) != sorted(formats):
+        return False
+    return all((current_dir / item['src']).exists()
+               for items in entry['variants'].values() for item in items)
+
+def build(source_dir, manifest_path, workers=None, force=False):
+    print("=" * 70)
+    print("RESPONSIVE IMAGES - Build thumbnails and modern formats")
+    print("=" * 70)
+    print()
+
+    if Image is None:
+        print("[ERROR] Pillow is not installed. Run: pip install Pillow")
+        return False
+
+    formats = available_formats()
+    derived_dir = source_dir / DERIVED_DIRNAME
+    derived_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {} if force else load_manifest(manifest_path)
+    print(f"[OK] Formats: {', '.join(formats)}; widths: {', '.join(map(str, WIDTHS))}")
+
+    sources = sorted(path for path in source_dir.iterdir()
+                     if path.is_file() and path.suffix.lower() in SOURCE_EXTENSIONS)
+    images = {}
+    jobs = {}
+    for path in sources:
+        key = site_path(path)
+        st = path.stat()
+        entry = manifest.get(key)
+        if is_current(entry, st, formats):
+            images[key] = entry
+        else:
+            jobs[key] = (path, st)
+    print(f"[OK] {len(sources)} images, {len(jobs)} new or changed")
+    print()
+
+    started = time.perf_counter()
+    errors = 0
+    # Copies of the same image share their outputs: build each content once
+    by_sha256 = {}
+    for key, (path, st) in jobs.items():
+        by_sha256.setdefault(file_sha256(path), []).append((key, path, st))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(build_one, copies[0][1], sha256, derived_dir, formats): copies
+                   for sha256, copies in by_sha256.items()}
+        for future in as_completed(futures):
+            copies = futures[future]
+            try:
+                built = future.result()
+            except Exception as e:
+                for key, _, _ in copies:
+                    print(f"[ERROR] {key}: {e}")
+                errors += len(copies)
+                continue
+            for key, _, st in copies:
+                entry = dict(built, size=st.st_size, mtime_ns=st.st_mtime_ns)
+                images[key] = entry
+                smallest = min(item['bytes'] for items in entry['variants'].values() for item in items)
+                print(f"[OK] {key}: {entry['width']}x{entry['height']}, {st.st_size // 1024} KB -> "
+                      f"from {smallest // 1024} KB")
+
+    # Remove outputs of images that were deleted or changed
+    keep = {item['src'] for entry in images.values() for items in entry['variants'].values() for item in items}
+    removed = 0
+    for path in derived_dir.iterdir():
+        # Temp files may belong to a build still running
+        if site_path(path) not in keep and path.suffix != '.tmp':
+            path.unlink()
+            removed += 1
+
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'formats': formats, 'widths': list(WIDTHS),
+                   'images': dict(sorted(images.items()))}, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+    original_bytes = sum(entry['size'] for entry in images.values())
+    smallest_bytes = sum(min(item['bytes'] for item in entry['variants'][formats[0]]) for entry in images.values())
+    print()
+    print("=" * 70)
+    print(f"[OK] Built {len(jobs) - errors} images in {time.perf_counter() - started:.1f}s "
+          f"({errors} errors, {removed} stale files removed)")
+    print(f"[OK] Originals: {original_bytes / 1e6:.1f} MB; smallest {formats[0]}: {smallest_bytes / 1e6:.1f} MB")
+    print(f"[OK] Manifest: {manifest_path.name}")
+    print("=" * 70)
+    return errors == 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build responsive image variants for the portals')
+    parser.add_argument('--source', default=str(DEFAULT_SOURCE), help='Folder with the question images')
+    parser.add_argument('--manifest', default=str(DEFAULT_MANIFEST), help='Manifest file to write')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Ignore the manifest and rebuild everything')
+    args = parser.parse_args()
+    ok = build(Path(args.source).resolve(), Path(args.manifest), workers=args.workers, force=args.force)
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,176 @@
+"""
+Question bank shards for the student portal
+Splits nephro_questions_enhanced.json into:
+
+  question_shards/index.json
+      interface and disease translations, plus one column per field for
+      every question (id, disease_id, difficulty, active, priority, image,
+      answer, shard): all the portal needs to filter, order and score.
+  question_shards/<lang>/<disease>-<n>.<hash>.json
+      the assertion / reason / explanation text of up to SHARD_SIZE
+      questions of one disease in one language, named by a hash of their
+      content.
+
+The portal loads the index first and fetches a shard only when it shows
+one of its questions, so the first question needs a few KB instead of the
+whole bank. Shard names change whenever their content does, so they can
+be cached forever (the proxy sends them as immutable); the index is
+revalidated on every load.
+
+The index records the bank it was built from: source_digest (the proxy's
+ETag for the bank JSON) and journal_seq (the last compacted instructor
+edit, see question_journal.py). The portal falls back to the full JSON
+when either no longer matches what the server has, so shards that were
+not rebuilt after an edit are never shown.
+
+Usage:
+    python build_question_shards.py [--source nephro_questions_enhanced.json] [--store nephro_questions.db]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+current_dir = Path(__file__).resolve().parent
+DEFAULT_SOURCE = current_dir / 'nephro_questions_enhanced.json'
+DEFAULT_OUTPUT = current_dir / 'question_shards'
+INDEX_NAME = 'index.json'
+INDEX_VERSION = 2
+LANGUAGES = ('en', 'lt')
+SHARD_SIZE = 50
+# Index columns, in the order they are written
+COLUMNS = ('id', 'disease_id', 'difficulty', 'active', 'priority', 'image', 'answer', 'shard')
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.json$')
+
+def compact(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+def shard_name(value):
+    """Disease id as a safe file name part"""
+    return re.sub(r'[^A-Za-z0-9_-]', '_', str(value)) or 'NONE'
+
+def plan_shards(questions):
+    """[(disease_id, part, [questions])] with at most SHARD_SIZE questions each, in bank order"""
+    by_disease = {}
+    for question in questions:
+        by_disease.setdefault(question.get('disease_id') or '', []).append(question)
+    shards = []
+    for disease_id, members in by_disease.items():
+        for part, start in enumerate(range(0, len(members), SHARD_SIZE)):
+            shards.append((disease_id, part, members[start:start + SHARD_SIZE]))
+    return shards
+
+def write_if_changed(path, data):
+    """Write bytes atomically unless the file already holds them; returns True if written"""
+    if path.exists() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    return True
+
+def source_digest(data):
+    """Hash of the bank file's bytes, as static_assets.py puts it in the ETag"""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+def build(document, output_dir, source_name, bank_digest=None):
+    questions = document.get('questions', [])
+    settings = document.get('question_settings', {})
+    shards = plan_shards(questions)
+
+    files = {lang: [] for lang in LANGUAGES}
+    shard_of = {}
+    written = 0
+    for number, (disease_id, part, members) in enumerate(shards):
+        for question in members:
+            shard_of[question['id']] = number
+        for lang in LANGUAGES:
+            content = {str(q['id']): q.get(lang, {}) for q in members}
+            data = compact(content).encode('utf-8')
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            path = output_dir / lang / f'{shard_name(disease_id)}-{part}.{digest}.json'
+            written += write_if_changed(path, data)
+            files[lang].append(path.relative_to(output_dir.parent).as_posix())
+
+    columns = {name: [] for name in COLUMNS}
+    for question in questions:
+        setting = settings.get(str(question['id']), {})
+        columns['id'].append(question['id'])
+        columns['disease_id'].append(question.get('disease_id'))
+        columns['difficulty'].append(question.get('difficulty'))
+        columns['active'].append(setting.get('active', True) is not False)
+        columns['priority'].append(setting.get('priority', 'none'))
+        columns['image'].append(question.get('image'))
+        columns['answer'].append(question.get('en', {}).get('answer'))
+        columns['shard'].append(shard_of[question['id']])
+
+    index = {
+        'version': INDEX_VERSION,
+        'source': source_name,
+        'source_digest': bank_digest,
+        'journal_seq': document.get('metadata', {}).get('journal_seq', 0),
+        'total_questions': len(questions),
+        'interface_translations': document.get('interface_translations', {}),
+        'disease_translations': document.get('disease_translations', {}),
+        'shards': files,
+        'questions': columns,
+    }
+    write_if_changed(output_dir / INDEX_NAME, compact(index).encode('utf-8'))
+
+    # Shards of earlier builds are no longer referenced by the index
+    keep = {output_dir.parent / name for names in files.values() for name in names}
+    removed = 0
+    for lang in LANGUAGES:
+        folder = output_dir / lang
+        if not folder.is_dir():
+            continue
+        for path in folder.iterdir():
+            if HASHED_NAME.search(path.name) and path not in keep:
+                path.unlink()
+                removed += 1
+
+    return {
+        'questions': len(questions),
+        'shards': len(shards) * len(LANGUAGES),
+        'written': written,
+        'removed': removed,
+        'index_bytes': (output_dir / INDEX_NAME).stat().st_size,
+        'largest_shard_bytes': max(((output_dir.parent / name).stat().st_size
+                                    for names in files.values() for name in names), default=0),
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Split the question bank into an index and lazily loaded shards')
+    parser.add_argument('--source', default=str(DEFAULT_SOURCE), help='Question database JSON')
+    parser.add_argument('--store', help='Read from this SQLite question bank (question_store.py) instead')
+    parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help='Shard folder')
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("QUESTION SHARDS - Index and per-language, per-disease content")
+    print("=" * 70)
+
+    digest = None
+    if args.store:
+        from question_store import QuestionStore
+        store = QuestionStore(args.store)
+        document = store.export_json()
+        store.close()
+        source_name = Path(args.store).name
+    else:
+        data = Path(args.source).read_bytes()
+        document = json.loads(data.decode('utf-8'))
+        source_name = Path(args.source).name
+        digest = source_digest(data)
+
+    result = build(document, Path(args.output).resolve(), source_name, digest)
+    print(f"[OK] {result['questions']} questions in {result['shards']} shards "
+          f"({result['written']} written, {result['removed']} stale removed)")
+    print(f"[OK] Index: {result['index_bytes'] / 1024:.1f} KB; largest shard: "
+          f"{result['largest_shard_bytes'] / 1024:.1f} KB")
+    print(f"[OK] Output: {args.output}")
+    print("=" * 70)
@@ -0,0 +1,301 @@
+"""
+Bilingual full-text search index for the question bank
+Builds search_index.json: an inverted index over the EN and LT assertion,
+reason and explanation of every question, ranked with BM25.
+
+Text is lowercased and diacritic-folded (ą->a, č->c, ę/ė->e, į->i, š->s,
+ų/ū->u, ž->z), split into words, stripped of stopwords and lightly stemmed
+by suffix rules, separately for each language. The analyzer rules are
+written into the index itself, so the instructor portal analyzes a query
+exactly as this script analyzed the questions.
+
+A query matches questions that contain every query word (in either
+language); the last word also matches as a prefix while it is being typed.
+Terms are stored sorted, so a prefix is a binary search, and postings
+are delta-encoded [doc, term frequency, ...] lists.
+
+Usage:
+    python build_search_index.py [--source nephro_questions_enhanced.json]
+    python build_search_index.py --query "podocyte effacement"
+"""
+
+import argparse
+import bisect
+import json
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+current_dir = Path(__file__).resolve().parent
+DEFAULT_SOURCE = current_dir / 'nephro_questions_enhanced.json'
+DEFAULT_INDEX = current_dir / 'search_index.json'
+INDEX_VERSION = 1
+FIELDS = ('assertion', 'reason', 'explanation')
+TOKEN_PATTERN = r'[a-z0-9]+'
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Most frequent terms a query prefix expands to
+MAX_PREFIX_TERMS = 64
+
+# Suffix rules are tried longest first; the first that leaves at least
+# min_stem characters is applied. A rule that maps a suffix to itself
+# protects words ending in it (glomerulus, sclerosis).
+ANALYZERS = {
+    'en': {
+        'stopwords': sorted({
+            'a', 'also', 'an', 'and', 'are', 'as', 'at', 'be', 'been', 'both', 'but', 'by', 'can',
+            'due', 'for', 'from', 'has', 'have', 'in', 'into', 'is', 'it', 'its', 'may', 'not', 'of',
+            'on', 'only', 'or', 'so', 'such', 'than', 'that', 'the', 'their', 'then', 'there',
+            'these', 'they', 'this', 'to', 'was', 'were', 'which', 'while', 'with',
+        }),
+        'suffixes': [['sses', 'ss'], ['ies', 'y'], ['ied', 'y'], ['ing', ''], ['ed', ''],
+                     ['ss', 'ss'], ['us', 'us'], ['is', 'is'], ['ly', ''], ['s', ''], ['e', '']],
+        'min_stem': 3,
+    },
+    'lt': {
+        'stopwords': sorted({
+            'abi', 'abu', 'ar', 'arba', 'be', 'bei', 'bet', 'bus', 'buvo', 'dar', 'del', 'gali',
+            'i', 'iki', 'ir', 'is', 'ja', 'jau', 'ji', 'jie', 'jis', 'kad', 'kai', 'kaip', 'kuri',
+            'kurie', 'kuris', 'labai', 'ne', 'nei', 'nes', 'nuo', 'o', 'per', 'po', 'prie', 'su',
+            'ta', 'tai', 'tas', 'taip', 'tik', 'todel', 'yra',
+        }),
+        'suffixes': [[suffix, ''] for suffix in (
+            'iuose', 'uose', 'iams', 'iais', 'ams', 'oms', 'ems', 'ose', 'ese', 'yse', 'uje', 'oje',
+            'eje', 'yje', 'iai', 'ios', 'ius', 'ies', 'ais', 'iu', 'as', 'is', 'ys', 'us', 'os',
+            'es', 'ai', 'ei', 'ui', 'ia', 'io', 'a', 'e', 'i', 'o', 'u', 'y')],
+        'min_stem': 3,
+    },
+}
+LANGUAGES = tuple(ANALYZERS)
+
+def fold(text):
+    """Lowercase and strip diacritics (the portal does the same with normalize('NFKD'))"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+class Analyzer:
+    """Text -> index terms for one language, driven by a rules dict from ANALYZERS"""
+
+    def __init__(self, rules):
+        self.stopwords = set(rules['stopwords'])
+        self.suffixes = sorted(rules['suffixes'], key=lambda rule: -len(rule[0]))
+        self.min_stem = rules['min_stem']
+        self.token_pattern = re.compile(TOKEN_PATTERN)
+
+    def tokens(self, text):
+        return self.token_pattern.findall(fold(text))
+
+    def stem(self, token):
+        for suffix, replacement in self.suffixes:
+            if token.endswith(suffix) and len(token) - len(suffix) + len(replacement) >= self.min_stem:
+                return token[:len(token) - len(suffix)] + replacement
+        return token
+
+    def terms(self, text):
+        return [self.stem(token) for token in self.tokens(text) if token not in self.stopwords]
+
+def build_index(questions):
+    """Index dict for a list of questions (the format written to search_index.json)"""
+    analyzers = {lang: Analyzer(rules) for lang, rules in ANALYZERS.items()}
+    fields = {}
+    for lang, analyzer in analyzers.items():
+        postings = {}
+        lengths = []
+        for doc, question in enumerate(questions):
+            side = question.get(lang) or {}
+            terms = analyzer.terms(' '.join(str(side.get(field) or '') for field in FIELDS))
+            lengths.append(len(terms))
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+        terms = sorted(postings)
+        encoded = []
+        for term in terms:
+            flat = []
+            previous = 0
+            for doc, tf in postings[term]:
+                flat.extend((doc - previous, tf))
+                previous = doc
+            encoded.append(flat)
+        fields[lang] = {'lengths': lengths, 'terms': terms, 'postings': encoded}
+    return {
+        'version': INDEX_VERSION,
+        'token_pattern': TOKEN_PATTERN,
+        'analyzers': ANALYZERS,
+        'bm25': {'k1': BM25_K1, 'b': BM25_B},
+        'ids': [question['id'] for question in questions],
+        'fields': fields,
+    }
+
+class SearchIndex:
+    """Query side of a built index"""
+
+    def __init__(self, data):
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported search index version: {data.get('version')}")
+        self.ids = data['ids']
+        self.k1 = data['bm25']['k1']
+        self.b = data['bm25']['b']
+        self.analyzers = {lang: Analyzer(rules) for lang, rules in data['analyzers'].items()}
+        self.fields = {}
+        for lang, field in data['fields'].items():
+            lengths = field['lengths']
+            self.fields[lang] = {
+                'terms': field['terms'],
+                'postings': field['postings'],
+                'lengths': lengths,
+                'avgdl': (sum(lengths) / len(lengths)) if lengths else 0.0,
+                'decoded': {},
+            }
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def search(self, query, limit=None):
+        """[(question id, score)] for questions matching every word of `query`, best first"""
+        prefix_last = bool(query) and not query[-1].isspace()
+        words = self.analyzers[LANGUAGES[0]].tokens(query)
+        if not words:
+            return []
+        scores = None
+        for position, word in enumerate(words):
+            prefix = prefix_last and position == len(words) - 1
+            word_scores = {}
+            for lang, analyzer in self.analyzers.items():
+                if word in analyzer.stopwords and not prefix:
+                    continue
+                stem = analyzer.stem(word)
+                for term_number in self._term_numbers(lang, os.path.commonprefix([word, stem]) if prefix else stem, prefix):
+                    self._score_term(lang, term_number, word_scores)
+            if not word_scores:
+                if all(word in analyzer.stopwords for analyzer in self.analyzers.values()):
+                    continue  # a stopword in every language does not narrow the search
+                return []
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {doc: score + word_scores[doc] for doc, score in scores.items() if doc in word_scores}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if limit:
+            ranked = ranked[:limit]
+        return [(self.ids[doc], round(score, 4)) for doc, score in ranked]
+
+    def _term_numbers(self, lang, term, prefix):
+        terms = self.fields[lang]['terms']
+        start = bisect.bisect_left(terms, term)
+        if not prefix:
+            return [start] if start < len(terms) and terms[start] == term else []
+        end = start
+        while end < len(terms) and terms[end].startswith(term):
+            end += 1
+        numbers = range(start, end)
+        if len(numbers) > MAX_PREFIX_TERMS:
+            postings = self.fields[lang]['postings']
+            numbers = sorted(numbers, key=lambda number: -len(postings[number]))[:MAX_PREFIX_TERMS]
+        return numbers
+
+    def _postings(self, lang, term_number):
+        field = self.fields[lang]
+        decoded = field['decoded'].get(term_number)
+        if decoded is None:
+            flat = field['postings'][term_number]
+            decoded = []
+            doc = 0
+            for i in range(0, len(flat), 2):
+                doc += flat[i]
+                decoded.append((doc, flat[i + 1]))
+            field['decoded'][term_number] = decoded
+        return decoded
+
+    def _score_term(self, lang, term_number, scores):
+        field = self.fields[lang]
+        postings = self._postings(lang, term_number)
+        total = len(field['lengths'])
+        idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+        lengths = field['lengths']
+        avgdl = field['avgdl'] or 1.0
+        k1, b = self.k1, self.b
+        for doc, tf in postings:
+            score = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[doc] / avgdl))
+            scores[doc] = scores.get(doc, 0.0) + score
+
+class SearchIndexFile:
+    """A SearchIndex that is reloaded when its file changes (for the proxy's /api/search)"""
+
+    def __init__(self, path=DEFAULT_INDEX):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._index = None
+        self._stat = None
+
+    def get(self):
+        """The current SearchIndex, or None when the file does not exist"""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        key = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if self._stat != key:
+                self._index = SearchIndex.load(self.path)
+                self._stat = key
+            return self._index
+
+def write_index(index, path):
+    tmp_path = Path(f'{path}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or query the bilingual question search index')
+    parser.add_argument('--source', default=str(DEFAULT_SOURCE), help='Question database JSON')
+    parser.add_argument('--store', help='Read from this SQLite question bank (question_store.py) instead')
+    parser.add_argument('--index', default=str(DEFAULT_INDEX), help='Index file to write or query')
+    parser.add_argument('--query', help='Search the existing index instead of building it')
+    parser.add_argument('--limit', type=int, default=10, help='Results to show for --query')
+    args = parser.parse_args()
+
+    if args.query is not None:
+        started = time.perf_counter()
+        index = SearchIndex.load(args.index)
+        loaded = time.perf_counter()
+        results = index.search(args.query, limit=args.limit)
+        print(f"[OK] {len(results)} results in {(time.perf_counter() - loaded) * 1000:.1f} ms "
+              f"(index loaded in {(loaded - started) * 1000:.0f} ms)")
+        for qid, score in results:
+            print(f"  #{qid}: {score}")
+        raise SystemExit(0)
+
+    print("=" * 70)
+    print("SEARCH INDEX - Bilingual BM25 index for the question bank")
+    print("=" * 70)
+    if args.store:
+        from question_store import QuestionStore
+        store = QuestionStore(args.store)
+        questions = store.query()
+        store.close()
+    else:
+        with open(args.source, 'r', encoding='utf-8') as f:
+            questions = json.load(f)['questions']
+
+    started = time.perf_counter()
+    index = build_index(questions)
+    write_index(index, args.index)
+    terms = {lang: len(field['terms']) for lang, field in index['fields'].items()}
+    print(f"[OK] Indexed {len(questions)} questions in {time.perf_counter() - started:.2f}s "
+          f"({', '.join(f'{lang}: {count} terms' for lang, count in terms.items())})")
+    print(f"[OK] Saved: {args.index} ({os.path.getsize(args.index) / 1024:.0f} KB)")
+    print("=" * 70)
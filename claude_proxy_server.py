@@ -2,89 +2,976 @@
 Simple proxy server for Claude API calls to avoid CORS issues
 """
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import hashlib
+import http.client
 import json
-import urllib.request
-import urllib.error
+import os
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from build_search_index import DEFAULT_INDEX as DEFAULT_SEARCH_INDEX, SearchIndexFile
+from proxy_metrics import ProxyMetrics
+from question_journal import DEFAULT_BANK as DEFAULT_JOURNAL_BANK, EditError, QuestionJournal
+from quiz_builder import DEFAULT_SOURCE as DEFAULT_QUIZ_BANK, QuizBankFile, quiz_options
+from rate_limiter import FairRateLimiter, StreamUsage, backoff_delay, estimate_tokens, usage_tokens
+from response_cache import ResponseCache, request_key
+from static_assets import StaticAssets
+from upstream_pool import UpstreamPool
+
+ANTHROPIC_API_URL = 'https://api.anthropic.com/v1/messages'
+DEFAULT_CACHE_DIR = Path(__file__).parent / '.proxy_cache'
+DEFAULT_STATIC_ROOT = Path(__file__).parent
+
+# /api/claude/batch: parallel upstream calls per batch
+BATCH_CONCURRENCY = 4
+BATCH_MAX_CONCURRENCY = 16
+
+# Upstream retry policy: throttled (429), overloaded (529) and 5xx replies and
+# network errors are retried with jittered exponential backoff
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504, 529}
+THROTTLED_STATUSES = {429, 529}
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+# What _generate returns: cache_state is HIT/MISS/BYPASS/OFF, shared means the
+# upstream call was coalesced with an identical one, attempts counts upstream tries
+GenerationResult = namedtuple('GenerationResult', 'status body cache_state shared attempts')
+
+# Routes reported by name in /metrics; static files are counted as "static"
+# and anything else as "other"
+METRIC_ROUTES = {'/api/claude', '/api/claude/batch', '/api/edits', '/api/quiz', '/api/search', '/api/stats', '/metrics'}
+# Methods the handler implements; any other verb a client sends is labelled "other"
+METRIC_METHODS = {'GET', 'HEAD', 'POST', 'OPTIONS'}
+# /api/search: results returned when the request gives no limit, and the most it may ask for
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 1000
+
+class CountingWriter:
+    """Wraps a handler's wfile and counts the bytes written through it"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.count = 0
+
+    def write(self, data):
+        self.count += len(data)
+        return self.raw.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
 
 class ClaudeProxyHandler(BaseHTTPRequestHandler):
+    caller_id = 'anonymous'
+    response_status = None
+    metric_route = None
+
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+
+    def handle_one_request(self):
+        """Handle one request and record it in the server's metrics"""
+        metrics = self.server.metrics
+        metrics.request_started()
+        started = time.perf_counter()
+        self.command = None
+        self.response_status = None
+        self.metric_route = None
+        self.wfile.count = 0
+        try:
+            super().handle_one_request()
+        finally:
+            if self.command is None:
+                metrics.request_abandoned()
+            else:
+                path = self.path.split('?', 1)[0]
+                route = self.metric_route or (path if path in METRIC_ROUTES else 'other')
+                try:
+                    bytes_in = int(self.headers.get('Content-Length', 0))
+                except (AttributeError, ValueError):
+                    bytes_in = 0
+                method = self.command if self.command in METRIC_METHODS else 'other'
+                metrics.request_finished(route, method, self.response_status or 0,
+                                         time.perf_counter() - started, bytes_in, self.wfile.count)
+
+    def send_response(self, code, message=None):
+        self.response_status = code
+        super().send_response(code, message)
+
     def do_OPTIONS(self):
         """Handle preflight CORS requests"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, x-api-key')
+        self.send_header('Access-Control-Allow-Methods', 'GET, HEAD, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, x-api-key, X-Cache-Bypass, X-Client-Id')
         self.end_headers()
 
+    def do_GET(self):
+        """Report proxy statistics and metrics, search questions, assemble a quiz, list edits, or serve a portal file"""
+        route = self.path.split('?', 1)[0]
+        if route == '/api/search':
+            self._handle_search()
+        elif route == '/api/quiz':
+            self._handle_quiz()
+        elif route == '/api/edits':
+            self._handle_edits_since()
+        elif self.path == '/api/stats':
+            self._send_json(200, json.dumps(self.server.component_stats(), indent=2).encode('utf-8'))
+        elif self.path == '/metrics':
+            body = self.server.metrics.render(self.server.component_stats()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._serve_static()
+
+    def do_HEAD(self):
+        """Headers of a portal file"""
+        self._serve_static(head_only=True)
+
     def do_POST(self):
-        """Proxy POST requests to Claude API"""
-        if self.path == '/api/claude':
+        """Proxy POST requests to Claude API, or record instructor edits"""
+        if self.path not in ('/api/claude', '/api/claude/batch', '/api/edits'):
+            self.send_error(404, "Not found")
+            return
+
+        try:
+            # Read request body
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            request_data = json.loads(post_data.decode('utf-8'))
+            if not isinstance(request_data, dict):
+                self.send_error(400, "Request body must be a JSON object")
+                return
+
+            if self.path == '/api/edits':
+                self._handle_edits(request_data)
+                return
+
+            self.caller_id = self._caller_id(request_data.get('api_key'))
+
+            if self.path == '/api/claude/batch':
+                self._handle_batch(request_data)
+                return
+
+            # Extract API key and request body
+            api_key = request_data.get('api_key')
+            claude_request = request_data.get('request')
+
+            if not api_key or not claude_request:
+                self.send_error(400, "Missing api_key or request")
+                return
+
+            # Streaming requests are relayed event by event, never cached
+            if claude_request.get('stream'):
+                self._relay_stream(api_key, claude_request)
+                return
+
+            result = self._generate(api_key, claude_request, self._wants_fresh_response())
+
+            # Relay the response (errors are passed through with their status)
+            headers = {'X-Cache': result.cache_state, 'X-Upstream-Attempts': str(result.attempts)}
+            if result.shared:
+                headers['X-Coalesced'] = '1'
+            self._send_json(result.status, result.body, headers)
+
+        except Exception as e:
+            print(f"[ERROR] Exception: {str(e)}")
+            self.send_error(500, str(e))
+
+    def _generate(self, api_key, claude_request, bypass=False, max_retries=None):
+        """Answer one Messages API request from the cache or upstream.
+
+        Returns a GenerationResult. Throttled or failed upstream calls are
+        retried up to max_retries times (server default if None).
+        """
+        # Serve repeats of an identical request from the cache, unless
+        # the caller asks for a fresh generation
+        cache = self.server.response_cache
+        key = request_key(claude_request)
+        if cache is not None and not bypass:
+            cached = cache.get(key)
+            if cached is not None:
+                return GenerationResult(200, cached, 'HIT', False, 0)
+
+        if max_retries is None:
+            max_retries = self.server.max_retries
+
+        # Identical requests already in flight share one upstream call
+        def fetch():
+            status, response_data, attempts = self._call_upstream(api_key, claude_request, max_retries)
+            if status == 200 and cache is not None:
+                cache.put(key, response_data)
+            return status, response_data, attempts
+
+        (status, response_data, attempts), shared = self.server.inflight.do(key, fetch)
+
+        cache_state = 'MISS'
+        if cache is None:
+            cache_state = 'OFF'
+        elif bypass:
+            cache.note_bypass()
+            cache_state = 'BYPASS'
+        return GenerationResult(status, response_data, cache_state, shared, attempts)
+
+    def _call_upstream(self, api_key, claude_request, max_retries):
+        """POST to the Messages API over a pooled connection, under the rate limiter.
+
+        429/529/5xx replies and network errors are retried with jittered
+        exponential backoff, honoring retry-after; a throttled reply also
+        pauses every other caller. Returns (status, body, attempts).
+        """
+        limiter = self.server.rate_limiter
+        request_body = json.dumps(claude_request).encode('utf-8')
+        cost = estimate_tokens(claude_request)
+        attempt = 0
+        while True:
+            attempt += 1
+            if limiter is not None:
+                limiter.acquire(self.caller_id, cost)
+            status = None
+            retry_after = None
+            upstream_started = time.perf_counter()
             try:
-                # Read request body
-                content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
-                request_data = json.loads(post_data.decode('utf-8'))
-
-                # Extract API key and request body
-                api_key = request_data.get('api_key')
-                claude_request = request_data.get('request')
-
-                if not api_key or not claude_request:
-                    self.send_error(400, "Missing api_key or request")
-                    return
-
-                # Make request to Claude API
-                req = urllib.request.Request(
-                    'https://api.anthropic.com/v1/messages',
-                    data=json.dumps(claude_request).encode('utf-8'),
-                    headers={
-                        'Content-Type': 'application/json',
-                        'x-api-key': api_key,
-                        'anthropic-version': '2023-06-01'
-                    }
+                status, headers, response_data = self.server.upstream_pool.request(
+                    'POST',
+                    self.server.upstream_url,
+                    body=request_body,
+                    headers=self._upstream_headers(api_key)
                 )
+            except (OSError, http.client.HTTPException) as e:
+                self.server.metrics.observe_upstream('error', time.perf_counter() - upstream_started)
+                if limiter is not None:
+                    limiter.settle(cost, 0)
+                if attempt > max_retries:
+                    raise
+                reason = f"network error ({e})"
+            else:
+                self.server.metrics.observe_upstream(status, time.perf_counter() - upstream_started)
+                if limiter is not None:
+                    actual = usage_tokens(response_data) if status == 200 else 0
+                    limiter.settle(cost, cost if actual is None else actual)
+                if status == 200:
+                    return status, response_data, attempt
+                print(f"[ERROR] API returned {status}: {response_data.decode('utf-8', 'replace')}")
+                if status not in RETRYABLE_STATUSES or attempt > max_retries:
+                    return status, response_data, attempt
+                retry_after = dict((k.lower(), v) for k, v in headers).get('retry-after')
+                reason = f"HTTP {status}"
 
-                # Get response
-                with urllib.request.urlopen(req) as response:
-                    response_data = response.read()
+            delay = backoff_delay(attempt, retry_after, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY)
+            if status in THROTTLED_STATUSES and limiter is not None:
+                limiter.pause(delay)
+            print(f"[RETRY] {reason}, attempt {attempt}/{max_retries + 1}, waiting {delay:.1f}s")
+            time.sleep(delay)
 
-                # Send success response
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(response_data)
-
-            except urllib.error.HTTPError as e:
-                error_body = e.read().decode('utf-8')
-                print(f"[ERROR] API returned {e.code}: {error_body}")
-                self.send_response(e.code)
-                self.send_header('Content-Type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(error_body.encode('utf-8'))
+    def _handle_batch(self, request_data):
+        """Run many generation requests upstream in parallel, streaming NDJSON results.
+
+        Body: {"api_key": ..., "requests": [...], "concurrency": 4, "max_retries": 3}
+        Each finished item is written as one line as soon as it completes:
+        {"type": "result", "index": i, "status": 200, "attempts": 1,
+         "cache": "MISS", "completed": k, "total": n, "response": {...}}
+        Failed items carry "type": "error" and the upstream error body
+        instead of "response". A final {"type": "done", ...} line ends the stream.
+        """
+        api_key = request_data.get('api_key')
+        items = request_data.get('requests')
+        if not api_key or not isinstance(items, list) or not items:
+            self.send_error(400, "Missing api_key or requests")
+            return
 
+        # Everything that can be rejected is checked before the 200 is sent
+        try:
+            concurrency = max(1, min(int(request_data.get('concurrency', BATCH_CONCURRENCY)), BATCH_MAX_CONCURRENCY))
+            max_retries = max(0, min(int(request_data.get('max_retries', self.server.max_retries)), 8))
+        except (TypeError, ValueError):
+            self.send_error(400, "concurrency and max_retries must be integers")
+            return
+        bypass = self._wants_fresh_response()
+        total = len(items)
+        started = time.perf_counter()
+
+        # NDJSON over chunked encoding, see _relay_stream
+        self.protocol_version = 'HTTP/1.1'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+        def run(index):
+            if not isinstance(items[index], dict):
+                body = json.dumps({'error': {'type': 'invalid_request_error',
+                                             'message': 'batch item must be an object'}}).encode('utf-8')
+                return index, GenerationResult(400, body, 'MISS', False, 0)
+            # Batches are never streamed; each item is one buffered response
+            claude_request = dict(items[index], stream=False)
+            try:
+                return index, self._generate(api_key, claude_request, bypass, max_retries)
+            except (OSError, http.client.HTTPException) as e:
+                body = json.dumps({'error': {'type': 'proxy_error', 'message': str(e)}}).encode('utf-8')
+                return index, GenerationResult(502, body, 'MISS', False, max_retries + 1)
             except Exception as e:
-                print(f"[ERROR] Exception: {str(e)}")
-                self.send_error(500, str(e))
-        else:
+                # The response has started: report it on the item's line, never through send_error
+                print(f"[Claude Proxy] Batch item {index} failed: {e!r}")
+                body = json.dumps({'error': {'type': 'proxy_error', 'message': str(e)}}).encode('utf-8')
+                return index, GenerationResult(500, body, 'MISS', False, 1)
+
+        completed = 0
+        succeeded = 0
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='proxy-batch')
+        try:
+            futures = [executor.submit(run, i) for i in range(total)]
+            for future in as_completed(futures):
+                index, result = future.result()
+                status, body = result.status, result.body
+                completed += 1
+                line = {
+                    'type': 'result' if status == 200 else 'error',
+                    'index': index,
+                    'status': status,
+                    'attempts': result.attempts,
+                    'cache': result.cache_state,
+                    'completed': completed,
+                    'total': total,
+                }
+                try:
+                    payload = json.loads(body.decode('utf-8'))
+                except ValueError:
+                    payload = {'error': {'type': 'invalid_response', 'message': body.decode('utf-8', 'replace')}}
+                if status == 200:
+                    succeeded += 1
+                    line['response'] = payload
+                else:
+                    line['error'] = payload.get('error', payload) if isinstance(payload, dict) else payload
+                self._write_chunk(json.dumps(line, ensure_ascii=False).encode('utf-8') + b'\n')
+
+            self._write_chunk(json.dumps({
+                'type': 'done',
+                'total': total,
+                'succeeded': succeeded,
+                'failed': total - succeeded,
+                'seconds': round(time.perf_counter() - started, 3),
+            }).encode('utf-8') + b'\n')
+            self._write_chunk(b'')
+            print(f"[Claude Proxy] Batch finished: {succeeded}/{total} succeeded")
+        except (BrokenPipeError, ConnectionResetError):
+            print("[Claude Proxy] Client disconnected during batch, cancelling remaining items")
+            executor.shutdown(wait=False, cancel_futures=True)
+        except Exception as e:
+            print(f"[Claude Proxy] Batch failed: {e!r}, cancelling remaining items")
+            executor.shutdown(wait=False, cancel_futures=True)
+            # Headers are sent: end the stream with an error line instead of a second response
+            try:
+                self._write_chunk(json.dumps({
+                    'type': 'error',
+                    'error': {'type': 'proxy_error', 'message': str(e)},
+                    'completed': completed,
+                    'total': total,
+                }).encode('utf-8') + b'\n')
+                self._write_chunk(b'')
+            except OSError:
+                pass
+        finally:
+            executor.shutdown(wait=False)
+
+    def _handle_search(self):
+        """GET /api/search?q=...&limit=N: question ids ranked by the BM25 search index"""
+        index = self.server.search_index.get() if self.server.search_index is not None else None
+        if index is None:
+            self._send_json(404, json.dumps({
+                'error': {'type': 'not_found', 'message': 'Search index not built (run build_search_index.py)'}
+            }).encode('utf-8'))
+            return
+        params = parse_qs(urlsplit(self.path).query)
+        query = params.get('q', [''])[0]
+        try:
+            limit = min(int(params.get('limit', [SEARCH_DEFAULT_LIMIT])[0]), SEARCH_MAX_LIMIT)
+        except ValueError:
+            self._send_json(400, json.dumps({
+                'error': {'type': 'invalid_request_error', 'message': 'limit must be a number'}
+            }).encode('utf-8'))
+            return
+        started = time.perf_counter()
+        results = index.search(query, limit=limit)
+        body = json.dumps({
+            'query': query,
+            'results': [{'id': qid, 'score': score} for qid, score in results],
+            'took_ms': round((time.perf_counter() - started) * 1000, 2),
+        }, ensure_ascii=False).encode('utf-8')
+        self._send_json(200, body)
+
+    def _handle_quiz(self):
+        """GET /api/quiz?n=N&seed=S&diseases=...&difficulty=...&weights=...&image_ratio=R: quiz question ids"""
+        bank = self.server.quiz_bank.get() if self.server.quiz_bank is not None else None
+        if bank is None:
+            self._send_json(404, json.dumps({
+                'error': {'type': 'not_found', 'message': 'Question bank not found'}
+            }).encode('utf-8'))
+            return
+        try:
+            options = quiz_options(parse_qs(urlsplit(self.path).query))
+        except ValueError as e:
+            self._send_json(400, json.dumps({
+                'error': {'type': 'invalid_request_error', 'message': str(e)}
+            }).encode('utf-8'))
+            return
+        started = time.perf_counter()
+        quiz = bank.build(**options)
+        quiz['took_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        self._send_json(200, json.dumps(quiz, ensure_ascii=False).encode('utf-8'))
+
+    def _handle_edits(self, request_data):
+        """POST /api/edits {"client": ..., "edits": [...]}: journal field-level edits to the question bank"""
+        if self.server.journal is None:
+            self.send_error(404, "Edit journal disabled")
+            return
+        try:
+            results = self.server.journal.submit(request_data.get('edits'), client=request_data.get('client'))
+        except EditError as e:
+            self._send_json(400, json.dumps({
+                'error': {'type': 'invalid_request_error', 'message': str(e)}
+            }).encode('utf-8'))
+            return
+        # The last edit this request journalled (None when all were rejected)
+        seq = max((result['seq'] for result in results if 'seq' in result), default=None)
+        body = json.dumps({'seq': seq, 'results': results}, ensure_ascii=False)
+        self._send_json(200, body.encode('utf-8'))
+
+    def _handle_edits_since(self):
+        """GET /api/edits?since=N: edits after N that the bank file does not have yet"""
+        if self.server.journal is None:
+            self.send_error(404, "Edit journal disabled")
+            return
+        try:
+            since = int(parse_qs(urlsplit(self.path).query).get('since', ['0'])[0])
+        except ValueError:
+            self._send_json(400, json.dumps({
+                'error': {'type': 'invalid_request_error', 'message': 'since must be a number'}
+            }).encode('utf-8'))
+            return
+        body = json.dumps(self.server.journal.since(since), ensure_ascii=False).encode('utf-8')
+        self._send_json(200, body)
+
+    def _serve_static(self, head_only=False):
+        """Serve a portal page, script, JSON file or question image.
+
+        Answers 304 when If-None-Match carries the current ETag, and sends
+        the precompressed br/gzip body when the browser accepts it.
+        """
+        assets = self.server.static_assets
+        path = assets.resolve(self.path) if assets is not None else None
+        if path is None:
             self.send_error(404, "Not found")
+            return
+
+        self.metric_route = 'static'
+        asset = assets.get(path)
+        encoding = assets.choose_encoding(asset, self.headers.get('Accept-Encoding'))
+
+        if assets.matches(asset, self.headers.get('If-None-Match')):
+            self.send_response(304)
+            self._send_static_headers(asset, encoding)
+            self.end_headers()
+            assets.count(304, encoding)
+            return
+
+        self.send_response(200)
+        self._send_static_headers(asset, encoding)
+        self.send_header('Content-Type', assets.content_type(path))
+        if encoding:
+            body = asset.variants[encoding]
+            self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if not head_only:
+                self.wfile.write(body)
+        else:
+            with open(path, 'rb') as f:
+                self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+                self.end_headers()
+                if not head_only:
+                    shutil.copyfileobj(f, self.wfile)
+        assets.count(200, encoding)
+
+    def _send_static_headers(self, asset, encoding):
+        self.send_header('ETag', asset.etag(encoding))
+        # Revalidate unless the name is content-hashed: with ETags that costs
+        # a 304, and edited questions or replaced images show up on the next load
+        self.send_header('Cache-Control', self.server.static_assets.cache_control(asset.path))
+        if asset.variants:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
+
+    def _write_chunk(self, data):
+        """Write one chunk of a chunked response (empty data ends the body)"""
+        if data:
+            self.wfile.write(b'%X\r\n%s\r\n' % (len(data), data))
+        else:
+            self.wfile.write(b'0\r\n\r\n')
+
+    def _relay_stream(self, api_key, claude_request):
+        """Pass server-sent events through to the browser as they arrive.
+
+        The upstream body is never buffered: each piece read from the
+        Messages API is written out immediately as one HTTP chunk. Throttled
+        replies are retried as in _call_upstream, but only before the first
+        byte has been sent.
+        """
+        limiter = self.server.rate_limiter
+        request_body = json.dumps(claude_request).encode('utf-8')
+        cost = estimate_tokens(claude_request)
+        attempt = 0
+        while True:
+            attempt += 1
+            if limiter is not None:
+                limiter.acquire(self.caller_id, cost)
+            upstream_started = time.perf_counter()
+            usage = failure = None
+            try:
+                with self.server.upstream_pool.stream(
+                    'POST',
+                    self.server.upstream_url,
+                    body=request_body,
+                    headers=self._upstream_headers(api_key)
+                ) as response:
+                    if response.status == 200:
+                        usage = StreamUsage()
+                        self._forward_events(response, usage)
+                    else:
+                        status = response.status
+                        error_body = response.read()
+                        retry_after = response.getheader('retry-after')
+            except (OSError, http.client.HTTPException) as e:
+                if usage is None:
+                    raise
+                failure = e
+            if usage is not None:
+                self.server.metrics.observe_upstream(200 if failure is None else 'error',
+                                                     time.perf_counter() - upstream_started)
+                if limiter is not None:
+                    limiter.settle(cost, cost if usage.tokens is None else usage.tokens)
+                if failure is not None:
+                    # Headers are already out: report the failure in-band and
+                    # end the chunked body; send_error would corrupt the stream
+                    print(f"[ERROR] Upstream stream failed: {failure}")
+                    self._end_stream_with_error(f"Upstream connection failed: {failure}")
+                return
+            self.server.metrics.observe_upstream(status, time.perf_counter() - upstream_started)
+
+            if limiter is not None:
+                limiter.settle(cost, 0)
+            print(f"[ERROR] API returned {status}: {error_body.decode('utf-8', 'replace')}")
+            if status not in RETRYABLE_STATUSES or attempt > self.server.max_retries:
+                self._send_json(status, error_body)
+                return
+            delay = backoff_delay(attempt, retry_after, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY)
+            if status in THROTTLED_STATUSES and limiter is not None:
+                limiter.pause(delay)
+            print(f"[RETRY] HTTP {status}, attempt {attempt}/{self.server.max_retries + 1}, waiting {delay:.1f}s")
+            time.sleep(delay)
+
+    def _forward_events(self, response, usage):
+        """Relay an open upstream event stream using chunked encoding.
+
+        Upstream read errors propagate to the caller; a client that goes
+        away only ends the relay.
+        """
+        # Chunked transfer encoding needs an HTTP/1.1 status line; the
+        # connection is still closed once the stream ends
+        self.protocol_version = 'HTTP/1.1'
+        self.send_response(200)
+        self.send_header('Content-Type', response.getheader('Content-Type', 'text/event-stream'))
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+
+        while True:
+            chunk = response.read1(65536)
+            if not chunk and response.length:
+                # read1 signals a body cut short of Content-Length only by returning nothing
+                raise http.client.IncompleteRead(b'', response.length)
+            usage.feed(chunk)
+            try:
+                self._write_chunk(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                # Browser tab closed mid-generation; the pool drops the
+                # half-read upstream connection
+                print("[Claude Proxy] Client disconnected during stream")
+                return
+            if not chunk:
+                return
+
+    def _end_stream_with_error(self, message):
+        """Close a started event stream with an SSE error event"""
+        event = json.dumps({'type': 'error', 'error': {'type': 'api_error', 'message': message}})
+        try:
+            self._write_chunk(f"event: error\ndata: {event}\n\n".encode('utf-8'))
+            self._write_chunk(b'')
+        except (BrokenPipeError, ConnectionResetError):
+            print("[Claude Proxy] Client disconnected during stream")
+
+    def _caller_id(self, api_key):
+        """Who a request counts against for fair scheduling.
+
+        An explicit X-Client-Id header wins; otherwise the client address
+        plus a fingerprint of the API key, so two instructors sharing one
+        machine or one key are still told apart.
+        """
+        client_id = self.headers.get('X-Client-Id', '').strip()
+        if client_id:
+            return client_id[:64]
+        key_hash = hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:8]
+        return f"{self.client_address[0]}:{key_hash}"
+
+    @staticmethod
+    def _upstream_headers(api_key):
+        return {
+            'Content-Type': 'application/json',
+            'x-api-key': api_key,
+            'anthropic-version': '2023-06-01'
+        }
+
+    def _wants_fresh_response(self):
+        """True if the request carries X-Cache-Bypass or Cache-Control: no-cache"""
+        if self.headers.get('X-Cache-Bypass', '').strip().lower() in ('1', 'true', 'yes'):
+            return True
+        return 'no-cache' in self.headers.get('Cache-Control', '').lower()
+
+    def _send_json(self, status, body, extra_headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'X-Cache, X-Coalesced, X-Upstream-Attempts')
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
 
     def log_message(self, format, *args):
         """Custom log format"""
         print(f"[Claude Proxy] {format % args}")
 
-def run_server(port=8081):
-    """Run the proxy server"""
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait and receive the same result (or exception).
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Return (result, shared); shared is True if another caller did the work"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = self._Call()
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        """Counters for /api/stats"""
+        with self._lock:
+            return {
+                'upstream_calls': self.leaders,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+            }
+
+class ConcurrentProxyServer(HTTPServer):
+    """HTTPServer that hands connections to a fixed pool of worker threads.
+
+    At most `workers` requests are handled at once and up to `backlog` more
+    wait in a queue. Anything beyond that is answered with 503 straight away
+    so the browser can retry instead of hanging.
+    """
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=8, backlog=32,
+                 upstream_url=ANTHROPIC_API_URL, pool_size=None, pool_idle_timeout=30.0,
+                 response_cache=None, rate_limiter=None, max_retries=3, static_assets=None,
+                 search_index=None, quiz_bank=None, journal=None):
+        super().__init__(server_address, handler_class)
+        self.workers = workers
+        self.backlog = backlog
+        self.upstream_url = upstream_url
+        self.upstream_pool = UpstreamPool(max_per_host=pool_size or workers,
+                                          idle_timeout=pool_idle_timeout)
+        self.response_cache = response_cache
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.inflight = SingleFlight()
+        self.metrics = ProxyMetrics()
+        self.static_assets = static_assets
+        self.search_index = search_index
+        self.quiz_bank = quiz_bank
+        self.journal = journal
+        self._pending = queue.Queue(maxsize=backlog)
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f'proxy-worker-{i + 1}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def component_stats(self):
+        """Counters of the pool, cache, coalescing and rate limiter, by component"""
+        stats = {
+            'pool': self.upstream_pool.stats(),
+            'inflight': self.inflight.stats(),
+            'workers': {'threads': self.workers, 'queued': self._pending.qsize(), 'backlog': self.backlog},
+        }
+        if self.response_cache is not None:
+            stats['cache'] = self.response_cache.stats()
+        if self.rate_limiter is not None:
+            stats['rate_limiter'] = self.rate_limiter.stats()
+        if self.static_assets is not None:
+            stats['static'] = self.static_assets.stats()
+        if self.journal is not None:
+            stats['journal'] = self.journal.stats()
+        return stats
+
+    def process_request(self, request, client_address):
+        """Queue the connection for a worker, or reject it when the backlog is full"""
+        try:
+            self._pending.put_nowait((request, client_address))
+        except queue.Full:
+            # Rejecting means reading the request first (browsers reset the
+            # connection otherwise), so keep that off the accept loop
+            threading.Thread(target=self._reject, args=(request,), daemon=True).start()
+
+    def _worker(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def _reject(self, request):
+        try:
+            self._drain(request)
+        except OSError:
+            pass
+        body = json.dumps({
+            'error': {'type': 'overloaded', 'message': 'Proxy is busy, please retry shortly'}
+        }).encode('utf-8')
+        head = (
+            'HTTP/1.0 503 Service Unavailable\r\n'
+            'Content-Type: application/json\r\n'
+            'Access-Control-Allow-Origin: *\r\n'
+            'Retry-After: 1\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            'Connection: close\r\n'
+            '\r\n'
+        ).encode('ascii')
+        try:
+            request.sendall(head + body)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+        print(f"[Claude Proxy] Backlog full ({self.backlog}), answered 503")
+
+    @staticmethod
+    def _drain(request, timeout=2.0):
+        """Consume the pending request (headers and body) so the 503 is delivered cleanly"""
+        request.settimeout(timeout)
+        data = b''
+        while b'\r\n\r\n' not in data:
+            chunk = request.recv(65536)
+            if not chunk:
+                return
+            data += chunk
+        head, _, rest = data.partition(b'\r\n\r\n')
+        remaining = 0
+        for line in head.split(b'\r\n')[1:]:
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'content-length':
+                remaining = int(value.strip() or 0)
+        remaining -= len(rest)
+        while remaining > 0:
+            chunk = request.recv(min(remaining, 65536))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+
+    def server_close(self):
+        super().server_close()
+        for _ in self._threads:
+            self._pending.put(None)
+        self.upstream_pool.close()
+        if self.journal is not None:
+            self.journal.close()
+
+def run_server(port=8081, workers=8, backlog=32, upstream_url=ANTHROPIC_API_URL,
+               pool_size=None, pool_idle_timeout=30.0, cache_dir=DEFAULT_CACHE_DIR,
+               cache_max_mb=200, cache_ttl_hours=168, requests_per_minute=50,
+               tokens_per_minute=50000, max_retries=3, static_root=DEFAULT_STATIC_ROOT,
+               search_index_path=DEFAULT_SEARCH_INDEX, quiz_bank_path=DEFAULT_QUIZ_BANK,
+               journal_bank_path=DEFAULT_JOURNAL_BANK):
+    """Run the proxy server.
+
+    Pass cache_dir=None to disable the response cache,
+    requests_per_minute=None to disable client-side rate limiting,
+    static_root=None to stop serving the portal files,
+    search_index_path=None to disable /api/search,
+    quiz_bank_path=None to disable /api/quiz and
+    journal_bank_path=None to disable /api/edits.
+    """
     server_address = ('', port)
-    httpd = HTTPServer(server_address, ClaudeProxyHandler)
+    static_assets = None
+    if static_root is not None:
+        static_assets = StaticAssets(static_root)
+        static_assets.warm()
+    search_index = SearchIndexFile(search_index_path) if search_index_path is not None else None
+    quiz_bank = QuizBankFile(quiz_bank_path) if quiz_bank_path is not None else None
+    journal = QuestionJournal(journal_bank_path) if journal_bank_path is not None else None
+    rate_limiter = None
+    if requests_per_minute:
+        rate_limiter = FairRateLimiter(requests_per_minute, tokens_per_minute)
+    response_cache = None
+    if cache_dir is not None:
+        response_cache = ResponseCache(cache_dir, max_bytes=int(cache_max_mb * 1024 * 1024),
+                                       ttl=cache_ttl_hours * 3600)
+    httpd = ConcurrentProxyServer(server_address, ClaudeProxyHandler,
+                                  workers=workers, backlog=backlog, upstream_url=upstream_url,
+                                  pool_size=pool_size, pool_idle_timeout=pool_idle_timeout,
+                                  response_cache=response_cache, rate_limiter=rate_limiter,
+                                  max_retries=max_retries, static_assets=static_assets,
+                                  search_index=search_index, quiz_bank=quiz_bank, journal=journal)
     print(f"===========================================")
     print(f"Claude API Proxy Server")
     print(f"===========================================")
     print(f"Listening on: http://localhost:{port}")
+    if static_assets is not None:
+        print(f"Student portal: http://localhost:{port}/student_portal_bilingual.html")
+        print(f"Instructor portal: http://localhost:{port}/instructor_portal_editable.html")
     print(f"Proxy endpoint: http://localhost:{port}/api/claude")
+    print(f"Batch endpoint: http://localhost:{port}/api/claude/batch")
+    if search_index is not None:
+        print(f"Search: http://localhost:{port}/api/search?q=... ({search_index_path})")
+    if quiz_bank is not None:
+        print(f"Quiz: http://localhost:{port}/api/quiz?n=20 ({quiz_bank_path})")
+    if journal is not None:
+        print(f"Edits: http://localhost:{port}/api/edits ({journal.journal_path.name}, "
+              f"{journal.seq - journal.base_seq} not yet compacted)")
+    print(f"Stats: http://localhost:{port}/api/stats")
+    print(f"Metrics: http://localhost:{port}/metrics")
+    print(f"Workers: {workers} (backlog {backlog})")
+    if response_cache is not None:
+        print(f"Response cache: {cache_dir} ({response_cache.stats()['entries']} entries)")
+    else:
+        print(f"Response cache: disabled")
+    if rate_limiter is not None:
+        print(f"Rate limit: {requests_per_minute} requests/min, {tokens_per_minute} tokens/min")
+    else:
+        print(f"Rate limit: disabled")
     print(f"Press Ctrl+C to stop")
     print(f"===========================================")
-    httpd.serve_forever()
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
 
 if __name__ == '__main__':
-    run_server(8081)
+    parser = argparse.ArgumentParser(description='Claude API proxy for the nephropathology portals')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Requests handled concurrently (1 = old serial behaviour)')
+    parser.add_argument('--backlog', type=int, default=32,
+                        help='Requests allowed to wait for a worker before answering 503')
+    parser.add_argument('--upstream', default=ANTHROPIC_API_URL,
+                        help='Messages API URL (point at a local stub for testing)')
+    parser.add_argument('--pool-size', type=int, default=None,
+                        help='Warm keep-alive connections kept per upstream host (default: --workers)')
+    parser.add_argument('--pool-idle-timeout', type=float, default=30.0,
+                        help='Seconds an idle upstream connection is kept before it is closed')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR),
+                        help='Directory for cached generation responses')
+    parser.add_argument('--cache-max-mb', type=float, default=200,
+                        help='Size limit of the response cache; least recently used entries go first')
+    parser.add_argument('--cache-ttl-hours', type=float, default=168,
+                        help='How long a cached response stays valid')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the response cache')
+    parser.add_argument('--rpm', type=int, default=50,
+                        help='Requests per minute allowed upstream (match your API tier)')
+    parser.add_argument('--tpm', type=int, default=50000,
+                        help='Tokens per minute allowed upstream (input estimate + max_tokens)')
+    parser.add_argument('--no-rate-limit', action='store_true', help='Disable client-side rate limiting')
+    parser.add_argument('--max-retries', type=int, default=3,
+                        help='Retries for throttled (429/529), 5xx or failed upstream calls')
+    parser.add_argument('--static-root', default=str(DEFAULT_STATIC_ROOT),
+                        help='Folder with the portal files and question_images/')
+    parser.add_argument('--no-static', action='store_true', help='Do not serve the portal files')
+    parser.add_argument('--search-index', default=str(DEFAULT_SEARCH_INDEX),
+                        help='Index built by build_search_index.py, served at /api/search')
+    parser.add_argument('--no-search', action='store_true', help='Disable /api/search')
+    parser.add_argument('--quiz-bank', default=str(DEFAULT_QUIZ_BANK),
+                        help='Question bank the quizzes at /api/quiz are drawn from')
+    parser.add_argument('--no-quiz', action='store_true', help='Disable /api/quiz')
+    parser.add_argument('--journal-bank', default=str(DEFAULT_JOURNAL_BANK),
+                        help='Question bank that edits posted to /api/edits are journaled against')
+    parser.add_argument('--no-journal', action='store_true', help='Disable /api/edits')
+    args = parser.parse_args()
+    run_server(args.port, workers=args.workers, backlog=args.backlog, upstream_url=args.upstream,
+               pool_size=args.pool_size, pool_idle_timeout=args.pool_idle_timeout,
+               cache_dir=None if args.no_cache else args.cache_dir,
+               cache_max_mb=args.cache_max_mb, cache_ttl_hours=args.cache_ttl_hours,
+               requests_per_minute=None if args.no_rate_limit else args.rpm,
+               tokens_per_minute=args.tpm, max_retries=args.max_retries,
+               static_root=None if args.no_static else args.static_root,
+               search_index_path=None if args.no_search else args.search_index,
+               quiz_bank_path=None if args.no_quiz else args.quiz_bank,
+               journal_bank_path=None if args.no_journal else args.journal_bank)
@@ -6,6 +6,8 @@ let newImageData = {}; // Store new image data: { questionId: { file, dataUrl }
 let imageFolderHandle = null; // Handle to question_images folder
 let autoSaveEnabled = false; // Auto-save JSON after each change
 let originalData = null; // Store original database data
+let journalAvailable = false; // the proxy's /api/edits journal records image changes
+const journalClient = 'images-' + Math.random().toString(36).slice(2, 10);
 
 // IndexedDB for persisting folder handle
 const DB_NAME = 'ImagePortalDB';
@@ -19,14 +21,17 @@ async function loadQuestions() {
         // Initialize IndexedDB first
         await initDB();
 
+        const derivativesPromise = loadImageDerivatives();
         const response = await fetch('nephro_questions_enhanced.json');
         const data = await response.json();
+        imageDerivatives = await derivativesPromise;
 
         // Store original data for reference
         originalData = JSON.parse(JSON.stringify(data));
 
         allQuestions = data.questions;
         diseaseTranslations = data.disease_translations || {};
+        await syncJournal(data.metadata?.journal_seq || 0);
 
         populateDiseaseFilter();
         renderGallery(allQuestions);
@@ -458,11 +463,11 @@ function renderGallery(questions) {
                 ${hasImage ? `
                     <div class="current-image">
                         <span class="image-label">Current Image</span>
-                        <img src="${imageSrc}"
+                        ${responsiveImageHtml(imageSrc, '(max-width: 768px) 100vw, 600px', `
                              alt="Question image"
                              class="image-preview"
                              onclick="openLightbox('${imageSrc}', 'Question #${q.id}')"
-                             onerror="this.src='data:image/svg+xml,<svg xmlns=%22http://www.w3.org/2000/svg%22 width=%22400%22 height=%22200%22><rect fill=%22%23f0f0f0%22 width=%22400%22 height=%22200%22/><text x=%2250%25%22 y=%2250%25%22 text-anchor=%22middle%22 fill=%22%23999%22>Image not found</text></svg>'">
+                             onerror="this.closest('picture')?.querySelectorAll('source').forEach(s => s.remove()); this.removeAttribute('srcset'); this.src='data:image/svg+xml,<svg xmlns=%22http://www.w3.org/2000/svg%22 width=%22400%22 height=%22200%22><rect fill=%22%23f0f0f0%22 width=%22400%22 height=%22200%22/><text x=%2250%25%22 y=%2250%25%22 text-anchor=%22middle%22 fill=%22%23999%22>Image not found</text></svg>'"`)}
                         <div class="image-path">${imagePath}</div>
                     </div>
                 ` : `
@@ -602,11 +607,15 @@ async function processImageFile(file, questionId) {
         // Update the question with new image path
         if (question) {
             const extension = file.name.split('.').pop();
+            const previous = question.image || null;
             question.image = `question_images/question_${questionId}.${extension}`;
+            // Variants of the old file are stale until build_image_derivatives.py runs again
+            delete imageDerivatives[question.image];
+            await recordImageEdit(questionId, question.image, previous);
         }
 
         // AUTO-SAVE: Save JSON if auto-save is enabled
-        if (autoSaveEnabled && imageFolderHandle) {
+        if (autoSaveEnabled && imageFolderHandle && !journalAvailable) {
             await autoSaveJSON();
             // Also save to the main JSON file for immediate portal refresh
             await syncToMainJSON();
@@ -659,6 +668,53 @@ async function saveImageToFolder(file, questionId) {
     showToast(`✓ Image saved: ${fileName}`);
 }
 
+// Image changes journaled by the proxy (question_journal.py) since the bank file was last written
+async function syncJournal(since) {
+    try {
+        const response = await fetch(`api/edits?since=${since}`, { cache: 'no-store' });
+        if (!response.ok) return;
+        const data = await response.json();
+        (data.edits || []).forEach(edit => {
+            if (edit.op === 'add') {
+                if (!allQuestions.some(q => q.id === edit.question.id)) allQuestions.push(edit.question);
+                return;
+            }
+            const question = allQuestions.find(q => q.id === edit.id);
+            if (question && edit.field === 'image') question.image = edit.value;
+        });
+        journalAvailable = true;
+    } catch (error) {
+        journalAvailable = false;
+    }
+}
+
+// Record a question's new image path in the proxy's edit journal (instead of rewriting the JSON)
+async function recordImageEdit(questionId, image, previous) {
+    if (!journalAvailable) return;
+    try {
+        const response = await fetch('api/edits', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                client: journalClient,
+                edits: [{ op: 'set', id: questionId, field: 'image', value: image, expect: previous }]
+            })
+        });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const result = (await response.json()).results[0];
+        if ('current' in result) {
+            showToast(`⚠ Question #${questionId} image was changed by another editor`);
+        } else if (result.error) {
+            throw new Error(result.error);
+        } else {
+            showToast('✓ Database updated');
+        }
+    } catch (error) {
+        console.error('Error recording image edit:', error);
+        showToast('Could not record the change: ' + error.message);
+    }
+}
+
 // Auto-save the JSON database
 async function autoSaveJSON() {
     if (!imageFolderHandle) return;
@@ -828,10 +884,12 @@ async function removeImage(questionId) {
         modifiedQuestions.add(questionId);
 
         // Update question to remove image reference
+        const previous = question.image;
         question.image = null;
+        await recordImageEdit(questionId, null, previous);
 
         // AUTO-SAVE: Save JSON if auto-save is enabled
-        if (autoSaveEnabled && imageFolderHandle) {
+        if (autoSaveEnabled && imageFolderHandle && !journalAvailable) {
             await autoSaveJSON();
             await syncToMainJSON();
         }
@@ -942,7 +1000,7 @@ async function reloadQuestions() {
         // But we can still reload to show any changes that were manually synced
 
         // Clear cache and reload
-        const response = await fetch('nephro_questions_enhanced.json?' + new Date().getTime());
+        const response = await fetch('nephro_questions_enhanced.json', { cache: 'no-cache' });
         const data = await response.json();
 
         originalData = JSON.parse(JSON.stringify(data));
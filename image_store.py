@@ -0,0 +1,240 @@
+"""
+Content-addressed image store
+Keeps one copy of every distinct image under .image_store/blobs/, named by
+its SHA-256, and turns every file in question_images/ and
+Textbook_LT/extracted_images/ into a hardlink to that copy. Identical
+slide images used by several questions then take disk space (and sync
+bandwidth with rsync -H) only once.
+
+Where hardlinks are not possible (another filesystem, no link support)
+the file is left as it is and only recorded in the reference table.
+
+A linked file is shared with its blob (and with every identical image),
+so it must be replaced (write a new file, then rename) rather than edited
+in place. Blobs are not made read-only, since that would also lock the
+working files they are linked to; only blobs that are plain copies are.
+
+Usage:
+    python image_store.py ingest [folders...]
+    python image_store.py gc
+    python image_store.py stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import stat
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+DEFAULT_STORE = current_dir / '.image_store'
+DEFAULT_FOLDERS = ('question_images', 'Textbook_LT/extracted_images')
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.bmp', '.tif', '.tiff', '.emf', '.wmf'}
+REFS_VERSION = 1
+
+def file_sha256(path):
+    """SHA-256 of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def format_bytes(count):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(count) < 1024 or unit == 'GB':
+            return f'{count:.1f} {unit}' if unit != 'B' else f'{count} B'
+        count /= 1024
+
+def make_writable(path):
+    """Give the owner write permission back (the inode may be a working image)"""
+    mode = os.stat(path).st_mode
+    if not mode & stat.S_IWUSR:
+        os.chmod(path, stat.S_IMODE(mode) | stat.S_IWUSR)
+
+class ImageStore:
+    """Blobs keyed by SHA-256 plus a reference table of the files that use them.
+
+    The reference table (refs.json) maps each ingested file, relative to
+    `base`, to its blob and to the file's size/mtime/inode when it was last
+    checked, so unchanged files are not hashed again.
+    """
+
+    def __init__(self, directory=DEFAULT_STORE, base=current_dir):
+        self.directory = Path(directory)
+        self.base = Path(base).resolve()
+        self.blobs_dir = self.directory / 'blobs'
+        self.refs_path = self.directory / 'refs.json'
+        self.refs = self._load_refs()
+
+    def blob_path(self, sha256, suffix):
+        return self.blobs_dir / sha256[:2] / f'{sha256}{suffix.lower()}'
+
+    def ingest(self, folders):
+        """Add every image under `folders` and link duplicates to their blob.
+
+        Returns a dict of counters including 'reclaimed_bytes', the space
+        freed by replacing duplicate copies with hardlinks.
+        """
+        result = {'files': 0, 'unchanged': 0, 'new_blobs': 0, 'linked': 0,
+                  'not_linked': 0, 'reclaimed_bytes': 0}
+        for folder in folders:
+            folder = (self.base / folder).resolve()
+            if not folder.is_dir():
+                print(f"[SKIP] Folder not found: {folder}")
+                continue
+            for path in sorted(folder.rglob('*')):
+                if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+                    self._ingest_file(path, result)
+        self._prune_refs()
+        self._save_refs()
+        return result
+
+    def gc(self):
+        """Delete blobs that no file uses any more; returns (blobs removed, bytes freed)"""
+        self._prune_refs()
+        referenced = {entry['sha256'] for entry in self.refs.values()}
+        removed = 0
+        freed = 0
+        for blob in self._blobs():
+            st = blob.stat()
+            # A blob still hardlinked from a folder has st_nlink > 1
+            if blob.stem in referenced or st.st_nlink > 1:
+                continue
+            os.chmod(blob, stat.S_IWUSR | stat.S_IRUSR)
+            blob.unlink()
+            removed += 1
+            freed += st.st_size
+        self._save_refs()
+        return removed, freed
+
+    def stats(self):
+        """Logical vs. physical size of everything in the store"""
+        blob_sizes = {}
+        for blob in self._blobs():
+            blob_sizes[blob.stem] = blob.stat().st_size
+        logical = sum(entry['size'] for entry in self.refs.values())
+        linked = sum(1 for entry in self.refs.values() if entry.get('linked'))
+        # Files that could not be linked still take their own space
+        unlinked_bytes = sum(entry['size'] for entry in self.refs.values() if not entry.get('linked'))
+        physical = sum(blob_sizes.values()) + unlinked_bytes
+        return {
+            'files': len(self.refs),
+            'linked_files': linked,
+            'blobs': len(blob_sizes),
+            'logical_bytes': logical,
+            'physical_bytes': physical,
+            'saved_bytes': logical - physical,
+        }
+
+    def _ingest_file(self, path, result):
+        result['files'] += 1
+        rel = path.relative_to(self.base).as_posix()
+        st = path.stat()
+        entry = self.refs.get(rel)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns \
+                and entry['ino'] == st.st_ino:
+            result['unchanged'] += 1
+            return
+
+        sha256 = file_sha256(path)
+        blob = self.blob_path(sha256, path.suffix)
+        linked = False
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(path, blob)
+            except OSError:
+                # No hardlinks here: keep a real copy so the blob exists anyway
+                blob.write_bytes(path.read_bytes())
+                os.chmod(blob, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            else:
+                linked = True
+            result['new_blobs'] += 1
+        elif os.path.samefile(path, blob):
+            linked = True
+            make_writable(path)  # stores from before blobs stayed writable
+        else:
+            tmp_path = path.with_name(path.name + '.link.tmp')
+            try:
+                make_writable(blob)
+                os.link(blob, tmp_path)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"[WARN] Could not link {rel}: {e}")
+                result['not_linked'] += 1
+            else:
+                linked = True
+                result['linked'] += 1
+                # Only the last name of the old copy frees its space
+                if st.st_nlink == 1:
+                    result['reclaimed_bytes'] += st.st_size
+
+        st = path.stat()
+        self.refs[rel] = {
+            'sha256': sha256,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'ino': st.st_ino,
+            'linked': linked,
+        }
+
+    def _prune_refs(self):
+        """Forget files that were deleted since they were ingested"""
+        for rel in [rel for rel in self.refs if not (self.base / rel).is_file()]:
+            del self.refs[rel]
+
+    def _blobs(self):
+        if not self.blobs_dir.exists():
+            return []
+        return [path for path in self.blobs_dir.glob('*/*') if path.is_file()]
+
+    def _load_refs(self):
+        try:
+            with open(self.refs_path, 'r', encoding='utf-8') as f:
+                refs = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if refs.get('version') != REFS_VERSION:
+            return {}
+        return refs.get('files', {})
+
+    def _save_refs(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.refs_path.with_name(self.refs_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': REFS_VERSION, 'files': self.refs}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.refs_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Deduplicate question images by content')
+    parser.add_argument('command', choices=['ingest', 'gc', 'stats'])
+    parser.add_argument('folders', nargs='*', default=list(DEFAULT_FOLDERS),
+                        help='Folders to ingest, relative to the repository')
+    parser.add_argument('--store', default=str(DEFAULT_STORE), help='Store directory')
+    args = parser.parse_args()
+
+    store = ImageStore(args.store)
+    print("=" * 70)
+    print(f"IMAGE STORE - {args.command}")
+    print("=" * 70)
+
+    if args.command == 'ingest':
+        result = store.ingest(args.folders)
+        print(f"[OK] Files scanned:    {result['files']} ({result['unchanged']} unchanged)")
+        print(f"[OK] New blobs:        {result['new_blobs']}")
+        print(f"[OK] Linked to a blob: {result['linked']}")
+        if result['not_linked']:
+            print(f"[WARN] Not linked:     {result['not_linked']}")
+        print(f"[OK] Reclaimed:        {format_bytes(result['reclaimed_bytes'])}")
+    elif args.command == 'gc':
+        removed, freed = store.gc()
+        print(f"[OK] Removed {removed} unreferenced blobs, freed {format_bytes(freed)}")
+
+    stats = store.stats()
+    print()
+    print(f"Files: {stats['files']} ({stats['linked_files']} linked), blobs: {stats['blobs']}")
+    print(f"Logical size:  {format_bytes(stats['logical_bytes'])}")
+    print(f"Physical size: {format_bytes(stats['physical_bytes'])}")
+    print(f"Saved:         {format_bytes(stats['saved_bytes'])}")
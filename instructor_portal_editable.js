@@ -4,6 +4,10 @@ let currentLang = 'en';
 let translations = {};
 let diseaseTranslations = {};
 let editingQuestion = null;
+let searchIndex = null;
+let unindexedIds = new Set();
+let journalAvailable = false; // the proxy's /api/edits journal takes edits instead of whole-file saves
+const journalClient = 'instructor-' + Math.random().toString(36).slice(2, 10);
 
 // Auto-save variables
 let jsonFolderHandle = null;
@@ -183,6 +187,127 @@ async function autoSaveJSON() {
     }
 }
 
+// Apply the edits journaled after `since` (question_journal.py); leaves journalAvailable false without the proxy
+async function syncJournal(since) {
+    try {
+        const response = await fetch(`api/edits?since=${since}`, { cache: 'no-store' });
+        if (!response.ok) return;
+        const data = await response.json();
+        if (data.reload) {
+            console.warn('Question bank was rewritten while loading; reload to see the latest version');
+        }
+        (data.edits || []).forEach(applyJournalEdit);
+        journalAvailable = true;
+        console.log(`✓ Edit journal at #${data.seq}`);
+    } catch (error) {
+        journalAvailable = false;
+    }
+}
+
+function applyJournalEdit(edit) {
+    if (edit.op === 'add') {
+        if (!allQuestions.some(q => q.id === edit.question.id)) {
+            allQuestions.push(edit.question);
+            if (edit.settings) questionSettings[edit.question.id] = edit.settings;
+            unindexedIds.add(edit.question.id);
+        }
+        return;
+    }
+    const question = allQuestions.find(q => q.id === edit.id);
+    if (!question) return;
+    const [head, key] = edit.field.split('.');
+    if (head === 'settings') {
+        questionSettings[edit.id] = { ...questionSettings[edit.id], [key]: edit.value };
+    } else if (key) {
+        question[head] = question[head] || {};
+        question[head][key] = edit.value;
+        unindexedIds.add(edit.id);
+    } else {
+        question[head] = edit.value;
+    }
+}
+
+// Undo a local change the server did not take ('expect' or the client-only 'previous' holds the old value)
+function undoEdit(edit) {
+    if (edit.op === 'add') {
+        allQuestions = allQuestions.filter(q => q !== edit.question);
+        delete questionSettings[edit.question.id];
+        unindexedIds.delete(edit.question.id);
+        return;
+    }
+    applyJournalEdit({ ...edit, value: 'expect' in edit ? edit.expect : edit.previous });
+}
+
+// Save changes: as journal edits through the proxy, or by rewriting the JSON files (auto-save).
+// One call uses one of the two, never both.
+async function saveEdits(edits) {
+    if (!journalAvailable) {
+        await autoSaveJSON();
+        return;
+    }
+    if (edits.length === 0) return;
+    let conflicts = 0;
+    const rejected = [];
+    let sent = 0;
+    try {
+        for (; sent < edits.length; sent += 500) {
+            const batch = edits.slice(sent, sent + 500);
+            const response = await fetch('api/edits', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ client: journalClient, edits: batch.map(({ previous, ...edit }) => edit) })
+            });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const data = await response.json();
+            data.results.forEach((result, i) => {
+                const edit = batch[i];
+                if ('current' in result) {
+                    // Another editor changed this field first: show their value
+                    applyJournalEdit({ ...edit, value: result.current });
+                    conflicts++;
+                } else if (result.error) {
+                    undoEdit(edit);
+                    rejected.push(result.error);
+                } else if (result.id !== undefined && edit.op === 'add') {
+                    // The id was taken by another editor's question
+                    const oldId = edit.question.id;
+                    edit.question.id = result.id;
+                    if (questionSettings[oldId]) {
+                        questionSettings[result.id] = questionSettings[oldId];
+                        delete questionSettings[oldId];
+                    }
+                    unindexedIds.add(result.id);
+                }
+            });
+        }
+    } catch (error) {
+        console.error('Edit journal error:', error);
+        if (sent === 0) {
+            // Nothing reached the journal: save this change the old way instead
+            journalAvailable = false;
+            showToast('[WARN] Edit journal unavailable - saving the JSON files instead');
+            await autoSaveJSON();
+            return;
+        }
+        // Earlier batches are journalled; the rest are not saved anywhere
+        edits.slice(sent).forEach(undoEdit);
+        rejected.push(`${edits.length - sent} change(s) not sent: ${error.message}`);
+    }
+    if (conflicts > 0 || rejected.length > 0) {
+        saveSettings();
+        applyFilters();
+        updateStats();
+    }
+    if (rejected.length > 0) {
+        console.warn('Edits rejected:', rejected);
+        showToast(`[ERROR] ${rejected.length} change(s) were not saved and have been undone: ${rejected[0]}`);
+    } else if (conflicts > 0) {
+        showToast(`[WARN] ${conflicts} change(s) had already been made by another editor - showing theirs`);
+    } else {
+        showToast('[OK] Saved');
+    }
+}
+
 function showToast(message) {
     // Simple toast notification
     const toast = document.createElement('div');
@@ -235,14 +360,23 @@ async function checkFolderAccess() {
 // Load bilingual questions
 async function loadQuestions() {
     try {
+        const searchIndexPromise = loadSearchIndex();
         const response = await fetch('nephro_questions_enhanced.json');
         const data = await response.json();
+        searchIndex = await searchIndexPromise;
 
         // Store translations
         translations = data.interface_translations;
         diseaseTranslations = data.disease_translations;
         allQuestions = data.questions;
 
+        // Questions the search index was built without are searched by scanning
+        unindexedIds = new Set();
+        if (searchIndex) {
+            const indexed = new Set(searchIndex.ids);
+            allQuestions.forEach(q => { if (!indexed.has(q.id)) unindexedIds.add(q.id); });
+        }
+
         // Load settings from JSON file first (if available), then fall back to localStorage
         if (data.question_settings) {
             // Settings from JSON file (most reliable)
@@ -259,6 +393,9 @@ async function loadQuestions() {
             }
         }
 
+        // Edits the proxy journaled since the bank file was last written
+        await syncJournal(data.metadata?.journal_seq || 0);
+
         // Ensure all questions have settings with proper defaults
         allQuestions.forEach(q => {
             if (!questionSettings[q.id]) {
@@ -357,9 +494,11 @@ function getFilteredQuestions() {
     const statusFilter = document.getElementById('filter-status').value;
     const priorityFilter = document.getElementById('filter-priority').value;
     const modalityFilter = document.getElementById('filter-modality').value;
-    const searchTerm = document.getElementById('search-box').value.toLowerCase();
+    const searchText = document.getElementById('search-box').value;
+    const searchTerm = foldText(searchText);
+    const searchScores = searchTerm && searchIndex ? searchIndexScores(searchText) : null;
 
-    return allQuestions.filter(q => {
+    const filtered = allQuestions.filter(q => {
         const settings = questionSettings[q.id] || { active: true, priority: 'none', modality: 'None' };
 
         if (diseaseFilter !== 'all' && q.disease_id !== diseaseFilter) return false;
@@ -369,15 +508,173 @@ function getFilteredQuestions() {
         if (modalityFilter !== 'all' && settings.modality !== modalityFilter) return false;
 
         if (searchTerm) {
-            const searchableText = (
-                q.en.assertion + ' ' + q.en.reason + ' ' + q.en.explanation + ' ' +
-                q.lt.assertion + ' ' + q.lt.reason + ' ' + q.lt.explanation
-            ).toLowerCase();
-            if (!searchableText.includes(searchTerm)) return false;
+            if (searchScores && !unindexedIds.has(q.id)) {
+                if (!searchScores.has(q.id)) return false;
+            } else {
+                const searchableText = foldText(
+                    q.en.assertion + ' ' + q.en.reason + ' ' + q.en.explanation + ' ' +
+                    q.lt.assertion + ' ' + q.lt.reason + ' ' + q.lt.explanation
+                );
+                if (!searchableText.includes(searchTerm)) return false;
+            }
         }
 
         return true;
     });
+
+    // Best matches first when the index ranked them
+    if (searchScores) {
+        filtered.sort((a, b) => (searchScores.get(b.id) || 0) - (searchScores.get(a.id) || 0));
+    }
+    return filtered;
+}
+
+// Lowercase and strip diacritics (ą->a, č->c, ė->e, š->s, ...), as build_search_index.py does
+function foldText(text) {
+    return text.toLowerCase().normalize('NFKD').replace(/\p{Mn}/gu, '');
+}
+
+// Bilingual BM25 index built by build_search_index.py; optional, null if not built
+async function loadSearchIndex() {
+    try {
+        const response = await fetch('search_index.json', { cache: 'no-cache' });
+        if (!response.ok) return null;
+        const data = await response.json();
+        if (data.version !== 1) return null;
+        const analyzers = {};
+        Object.entries(data.analyzers).forEach(([lang, rules]) => {
+            analyzers[lang] = {
+                stopwords: new Set(rules.stopwords),
+                suffixes: rules.suffixes.slice().sort((a, b) => b[0].length - a[0].length),
+                minStem: rules.min_stem
+            };
+        });
+        const fields = {};
+        Object.entries(data.fields).forEach(([lang, field]) => {
+            const totalLength = field.lengths.reduce((sum, length) => sum + length, 0);
+            fields[lang] = {
+                terms: field.terms,
+                postings: field.postings,
+                lengths: field.lengths,
+                avgdl: field.lengths.length ? totalLength / field.lengths.length : 0,
+                decoded: new Map()
+            };
+        });
+        return {
+            ids: data.ids,
+            tokenPattern: new RegExp(data.token_pattern, 'g'),
+            analyzers,
+            fields,
+            k1: data.bm25.k1,
+            b: data.bm25.b
+        };
+    } catch (error) {
+        console.warn('Search index not available:', error);
+        return null;
+    }
+}
+
+function stemToken(analyzer, token) {
+    for (const [suffix, replacement] of analyzer.suffixes) {
+        if (token.endsWith(suffix) && token.length - suffix.length + replacement.length >= analyzer.minStem) {
+            return token.slice(0, token.length - suffix.length) + replacement;
+        }
+    }
+    return token;
+}
+
+// Term numbers for `term` in one language: the exact term, or the most frequent terms starting with it
+function searchTermNumbers(field, term, prefix) {
+    const terms = field.terms;
+    let low = 0;
+    let high = terms.length;
+    while (low < high) {
+        const mid = (low + high) >> 1;
+        if (terms[mid] < term) low = mid + 1; else high = mid;
+    }
+    if (!prefix) {
+        return low < terms.length && terms[low] === term ? [low] : [];
+    }
+    const numbers = [];
+    for (let i = low; i < terms.length && terms[i].startsWith(term); i++) numbers.push(i);
+    if (numbers.length > 64) {
+        numbers.sort((a, b) => field.postings[b].length - field.postings[a].length || a - b);
+        numbers.length = 64;
+    }
+    return numbers;
+}
+
+function searchPostings(field, termNumber) {
+    let decoded = field.decoded.get(termNumber);
+    if (!decoded) {
+        const flat = field.postings[termNumber];
+        decoded = [];
+        let doc = 0;
+        for (let i = 0; i < flat.length; i += 2) {
+            doc += flat[i];
+            decoded.push([doc, flat[i + 1]]);
+        }
+        field.decoded.set(termNumber, decoded);
+    }
+    return decoded;
+}
+
+// Map of question id -> BM25 score for questions containing every word of `query` (the last as a prefix
+// while it is being typed); null when the query has no words, so the caller scans instead
+function searchIndexScores(query) {
+    const words = foldText(query).match(searchIndex.tokenPattern) || [];
+    if (words.length === 0) return null;
+    const prefixLast = !/\s$/.test(query);
+    const languages = Object.keys(searchIndex.analyzers);
+    let scores = null;
+
+    for (let position = 0; position < words.length; position++) {
+        const word = words[position];
+        const prefix = prefixLast && position === words.length - 1;
+        const wordScores = new Map();
+        languages.forEach(lang => {
+            const analyzer = searchIndex.analyzers[lang];
+            if (analyzer.stopwords.has(word) && !prefix) return;
+            const stem = stemToken(analyzer, word);
+            let term = stem;
+            if (prefix) {
+                let common = 0;
+                while (common < word.length && common < stem.length && word[common] === stem[common]) common++;
+                term = word.slice(0, common);
+            }
+            const field = searchIndex.fields[lang];
+            const avgdl = field.avgdl || 1;
+            searchTermNumbers(field, term, prefix).forEach(termNumber => {
+                const postings = searchPostings(field, termNumber);
+                const total = field.lengths.length;
+                const idf = Math.log(1 + (total - postings.length + 0.5) / (postings.length + 0.5));
+                postings.forEach(([doc, tf]) => {
+                    const score = idf * tf * (searchIndex.k1 + 1) /
+                        (tf + searchIndex.k1 * (1 - searchIndex.b + searchIndex.b * field.lengths[doc] / avgdl));
+                    wordScores.set(doc, (wordScores.get(doc) || 0) + score);
+                });
+            });
+        });
+        if (wordScores.size === 0) {
+            // A stopword in every language does not narrow the search
+            if (languages.every(lang => searchIndex.analyzers[lang].stopwords.has(word))) continue;
+            return new Map();
+        }
+        if (scores === null) {
+            scores = wordScores;
+        } else {
+            const combined = new Map();
+            scores.forEach((score, doc) => {
+                if (wordScores.has(doc)) combined.set(doc, score + wordScores.get(doc));
+            });
+            scores = combined;
+        }
+        if (scores.size === 0) return new Map();
+    }
+
+    const byId = new Map();
+    if (scores) scores.forEach((score, doc) => byId.set(searchIndex.ids[doc], score));
+    return byId;
 }
 
 function applyFilters() {
@@ -563,14 +860,17 @@ async function saveEdit(qId) {
     const card = document.getElementById('q-' + qId);
     const textareas = card.querySelectorAll('.edit-textarea');
     const question = allQuestions.find(q => q.id === qId);
+    const edits = [];
 
     textareas.forEach(textarea => {
         const field = textarea.getAttribute('data-field');
         const parts = field.split('.');
-        if (parts.length === 2) {
+        if (parts.length === 2 && question[parts[0]][parts[1]] !== textarea.value) {
+            edits.push({ op: 'set', id: qId, field, value: textarea.value, expect: question[parts[0]][parts[1]] });
             question[parts[0]][parts[1]] = textarea.value;
         }
     });
+    unindexedIds.add(qId);
 
     // Update display
     card.querySelectorAll('.content-text').forEach((div, index) => {
@@ -584,9 +884,9 @@ async function saveEdit(qId) {
     editingQuestion = null;
 
     // Auto-save if enabled
-    await autoSaveJSON();
+    await saveEdits(edits);
 
-    if (!autoSaveEnabled) {
+    if (!autoSaveEnabled && !journalAvailable) {
         alert('Changes saved in browser! Use "Export JSON" to save permanently.');
     }
 }
@@ -616,86 +916,104 @@ async function toggleActive(qId) {
     if (!questionSettings[qId]) {
         questionSettings[qId] = { active: true, priority: 'none', modality: 'None' };
     }
-    questionSettings[qId].active = !questionSettings[qId].active;
+    const previous = questionSettings[qId].active;
+    questionSettings[qId].active = !previous;
     saveSettings();
     applyFilters();
     updateStats();
-    await autoSaveJSON();
+    await saveEdits([{ op: 'set', id: qId, field: 'settings.active', value: !previous, expect: previous }]);
 }
 
 async function setPriority(qId, priority) {
     if (!questionSettings[qId]) {
         questionSettings[qId] = { active: true, priority: 'none', modality: 'None' };
     }
+    const previous = questionSettings[qId].priority;
     questionSettings[qId].priority = priority;
     saveSettings();
     applyFilters();
     updateStats();
-    await autoSaveJSON();
+    await saveEdits([{ op: 'set', id: qId, field: 'settings.priority', value: priority, expect: previous }]);
 }
 
 async function setModality(qId, modality) {
     if (!questionSettings[qId]) {
         questionSettings[qId] = { active: true, priority: 'none', modality: 'None' };
     }
+    const previous = questionSettings[qId].modality;
     questionSettings[qId].modality = modality;
     saveSettings();
     applyFilters();
     updateStats();
-    await autoSaveJSON();
+    await saveEdits([{ op: 'set', id: qId, field: 'settings.modality', value: modality, expect: previous }]);
+}
+
+// Bulk edits do not check for conflicts; `previous` lets saveEdits undo a rejected one
+function activeEdit(qId, active) {
+    return { op: 'set', id: qId, field: 'settings.active', value: active,
+             previous: questionSettings[qId]?.active ?? true };
 }
 
 async function activateAll() {
+    const edits = allQuestions.map(q => activeEdit(q.id, true));
     allQuestions.forEach(q => {
         questionSettings[q.id] = { ...questionSettings[q.id], active: true };
     });
     saveSettings();
     applyFilters();
     updateStats();
-    await autoSaveJSON();
+    await saveEdits(edits);
 }
 
 async function deactivateAll() {
+    const edits = allQuestions.map(q => activeEdit(q.id, false));
     allQuestions.forEach(q => {
         questionSettings[q.id] = { ...questionSettings[q.id], active: false };
     });
     saveSettings();
     applyFilters();
     updateStats();
-    await autoSaveJSON();
+    await saveEdits(edits);
 }
 
 async function activateFiltered() {
     const filtered = getFilteredQuestions();
+    const edits = filtered.map(q => activeEdit(q.id, true));
     filtered.forEach(q => {
         questionSettings[q.id] = { ...questionSettings[q.id], active: true };
     });
     saveSettings();
     applyFilters();
     updateStats();
-    await autoSaveJSON();
+    await saveEdits(edits);
 }
 
 async function deactivateFiltered() {
     const filtered = getFilteredQuestions();
+    const edits = filtered.map(q => activeEdit(q.id, false));
     filtered.forEach(q => {
         questionSettings[q.id] = { ...questionSettings[q.id], active: false };
     });
     saveSettings();
     applyFilters();
     updateStats();
-    await autoSaveJSON();
+    await saveEdits(edits);
 }
 
 async function resetAll() {
     if (confirm('Reset all settings to default? This cannot be undone.')) {
+        const edits = allQuestions.flatMap(q => [
+            activeEdit(q.id, true),
+            { op: 'set', id: q.id, field: 'settings.priority', value: 'none',
+              previous: questionSettings[q.id]?.priority ?? 'none' }
+        ]);
         allQuestions.forEach(q => {
             questionSettings[q.id] = { active: true, priority: 'none' };
         });
         saveSettings();
         applyFilters();
         updateStats();
-        await autoSaveJSON();
+        await saveEdits(edits);
     }
 }
 
@@ -882,6 +1200,8 @@ function importData(event) {
             allQuestions = data.questions;
             translations = data.interface_translations;
             diseaseTranslations = data.disease_translations;
+            // The index describes the bank it was built from, not the imported one
+            searchIndex = null;
 
             populateDiseaseFilter();
             applyFilters();
@@ -1015,8 +1335,8 @@ async function readPDFFile(file) {
     }
 }
 
-// Call Claude API to generate questions
-async function callClaudeAPI(content, apiKey, sourceFileName) {
+// Build the Messages API request for one source file
+function buildGenerationRequest(content, sourceFileName) {
     const prompt = `You are a medical education expert specializing in nephropathology. Generate high-quality bilingual (English and Lithuanian) assessment questions based on the following content.
 
 Content from "${sourceFileName}":
@@ -1048,6 +1368,31 @@ Requirements:
 - Assign appropriate disease category and difficulty
 - Maintain medical terminology consistency between languages`;
 
+    return {
+        model: 'claude-3-5-haiku-20241022',
+        max_tokens: 4096,
+        messages: [{
+            role: 'user',
+            content: prompt
+        }]
+    };
+}
+
+// Pull the questions JSON out of a Messages API response
+function parseGeneratedQuestions(data) {
+    const content = data.content[0].text;
+
+    // Parse JSON from response
+    const jsonMatch = content.match(/\{[\s\S]*\}/);
+    if (!jsonMatch) {
+        throw new Error('Could not parse JSON from response');
+    }
+
+    return JSON.parse(jsonMatch[0]);
+}
+
+// Call Claude API to generate questions
+async function callClaudeAPI(content, apiKey, sourceFileName) {
     try {
         // Use local proxy server to avoid CORS issues
         const response = await fetch('http://localhost:8081/api/claude', {
@@ -1057,14 +1402,7 @@ Requirements:
             },
             body: JSON.stringify({
                 api_key: apiKey,
-                request: {
-                    model: 'claude-3-5-haiku-20241022',
-                    max_tokens: 4096,
-                    messages: [{
-                        role: 'user',
-                        content: prompt
-                    }]
-                }
+                request: buildGenerationRequest(content, sourceFileName)
             })
         });
 
@@ -1074,22 +1412,61 @@ Requirements:
             throw new Error(error.error?.message || JSON.stringify(error) || 'API call failed');
         }
 
-        const data = await response.json();
-        const content = data.content[0].text;
-
-        // Parse JSON from response
-        const jsonMatch = content.match(/\{[\s\S]*\}/);
-        if (!jsonMatch) {
-            throw new Error('Could not parse JSON from response');
-        }
-
-        return JSON.parse(jsonMatch[0]);
+        return parseGeneratedQuestions(await response.json());
     } catch (error) {
         console.error('Claude API error:', error);
         throw error;
     }
 }
 
+// Send all source files to the proxy's batch endpoint at once.
+// The proxy runs them in parallel and streams back one NDJSON line per
+// file as it finishes; onItem(line) is called for each of them.
+async function callClaudeBatch(sources, apiKey, onItem) {
+    const response = await fetch('http://localhost:8081/api/claude/batch', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            api_key: apiKey,
+            requests: sources.map(source => buildGenerationRequest(source.content, source.name))
+        })
+    });
+
+    if (!response.ok) {
+        const text = await response.text();
+        throw new Error(text || 'Batch request failed');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    let summary = null;
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+
+        let newline;
+        while ((newline = buffered.indexOf('\n')) >= 0) {
+            const line = buffered.slice(0, newline).trim();
+            buffered = buffered.slice(newline + 1);
+            if (!line) continue;
+
+            const item = JSON.parse(line);
+            if (item.type === 'done') {
+                summary = item;
+            } else {
+                onItem(item);
+            }
+        }
+    }
+
+    return summary;
+}
+
 // Main generate questions function
 async function generateQuestions() {
     const apiKey = document.getElementById('claude-api-key').value.trim();
@@ -1115,29 +1492,54 @@ async function generateQuestions() {
     generatedQuestionsCache = [];
 
     try {
-        for (let i = 0; i < files.length; i++) {
-            const file = files[i];
-            updateStatus(`Reading ${file.name}...`, (i / files.length) * 50);
-
-            const content = await readFileContent(file);
-            if (!content) continue;
-
-            updateStatus(`Generating questions from ${file.name}...`, 50 + (i / files.length) * 50);
+        // Read every file in parallel, then send them upstream as one batch
+        updateStatus(`Reading ${files.length} file(s)...`, 5);
+        const contents = await Promise.all(Array.from(files).map(readFileContent));
+        const sources = [];
+        Array.from(files).forEach((file, i) => {
+            if (contents[i]) sources.push({ name: file.name, content: contents[i] });
+        });
 
-            const result = await callClaudeAPI(content, apiKey, file.name);
+        if (sources.length === 0) {
+            updateStatus('❌ Error: No readable content in the selected files', 0);
+            return;
+        }
 
-            // Add metadata to each question
-            const timestamp = new Date().toISOString();
-            result.questions.forEach(q => {
-                q.source_file = file.name;
-                q.generated_timestamp = timestamp;
-                q.id = Date.now() + Math.random(); // Temporary ID
-            });
+        updateStatus(`Generating questions from ${sources.length} file(s)...`, 10);
+        const failures = [];
+
+        const summary = await callClaudeBatch(sources, apiKey, item => {
+            const source = sources[item.index];
+            if (item.type === 'result') {
+                try {
+                    const result = parseGeneratedQuestions(item.response);
+
+                    // Add metadata to each question
+                    const timestamp = new Date().toISOString();
+                    result.questions.forEach(q => {
+                        q.source_file = source.name;
+                        q.generated_timestamp = timestamp;
+                        q.id = Date.now() + Math.random(); // Temporary ID
+                    });
+
+                    generatedQuestionsCache.push(...result.questions);
+                } catch (error) {
+                    failures.push(`${source.name}: ${error.message}`);
+                }
+            } else {
+                failures.push(`${source.name}: ${item.error?.message || 'HTTP ' + item.status}`);
+            }
+            updateStatus(`Generated from ${item.completed}/${item.total} files (${source.name})...`,
+                10 + (item.completed / item.total) * 90);
+        });
 
-            generatedQuestionsCache.push(...result.questions);
+        if (failures.length > 0) {
+            console.error('Generation failures:', failures);
         }
 
-        updateStatus(`✅ Generated ${generatedQuestionsCache.length} questions successfully!`, 100);
+        const seconds = summary ? ` in ${summary.seconds}s` : '';
+        const failedNote = failures.length > 0 ? ` (${failures.length} file(s) failed, see console)` : '';
+        updateStatus(`✅ Generated ${generatedQuestionsCache.length} questions successfully${seconds}!${failedNote}`, 100);
         showGeneratedQuestions();
     } catch (error) {
         updateStatus(`❌ Error: ${error.message}`, 0);
@@ -1187,6 +1589,7 @@ async function addGeneratedQuestions() {
     }
 
     const startId = Math.max(...allQuestions.map(q => q.id), 0) + 1;
+    const edits = [];
 
     generatedQuestionsCache.forEach((q, idx) => {
         const newQuestion = {
@@ -1210,10 +1613,12 @@ async function addGeneratedQuestions() {
         };
 
         allQuestions.push(newQuestion);
+        unindexedIds.add(newQuestion.id);
+        edits.push({ op: 'add', question: newQuestion });
     });
 
     // Save to JSON
-    await autoSaveJSON();
+    await saveEdits(edits);
 
     // Refresh display
     applyFilters();
@@ -3,122 +3,247 @@ Image Migration Script
 Moves images from Textbook_LT/extracted_images/ to question_images/
 Renames to standard format: question_[ID].[ext]
 Updates database with new paths
+
+Incremental by default: question_images/.migration_manifest.json remembers
+each copied file's source (path, size, mtime, SHA-256), so unchanged images
+are skipped without being read again. Use --full to recopy everything.
+
+With --store the questions are read from and written back to the SQLite
+question bank (question_store.py), one image path at a time, instead of
+rewriting a JSON file.
 """
 
+import argparse
+import hashlib
 import json
 import os
 import shutil
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 
-print("=" * 70)
-print("IMAGE MIGRATION - Move to question_images folder")
-print("=" * 70)
-print()
-
-# Paths
 current_dir = Path(__file__).parent
-db_path = current_dir / 'nephro_questions_enhanced.json'
-old_images_base = current_dir / 'Textbook_LT' / 'extracted_images'
-new_images_folder = current_dir / 'question_images'
-
-# Create question_images folder if it doesn't exist
-new_images_folder.mkdir(exist_ok=True)
-print(f"[OK] Created/verified folder: {new_images_folder}")
-print()
-
-# Load database
-print("Loading database...")
-with open(db_path, 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
-questions = data['questions']
-print(f"[OK] Loaded {len(questions)} questions")
-print()
-
-# Track statistics
-migrated = 0
-skipped = 0
-errors = 0
-
-print("Migrating images...")
-print("-" * 70)
-
-for question in questions:
-    if 'image' not in question or not question['image']:
-        continue
-
-    old_path_rel = question['image']  # e.g., "extracted_images/MCD/MCD_slide13_img1.jpg"
-    question_id = question['id']
+MANIFEST_NAME = '.migration_manifest.json'
+MANIFEST_VERSION = 1
+
+def file_sha256(path):
+    """SHA-256 of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(path):
+    """Manifest entries keyed by destination file name ({} if missing or unreadable)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+def save_manifest(path, entries):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': entries}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def is_unchanged(entry, source_rel, source_stat, dest_path):
+    """True if the manifest says dest_path already holds this exact source file"""
+    if not entry or entry.get('source') != source_rel:
+        return False
+    if entry.get('size') != source_stat.st_size or entry.get('mtime_ns') != source_stat.st_mtime_ns:
+        return False
+    try:
+        dest_stat = dest_path.stat()
+    except OSError:
+        return False
+    return entry.get('dest_size') == dest_stat.st_size and entry.get('dest_mtime_ns') == dest_stat.st_mtime_ns
+
+def migrate_one(job, entry, full):
+    """Copy one image unless the destination already matches it.
+
+    Returns (status, manifest entry) where status is 'unchanged',
+    'identical' (destination had the same bytes) or 'copied'.
+    """
+    source_path, source_rel, dest_path = job
+    source_stat = source_path.stat()
+    if not full and is_unchanged(entry, source_rel, source_stat, dest_path):
+        return 'unchanged', entry
+
+    sha256 = file_sha256(source_path)
+    if not full and dest_path.exists() and dest_path.stat().st_size == source_stat.st_size \
+            and file_sha256(dest_path) == sha256:
+        status = 'identical'
+    else:
+        tmp_path = dest_path.with_name(dest_path.name + '.tmp')
+        shutil.copy2(source_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+        status = 'copied'
+
+    dest_stat = dest_path.stat()
+    return status, {
+        'source': source_rel,
+        'size': source_stat.st_size,
+        'mtime_ns': source_stat.st_mtime_ns,
+        'sha256': sha256,
+        'dest_size': dest_stat.st_size,
+        'dest_mtime_ns': dest_stat.st_mtime_ns,
+    }
 
-    # Full path to old image
-    old_path = current_dir / 'Textbook_LT' / old_path_rel
+def migrate(db_path, output_path, new_images_folder, full=False, workers=8, store=None):
+    print("=" * 70)
+    print("IMAGE MIGRATION - Move to question_images folder")
+    print("=" * 70)
+    print()
 
-    # Check if old image exists
-    if not old_path.exists():
-        print(f"[SKIP] Question #{question_id}: Image not found - {old_path_rel}")
-        skipped += 1
-        continue
+    # Create question_images folder if it doesn't exist
+    new_images_folder.mkdir(exist_ok=True)
+    print(f"[OK] Created/verified folder: {new_images_folder}")
+    manifest_path = new_images_folder / MANIFEST_NAME
+    manifest = {} if full else load_manifest(manifest_path)
+    print(f"[OK] Mode: {'full' if full else 'incremental'} ({len(manifest)} files in manifest)")
+    print()
 
-    # Get file extension
-    extension = old_path.suffix  # e.g., ".jpg"
+    # Load database
+    print("Loading database...")
+    if store:
+        questions = store.query(has_image=True)
+        print(f"[OK] Loaded {len(questions)} questions with images from {store.path.name}")
+    else:
+        with open(db_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        questions = data['questions']
+        print(f"[OK] Loaded {len(questions)} questions")
+    print()
 
-    # New standardized name
-    new_filename = f"question_{question_id}{extension}"
-    new_path = new_images_folder / new_filename
+    # Track statistics
+    already = 0
+    skipped = 0
+    errors = 0
+
+    print("Migrating images...")
+    print("-" * 70)
+
+    jobs = []
+    for question in questions:
+        if 'image' not in question or not question['image']:
+            continue
+
+        old_path_rel = question['image']  # e.g., "extracted_images/MCD/MCD_slide13_img1.jpg"
+        question_id = question['id']
+
+        if old_path_rel.startswith('question_images/'):
+            already += 1
+            continue
+
+        # Full path to old image
+        old_path = current_dir / 'Textbook_LT' / old_path_rel
+
+        # Check if old image exists
+        if not old_path.is_file():
+            print(f"[SKIP] Question #{question_id}: Image not found - {old_path_rel}")
+            skipped += 1
+            continue
+
+        # New standardized name
+        new_filename = f"question_{question_id}{old_path.suffix}"
+        jobs.append((question, (old_path, old_path_rel, new_images_folder / new_filename)))
+
+    counts = {'copied': 0, 'identical': 0, 'unchanged': 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(migrate_one, job, manifest.get(job[2].name), full) for _, job in jobs]
+        for (question, (old_path, _, new_path)), future in zip(jobs, futures):
+            try:
+                status, entry = future.result()
+            except Exception as e:
+                print(f"[ERROR] Question #{question['id']}: Error - {str(e)}")
+                errors += 1
+                continue
+
+            # Update question with new path
+            question['image'] = f"question_images/{new_path.name}"
+            manifest[new_path.name] = entry
+            counts[status] += 1
+            if status == 'copied':
+                print(f"[OK] Question #{question['id']}: {old_path.name} -> {new_path.name}")
+
+    save_manifest(manifest_path, manifest)
+    migrated = sum(counts.values())
 
-    try:
-        # Copy image to new location
-        shutil.copy2(old_path, new_path)
-
-        # Update question with new path
-        question['image'] = f"question_images/{new_filename}"
-
-        print(f"[OK] Question #{question_id}: {old_path.name} -> {new_filename}")
-        migrated += 1
-
-    except Exception as e:
-        print(f"[ERROR] Question #{question_id}: Error - {str(e)}")
-        errors += 1
-
-print()
-print("=" * 70)
-print("MIGRATION COMPLETE")
-print("=" * 70)
-print()
-print(f"Statistics:")
-print(f"  [OK] Migrated: {migrated} images")
-print(f"  [SKIP] Skipped:  {skipped} (not found)")
-print(f"  [ERROR] Errors:   {errors}")
-print()
-
-if migrated > 0:
-    # Save updated database
-    output_path = current_dir / 'nephro_questions_migrated.json'
-
-    # Update metadata
-    data['metadata']['updated'] = datetime.now().isoformat()
-    data['metadata']['version'] = "4.2-migrated"
-    data['metadata']['image_migration'] = {
-        'migrated': migrated,
-        'skipped': skipped,
-        'errors': errors,
-        'new_location': 'question_images/'
-    }
+    print()
+    print("=" * 70)
+    print("MIGRATION COMPLETE")
+    print("=" * 70)
+    print()
+    print(f"Statistics:")
+    print(f"  [OK] Migrated: {migrated} images")
+    print(f"       copied {counts['copied']}, identical {counts['identical']}, unchanged {counts['unchanged']}")
+    print(f"  [OK] Already in question_images/: {already}")
+    print(f"  [SKIP] Skipped:  {skipped} (not found)")
+    print(f"  [ERROR] Errors:   {errors}")
+    print()
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    if migrated > 0:
+        # Update metadata
+        metadata = (store.get_section('metadata') or {}) if store else data['metadata']
+        metadata['updated'] = datetime.now().isoformat()
+        metadata['version'] = "4.2-migrated"
+        metadata['image_migration'] = {
+            'migrated': migrated,
+            'copied': counts['copied'],
+            'skipped': skipped,
+            'errors': errors,
+            'new_location': 'question_images/'
+        }
+
+        if store:
+            # One row per migrated question instead of a full rewrite
+            for question, (_, _, new_path) in jobs:
+                if question['image'] == f"question_images/{new_path.name}":
+                    store.set_image(question['id'], question['image'])
+            store.set_section('metadata', metadata)
+            print(f"[OK] Updated image paths in {store.path.name}")
+        else:
+            # Save updated database
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            print(f"[OK] Saved updated database: {output_path.name}")
+
+        print()
+        print("Next steps:")
+        print("  1. Review: question_images/ folder (contains all migrated images)")
+        if store:
+            print("  2. Export: python question_store.py export")
+        else:
+            print(f"  2. Rename: {output_path.name} → nephro_questions_enhanced.json")
+            print("     (backup the old one first!)")
+        print("  3. Test: Open both portals and verify images display")
+        print("  4. Clean up: You can delete Textbook_LT/extracted_images/ if all works")
+    else:
+        print("No images were migrated. Check the paths and try again.")
 
-    print(f"[OK] Saved updated database: {output_path.name}")
     print()
-    print("Next steps:")
-    print("  1. Review: question_images/ folder (contains all migrated images)")
-    print("  2. Rename: nephro_questions_migrated.json → nephro_questions_enhanced.json")
-    print("     (backup the old one first!)")
-    print("  3. Test: Open both portals and verify images display")
-    print("  4. Clean up: You can delete Textbook_LT/extracted_images/ if all works")
-else:
-    print("No images were migrated. Check the paths and try again.")
-
-print()
-print("=" * 70)
+    print("=" * 70)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Copy question images into question_images/')
+    parser.add_argument('--db', default=str(current_dir / 'nephro_questions_enhanced.json'),
+                        help='Question database to read')
+    parser.add_argument('--output', default=str(current_dir / 'nephro_questions_migrated.json'),
+                        help='Where to write the updated database')
+    parser.add_argument('--images', default=str(current_dir / 'question_images'),
+                        help='Destination folder')
+    parser.add_argument('--full', action='store_true',
+                        help='Ignore the manifest and copy every image again')
+    parser.add_argument('--workers', type=int, default=8, help='Parallel copy threads')
+    parser.add_argument('--store', help='Update this SQLite question bank (question_store.py) instead of --db/--output')
+    args = parser.parse_args()
+    store = None
+    if args.store:
+        from question_store import QuestionStore
+        store = QuestionStore(args.store)
+    migrate(Path(args.db), Path(args.output), Path(args.images), full=args.full, workers=args.workers, store=store)
@@ -0,0 +1,203 @@
+"""
+Load test for claude_proxy_server.py
+Starts a local stub of the Messages API that answers after a fixed delay,
+runs the proxy in front of it with different worker counts and measures
+requests/second. With a serial server throughput stays flat; with the
+worker pool it should grow with concurrency.
+
+With --sse it instead compares time-to-first-byte for a buffered request
+and a "stream": true request against a stub that emits server-sent events.
+
+Usage: python proxy_load_test.py [--delay 0.5] [--requests 32] [--sse]
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import http.client
+import json
+import threading
+import time
+import urllib.request
+import urllib.error
+
+from claude_proxy_server import ClaudeProxyHandler, ConcurrentProxyServer
+
+class StubUpstreamHandler(BaseHTTPRequestHandler):
+    """Pretends to be /v1/messages: waits `delay` seconds, returns a canned reply"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    delay = 0.5
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if request.get('stream'):
+            self._stream_events()
+            return
+        time.sleep(self.delay)
+        body = json.dumps({
+            'id': 'msg_stub',
+            'type': 'message',
+            'role': 'assistant',
+            'content': [{'type': 'text', 'text': '{"questions": []}'}],
+            'usage': {'input_tokens': 10, 'output_tokens': 5}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_events(self, events=10):
+        """Emit `events` text deltas spread evenly over `delay` seconds"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i in range(events):
+            time.sleep(self.delay / events)
+            data = json.dumps({'type': 'content_block_delta', 'index': 0,
+                               'delta': {'type': 'text_delta', 'text': f'token{i} '}})
+            event = f'event: content_block_delta\ndata: {data}\n\n'.encode('utf-8')
+            self.wfile.write(b'%X\r\n%s\r\n' % (len(event), event))
+        stop = b'event: message_stop\ndata: {"type": "message_stop"}\n\n'
+        self.wfile.write(b'%X\r\n%s\r\n0\r\n\r\n' % (len(stop), stop))
+
+    def log_message(self, format, *args):
+        pass
+
+class QuietProxyHandler(ClaudeProxyHandler):
+    def log_message(self, format, *args):
+        pass
+
+def start_in_thread(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+def post_once(url, index):
+    payload = json.dumps({
+        'api_key': 'stub-key',
+        'request': {
+            'model': 'claude-3-5-haiku-20241022',
+            'max_tokens': 64,
+            'messages': [{'role': 'user', 'content': f'load test prompt {index}'}]
+        }
+    }).encode('utf-8')
+    req = urllib.request.Request(url, data=payload, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except urllib.error.URLError:
+        return None
+
+def run_level(upstream_url, workers, concurrency, total, backlog):
+    proxy = ConcurrentProxyServer(('127.0.0.1', 0), QuietProxyHandler,
+                                  workers=workers, backlog=backlog, upstream_url=upstream_url)
+    start_in_thread(proxy)
+    url = f'http://127.0.0.1:{proxy.server_address[1]}/api/claude'
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        statuses = list(executor.map(lambda i: post_once(url, i), range(total)))
+    elapsed = time.perf_counter() - started
+
+    pool_stats = proxy.upstream_pool.stats()
+    proxy.shutdown()
+    proxy.server_close()
+    return elapsed, statuses, pool_stats
+
+def time_to_first_byte(port, stream):
+    """Return (seconds to first body byte, total seconds, body size) for one request"""
+    payload = json.dumps({
+        'api_key': 'stub-key',
+        'request': {
+            'model': 'claude-3-5-haiku-20241022',
+            'max_tokens': 64,
+            'stream': stream,
+            'messages': [{'role': 'user', 'content': f'streaming check {stream}'}]
+        }
+    })
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    started = time.perf_counter()
+    conn.request('POST', '/api/claude', body=payload,
+                 headers={'Content-Type': 'application/json', 'X-Cache-Bypass': '1'})
+    response = conn.getresponse()
+    first = response.read1(65536)
+    first_at = time.perf_counter() - started
+    size = len(first)
+    while True:
+        chunk = response.read1(65536)
+        if not chunk:
+            break
+        size += len(chunk)
+    conn.close()
+    return first_at, time.perf_counter() - started, size
+
+def run_sse_check(upstream_url):
+    proxy = ConcurrentProxyServer(('127.0.0.1', 0), QuietProxyHandler, workers=2,
+                                  upstream_url=upstream_url)
+    start_in_thread(proxy)
+    port = proxy.server_address[1]
+
+    print(f"{'mode':>10} {'first byte':>11} {'total':>8} {'bytes':>7}")
+    print("-" * 70)
+    for label, stream in (('buffered', False), ('stream', True)):
+        first_at, total, size = time_to_first_byte(port, stream)
+        print(f"{label:>10} {first_at:>10.3f}s {total:>7.3f}s {size:>7}")
+
+    proxy.shutdown()
+    proxy.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--delay', type=float, default=0.5, help='Stub upstream latency in seconds')
+    parser.add_argument('--requests', type=int, default=32, help='Requests per level')
+    parser.add_argument('--levels', default='1,2,4,8,16', help='Worker/concurrency levels to test')
+    parser.add_argument('--sse', action='store_true', help='Check streaming pass-through instead')
+    args = parser.parse_args()
+
+    StubUpstreamHandler.delay = args.delay
+    upstream = ThreadingHTTPServer(('127.0.0.1', 0), StubUpstreamHandler)
+    start_in_thread(upstream)
+    upstream_url = f'http://127.0.0.1:{upstream.server_address[1]}/v1/messages'
+
+    print("=" * 70)
+    print("CLAUDE PROXY LOAD TEST")
+    print("=" * 70)
+    print(f"Stub upstream latency: {args.delay:.2f}s")
+    print()
+
+    if args.sse:
+        run_sse_check(upstream_url)
+        upstream.shutdown()
+        upstream.server_close()
+        print("=" * 70)
+        return
+
+    print(f"{args.requests} requests per level")
+    print(f"{'workers':>8} {'clients':>8} {'seconds':>9} {'req/s':>8} {'ok':>5} {'503':>5} {'pool hit':>9} {'miss':>5}")
+    print("-" * 70)
+
+    for level in [int(x) for x in args.levels.split(',')]:
+        elapsed, statuses, pool = run_level(upstream_url, level, level, args.requests, backlog=args.requests)
+        ok = statuses.count(200)
+        busy = statuses.count(503)
+        print(f"{level:>8} {level:>8} {elapsed:>9.2f} {len(statuses) / elapsed:>8.2f} {ok:>5} {busy:>5}"
+              f" {pool['hits']:>9} {pool['misses']:>5}")
+
+    print()
+    print("Backlog check: 2 workers, backlog 2, 16 simultaneous clients")
+    elapsed, statuses, _ = run_level(upstream_url, 2, 16, 16, backlog=2)
+    print(f"  200: {statuses.count(200)}  503: {statuses.count(503)}  failed: {statuses.count(None)}")
+
+    upstream.shutdown()
+    upstream.server_close()
+    print("=" * 70)
+
+if __name__ == '__main__':
+    main()
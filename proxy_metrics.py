@@ -0,0 +1,159 @@
+"""
+Request metrics for the Claude proxy, exposed at /metrics
+Counts requests per route and status, tracks bytes in/out and in-flight
+requests, and keeps latency histograms for whole requests and for the
+upstream calls alone. Rendered in the Prometheus text exposition format.
+"""
+
+import bisect
+import threading
+from collections import deque
+
+# Upper bounds in seconds; generation calls run from ~1 s to well over a minute
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+QUANTILES = (0.5, 0.95, 0.99)
+
+class LatencyHistogram:
+    """Cumulative bucket counts plus a window of recent samples for quantiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=2048):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def quantiles(self):
+        if not self.recent:
+            return {q: 0.0 for q in QUANTILES}
+        ordered = sorted(self.recent)
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+class ProxyMetrics:
+    """Thread-safe registry of everything /metrics reports"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}          # (route, method, status) -> count
+        self.request_latency = {}   # route -> LatencyHistogram
+        self.upstream_calls = {}    # status -> count
+        self.upstream_latency = LatencyHistogram()
+        self.bytes_in = {}          # route -> bytes
+        self.bytes_out = {}         # route -> bytes
+        self.in_flight = 0
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, route, method, status, seconds, bytes_in, bytes_out):
+        with self._lock:
+            self.in_flight -= 1
+            key = (route, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.request_latency.setdefault(route, LatencyHistogram()).observe(seconds)
+            self.bytes_in[route] = self.bytes_in.get(route, 0) + bytes_in
+            self.bytes_out[route] = self.bytes_out.get(route, 0) + bytes_out
+
+    def request_abandoned(self):
+        """A connection closed before a request line was read"""
+        with self._lock:
+            self.in_flight -= 1
+
+    def observe_upstream(self, status, seconds):
+        with self._lock:
+            key = str(status)
+            self.upstream_calls[key] = self.upstream_calls.get(key, 0) + 1
+            self.upstream_latency.observe(seconds)
+
+    def render(self, component_stats=None):
+        """Prometheus text format; component_stats adds gauges such as cache or pool counters"""
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP claude_proxy_requests_total Requests handled, by route, method and status.',
+                '# TYPE claude_proxy_requests_total counter',
+            ]
+            for (route, method, status), count in sorted(self.requests.items()):
+                lines.append(f'claude_proxy_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+
+            lines += [
+                '# HELP claude_proxy_in_flight_requests Requests currently being handled.',
+                '# TYPE claude_proxy_in_flight_requests gauge',
+                f'claude_proxy_in_flight_requests {self.in_flight}',
+            ]
+
+            for name, help_text, totals in (
+                    ('claude_proxy_received_bytes_total', 'Request body bytes received from clients', self.bytes_in),
+                    ('claude_proxy_sent_bytes_total', 'Response bytes (headers included) sent to clients', self.bytes_out)):
+                lines += [f'# HELP {name} {help_text}, by route.', f'# TYPE {name} counter']
+                for route, total in sorted(totals.items()):
+                    lines.append(f'{name}{{route="{route}"}} {total}')
+
+            lines += [
+                '# HELP claude_proxy_request_duration_seconds Time to handle a request end to end.',
+                '# TYPE claude_proxy_request_duration_seconds histogram',
+            ]
+            for route, histogram in sorted(self.request_latency.items()):
+                lines += self._histogram_lines('claude_proxy_request_duration_seconds', histogram, f'route="{route}"')
+            lines += [
+                '# HELP claude_proxy_request_latency_seconds Recent end-to-end latency quantiles.',
+                '# TYPE claude_proxy_request_latency_seconds summary',
+            ]
+            for route, histogram in sorted(self.request_latency.items()):
+                lines += self._summary_lines('claude_proxy_request_latency_seconds', histogram, f'route="{route}"')
+
+            lines += [
+                '# HELP claude_proxy_upstream_calls_total Calls made to the Messages API, by status.',
+                '# TYPE claude_proxy_upstream_calls_total counter',
+            ]
+            for status, count in sorted(self.upstream_calls.items()):
+                lines.append(f'claude_proxy_upstream_calls_total{{status="{status}"}} {count}')
+            lines += [
+                '# HELP claude_proxy_upstream_duration_seconds Time spent waiting on the Messages API per call.',
+                '# TYPE claude_proxy_upstream_duration_seconds histogram',
+            ]
+            lines += self._histogram_lines('claude_proxy_upstream_duration_seconds', self.upstream_latency)
+            lines += [
+                '# HELP claude_proxy_upstream_latency_seconds Recent upstream latency quantiles.',
+                '# TYPE claude_proxy_upstream_latency_seconds summary',
+            ]
+            lines += self._summary_lines('claude_proxy_upstream_latency_seconds', self.upstream_latency)
+
+        for component, stats in sorted((component_stats or {}).items()):
+            for name, value in sorted(stats.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric = f'claude_proxy_{component}_{name}'
+                lines += [f'# TYPE {metric} gauge', f'{metric} {value}']
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram_lines(name, histogram, labels=''):
+        prefix = labels + ',' if labels else ''
+        lines = []
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {histogram.total:.6f}')
+        lines.append(f'{name}_count{suffix} {histogram.count}')
+        return lines
+
+    @staticmethod
+    def _summary_lines(name, histogram, labels=''):
+        prefix = labels + ',' if labels else ''
+        lines = [f'{name}{{{prefix}quantile="{q}"}} {value:.6f}' for q, value in histogram.quantiles().items()]
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {histogram.total:.6f}')
+        lines.append(f'{name}_count{suffix} {histogram.count}')
+        return lines
@@ -0,0 +1,510 @@
+"""
+Change journal for instructor edits
+Instead of rewriting the whole question bank after every toggle, priority
+change or image drop, the portals send small edit operations:
+
+  {"op": "set", "id": 12, "field": "settings.priority", "value": "high", "expect": "none"}
+  {"op": "set", "id": 12, "field": "lt.explanation", "value": "..."}
+  {"op": "set", "id": 12, "field": "image", "value": "question_images/question_12.jpg"}
+  {"op": "add", "question": {...}, "settings": {...}}
+
+Each accepted edit gets a sequence number and is appended as one JSON line
+to the journal, nephro_questions_enhanced_edits.jsonl next to the bank.
+Appends are group-committed: one writer thread writes whatever edits are
+waiting and fsyncs once for all of them, and a request is answered only
+after its edits are on disk.
+
+Edits are field-level, so two instructors changing different fields of a
+question both keep their change. An edit with "expect" is rejected (with
+the current value) if the field no longer holds that value, so a stale
+page cannot silently undo someone else's change to the same field.
+
+If a journal write fails, the edits of that batch (and any queued behind
+it) are answered with an error and the in-memory bank is rebuilt from
+what is on disk, so nothing unacknowledged is listed or compacted.
+
+A background thread compacts the journal: once every accepted edit is on
+disk it writes the bank JSON with all of them applied
+(metadata.journal_seq records the last one) and starts a new journal.
+On start-up the bank is read and any journal edits newer than its
+journal_seq are replayed, so a crash at any point loses nothing that was
+acknowledged. If the bank file is changed by another tool
+(merge_questions.py, a portal export), it is re-read before the next
+compaction and the edits since the last compaction are replayed on top
+of it.
+
+Usage:
+    python question_journal.py [--bank nephro_questions_enhanced.json] --compact
+    python question_journal.py --stats
+"""
+
+import argparse
+import copy
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).resolve().parent
+DEFAULT_BANK = current_dir / 'nephro_questions_enhanced.json'
+COMPACT_INTERVAL = 30.0  # seconds between compactions while there are new edits
+COMPACT_EDITS = 500  # ... or sooner, once this many edits are waiting
+LANGUAGES = ('en', 'lt')
+QUESTION_FIELDS = ('image', 'difficulty', 'disease_id', 'source_slide')
+PRIORITIES = ('high', 'low', 'none')
+# What the portals assume for a question without settings
+SETTING_DEFAULTS = {'active': True, 'priority': 'none', 'modality': 'None'}
+MAX_EDITS_PER_REQUEST = 1000
+
+class EditError(ValueError):
+    """An edit that cannot be applied; `current` is set when it lost a race on `expect`"""
+
+    def __init__(self, message, current=None, conflict=False):
+        super().__init__(message)
+        self.current = current
+        self.conflict = conflict
+
+def journal_path_for(bank_path):
+    bank_path = Path(bank_path)
+    return bank_path.with_name(bank_path.stem + '_edits.jsonl')
+
+def read_journal(path):
+    """Edits in a journal file; a torn last line (crash mid-write) is ignored"""
+    edits = []
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    edits.append(json.loads(line))
+                except ValueError:
+                    break
+    except FileNotFoundError:
+        pass
+    return edits
+
+def file_stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+def same_question(existing, added, edited=()):
+    """True if the bank's question is the added one, apart from top-level fields edited since"""
+    keys = (set(existing) | set(added)) - set(edited)
+    return all(existing.get(key) == added.get(key) for key in keys)
+
+class _Pending:
+    """Journal lines waiting for the writer thread"""
+
+    def __init__(self, data, seq):
+        self.data = data
+        self.seq = seq  # of the last edit in data
+        self.done = threading.Event()
+        self.error = None
+
+    def finish(self, error=None):
+        self.error = error
+        self.done.set()
+
+class QuestionJournal:
+    """The question bank in memory, its edit journal on disk, and the threads that keep them in step"""
+
+    def __init__(self, bank_path=DEFAULT_BANK, journal_path=None,
+                 compact_interval=COMPACT_INTERVAL, compact_edits=COMPACT_EDITS, background=True):
+        self.bank_path = Path(bank_path)
+        self.journal_path = Path(journal_path) if journal_path else journal_path_for(self.bank_path)
+        self.compacting_path = self.journal_path.with_name(self.journal_path.name + '.compacting')
+        self.compact_interval = compact_interval
+        self.compact_edits = compact_edits
+        # Lock order: _compact_lock, _lock, _io_lock; _durable is never held while taking another
+        self._lock = threading.Lock()  # document, seq, recent edits
+        self._io_lock = threading.Lock()  # journal file handle, failed batch
+        self._compact_lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._durable = threading.Condition()  # durable_seq
+        self._queue = queue.Queue()
+        self._broken = None  # pendings of a failed write, until _recover() rolls them back
+        self._broken_error = None
+        self._closed = False
+        self.appended = 0
+        self.fsyncs = 0
+        self.compactions = 0
+        self.conflicts = 0
+
+        with self._lock:
+            self._load()
+        self._file = open(self.journal_path, 'ab')
+        self._writer = threading.Thread(target=self._write_loop, name='journal-writer', daemon=True)
+        self._writer.start()
+        self._compactor = None
+        if background:
+            self._compactor = threading.Thread(target=self._compact_loop, name='journal-compactor', daemon=True)
+            self._compactor.start()
+
+    def _read_bank(self):
+        """Load the bank file as the in-memory document; returns its journal_seq"""
+        self._bank_stat = file_stat(self.bank_path)
+        with open(self.bank_path, 'r', encoding='utf-8') as f:
+            self.document = json.load(f)
+        if not isinstance(self.document.get('metadata'), dict):
+            self.document['metadata'] = {}
+        if not isinstance(self.document.get('question_settings'), dict):
+            self.document['question_settings'] = {}
+        self._by_id = {question['id']: question for question in self.document.get('questions', [])}
+        return self.document['metadata'].get('journal_seq', 0)
+
+    def _replay(self, edits):
+        """Apply journalled edits to a freshly read bank; returns them as applied.
+
+        An added question whose id the bank already uses for a different
+        question (another tool added its own) is renumbered, and the edits
+        after it follow it to the new id.
+        """
+        # Fields edited later may already be in the bank's copy of an added question
+        edited = {}
+        for edit in edits:
+            if edit.get('op') == 'set':
+                edited.setdefault(edit.get('id'), set()).add(edit.get('field', '').split('.')[0])
+        renumbered = {}
+        applied = []
+        for edit in edits:
+            if edit.get('op') == 'add' and isinstance(edit.get('question'), dict):
+                question = edit['question']
+                existing = self._by_id.get(question.get('id'))
+                if existing is not None and not same_question(existing, question, edited.get(question['id'], ())):
+                    new_id = max((qid for qid in self._by_id if isinstance(qid, int)), default=0) + 1
+                    print(f"[WARN] Journal edit {edit.get('seq')}: question {question['id']} in the bank is "
+                          f"a different question; the journalled one is kept as {new_id}")
+                    renumbered[question['id']] = new_id
+                    edit = dict(edit, question=dict(question, id=new_id))
+            elif edit.get('id') in renumbered:
+                edit = dict(edit, id=renumbered[edit['id']])
+            try:
+                self._apply(edit, check=False)
+            except EditError as e:
+                print(f"[WARN] Journal edit {edit.get('seq')} skipped: {e}")
+            applied.append(edit)
+        return applied
+
+    def _load(self):
+        """Read the bank and replay the journal edits on disk it does not contain yet.
+
+        Only called before the threads start or under both _lock and _io_lock
+        with nothing waiting to be written.
+        """
+        self.base_seq = self._read_bank()
+        # Sequence numbers never go back, even when another tool wrote the bank without journal_seq
+        self.seq = max(self.base_seq, getattr(self, 'seq', 0))
+        edits = [edit for path in (self.compacting_path, self.journal_path)
+                 for edit in read_journal(path) if edit.get('seq', 0) > self.base_seq]
+        self.recent = self._replay(edits)
+        self.seq = max([self.seq] + [edit['seq'] for edit in edits])
+        with self._durable:
+            self.durable_seq = self.seq
+
+    def _rebase(self):
+        """Re-read a bank another tool rewrote and replay the edits since the last compaction onto it.
+
+        Under _lock with every edit in self.recent on disk.
+        """
+        self._read_bank()
+        self.recent = self._replay(self.recent)
+
+    def submit(self, edits, client=None):
+        """Apply and journal a list of edits; returns one {'seq'} or {'error'[, 'current']} per edit.
+
+        Returns once every accepted edit is on disk.
+        """
+        if not isinstance(edits, list) or len(edits) > MAX_EDITS_PER_REQUEST:
+            raise EditError(f'edits must be a list of at most {MAX_EDITS_PER_REQUEST} operations')
+        results = []
+        lines = []
+        with self._lock:
+            if self._closed:
+                raise EditError('journal is closed')
+            for edit in edits:
+                if not isinstance(edit, dict):
+                    results.append({'error': 'edit must be an object'})
+                    continue
+                record = {key: value for key, value in edit.items() if key != 'expect'}
+                record.update(seq=self.seq + 1, ts=round(time.time(), 3))
+                if client:
+                    record['client'] = str(client)[:64]
+                try:
+                    assigned = self._apply(edit, check=True)
+                except EditError as e:
+                    result = {'error': str(e)}
+                    if e.conflict:
+                        self.conflicts += 1
+                        result['current'] = e.current
+                    results.append(result)
+                    continue
+                result = {'seq': record['seq']}
+                if assigned is not None:
+                    record['question'] = dict(record['question'], id=assigned)
+                    result['id'] = assigned
+                self.seq = record['seq']
+                self.recent.append(record)
+                lines.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+                results.append(result)
+            pending = None
+            if lines:
+                # Queued under the lock so the journal keeps sequence order
+                pending = _Pending(''.join(lines).encode('utf-8'), self.seq)
+                self._queue.put(pending)
+                if self.seq - self.base_seq >= self.compact_edits:
+                    self._changed.notify()
+        if pending is not None:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+        return results
+
+    def _apply(self, edit, check):
+        """Apply one edit to the in-memory bank (under self._lock); raises EditError.
+
+        Returns the id given to an added question, when it is not the one it came with.
+        """
+        op = edit.get('op')
+        if op == 'add':
+            question = edit.get('question')
+            if not isinstance(question, dict):
+                raise EditError('add needs a question')
+            for lang in LANGUAGES:
+                if not isinstance(question.get(lang), dict):
+                    raise EditError(f"new question has no '{lang}' text")
+            assigned = None
+            if question.get('id') in self._by_id or 'id' not in question:
+                if not check:
+                    return None  # replayed onto a bank that already has it
+                # Another editor took this id first (or none was given): use the next free one
+                assigned = max((qid for qid in self._by_id if isinstance(qid, int)), default=0) + 1
+                question = dict(question, id=assigned)
+            question = copy.deepcopy(question)
+            self.document.setdefault('questions', []).append(question)
+            self._by_id[question['id']] = question
+            if isinstance(edit.get('settings'), dict):
+                self.document['question_settings'][str(question['id'])] = dict(edit['settings'])
+            return assigned
+        if op != 'set':
+            raise EditError(f'unknown op: {op!r}')
+
+        question = self._by_id.get(edit.get('id'))
+        if question is None:
+            raise EditError(f"no question with id {edit.get('id')!r}")
+        field = edit.get('field')
+        value = edit.get('value')
+        head, _, key = (field or '').partition('.')
+        if head == 'settings' and key:
+            if key == 'active' and not isinstance(value, bool):
+                raise EditError('settings.active must be true or false')
+            if key == 'priority' and value not in PRIORITIES:
+                raise EditError(f"settings.priority must be one of {', '.join(PRIORITIES)}")
+            target = self.document['question_settings'].setdefault(str(question['id']), {})
+        elif head in LANGUAGES and key:
+            if not isinstance(value, str):
+                raise EditError(f'{field} must be text')
+            target = question.setdefault(head, {})
+        elif head in QUESTION_FIELDS and not key:
+            key = head
+            target = question
+        else:
+            raise EditError(f'field {field!r} cannot be edited')
+        current = target.get(key, SETTING_DEFAULTS.get(key) if head == 'settings' else None)
+        if check and 'expect' in edit and current != edit['expect']:
+            raise EditError(f"{field} of question {question['id']} was changed by someone else",
+                            current=current, conflict=True)
+        target[key] = value
+        return None
+
+    def since(self, seq):
+        """{'seq', 'edits'} on disk after `seq`, or {'seq', 'reload': True} when they were compacted away"""
+        with self._lock:
+            with self._durable:
+                durable_seq = self.durable_seq
+            if seq < self.base_seq or seq > durable_seq:
+                return {'seq': durable_seq, 'base_seq': self.base_seq, 'reload': True}
+            return {'seq': durable_seq, 'base_seq': self.base_seq,
+                    'edits': [edit for edit in self.recent if seq < edit['seq'] <= durable_seq]}
+
+    def _write_batch(self, batch):
+        """Append and fsync the batch (under _io_lock); returns the OSError if that failed"""
+        offset = os.fstat(self._file.fileno()).st_size
+        try:
+            self._file.write(b''.join(pending.data for pending in batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            try:
+                # Leave no part of the batch behind to be replayed later
+                self._file.truncate(offset)
+            except OSError:
+                pass
+            return e
+        return None
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            batch = [pending for pending in batch if pending is not None]
+            failed = False
+            if batch:
+                with self._io_lock:
+                    error = self._write_batch(batch)
+                    if error is None:
+                        self.fsyncs += 1
+                        self.appended += len(batch)
+                    else:
+                        print(f"[ERROR] Journal write failed: {error}")
+                        self._broken, self._broken_error = batch, error
+                        failed = True
+                if not failed:
+                    with self._durable:
+                        self.durable_seq = batch[-1].seq
+                        self._durable.notify_all()
+                    for pending in batch:
+                        pending.finish()
+                else:
+                    with self._durable:
+                        self._durable.notify_all()  # a waiting compaction rolls back instead
+                    with self._lock:
+                        with self._io_lock:
+                            if self._broken is batch:
+                                self._recover()
+            if stop:
+                return
+
+    def _recover(self):
+        """After a failed write: fail that batch and everything queued behind it,
+        and rebuild the in-memory bank from disk (under _lock and _io_lock)"""
+        failed, error = self._broken, self._broken_error
+        stop = False
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is None:
+                stop = True
+            else:
+                failed.append(pending)
+        if stop:
+            self._queue.put(None)
+        self._broken = self._broken_error = None
+        self._load()
+        for pending in failed:
+            pending.finish(error)
+
+    def _compact_loop(self):
+        while True:
+            with self._lock:
+                self._changed.wait(self.compact_interval)
+                if self._closed:
+                    return
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"[ERROR] Journal compaction failed: {e}")
+
+    def compact(self):
+        """Write the bank with every edit applied and start a new journal; returns True if written"""
+        with self._compact_lock:
+            with self._lock:
+                # Only edits that are on disk may reach the bank
+                with self._durable:
+                    while self.durable_seq < self.seq and self._broken is None:
+                        self._durable.wait()
+                with self._io_lock:
+                    if self._broken is not None:
+                        self._recover()
+                    if file_stat(self.bank_path) != self._bank_stat:
+                        # Someone else rewrote the bank: build on their version
+                        print(f"[INFO] {self.bank_path.name} changed on disk, replaying the journal onto it")
+                        self._rebase()
+                        if not self.recent:
+                            # Nothing of ours to add; clients holding older copies reload
+                            self.base_seq = self.seq
+                            return False
+                    if self.seq == self.base_seq:
+                        return False
+                    seq = self.seq
+                    self.document['metadata']['journal_seq'] = seq
+                    data = json.dumps(self.document, indent=2, ensure_ascii=False).encode('utf-8')
+                    # Edits up to `seq` move aside until the bank holding them is safely written
+                    self._file.close()
+                    if self.compacting_path.exists():
+                        with open(self.compacting_path, 'ab') as f:
+                            f.write(self.journal_path.read_bytes())
+                        self.journal_path.unlink()
+                    else:
+                        os.replace(self.journal_path, self.compacting_path)
+                    self._file = open(self.journal_path, 'ab')
+
+            tmp_path = self.bank_path.with_name(f'{self.bank_path.name}.{os.getpid()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.bank_path)
+            with self._lock:
+                self._bank_stat = file_stat(self.bank_path)
+                self.base_seq = seq
+                self.recent = [edit for edit in self.recent if edit['seq'] > seq]
+            self.compacting_path.unlink()
+            self.compactions += 1
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'seq': self.seq,
+                'base_seq': self.base_seq,
+                'uncompacted': self.seq - self.base_seq,
+                'appended': self.appended,
+                'fsyncs': self.fsyncs,
+                'compactions': self.compactions,
+                'conflicts': self.conflicts,
+                'journal_bytes': (file_stat(self.journal_path) or (0,))[0],
+            }
+
+    def close(self, compact=True):
+        """Stop the threads and (by default) compact whatever is left"""
+        with self._lock:
+            self._closed = True
+            self._changed.notify_all()
+        self._queue.put(None)
+        self._writer.join()
+        if self._compactor is not None:
+            self._compactor.join()
+        if compact:
+            self.compact()
+        with self._io_lock:
+            self._file.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compact or inspect the instructor edit journal')
+    parser.add_argument('--bank', default=str(DEFAULT_BANK), help='Question database JSON')
+    parser.add_argument('--journal', help='Journal file (default: next to the bank)')
+    parser.add_argument('--compact', action='store_true', help='Apply the journal to the bank now')
+    parser.add_argument('--stats', action='store_true', help='Show journal statistics')
+    args = parser.parse_args()
+
+    journal = QuestionJournal(args.bank, args.journal, background=False)
+    stats = journal.stats()
+    print(f"[OK] {journal.bank_path.name}: journal_seq {stats['base_seq']}, "
+          f"{stats['uncompacted']} edits in {journal.journal_path.name} ({stats['journal_bytes']} bytes)")
+    if args.compact:
+        if journal.compact():
+            print(f"[OK] Compacted up to edit {journal.base_seq}")
+        else:
+            print("[OK] Nothing to compact")
+    journal.close(compact=False)
@@ -0,0 +1,390 @@
+"""
+SQLite question bank
+Stores nephro_questions_enhanced.json in nephro_questions.db (WAL mode),
+so one question can be read or updated without parsing and rewriting the
+whole file:
+
+  document       top-level sections (metadata, translations, ...) as JSON
+  questions      one row per question; disease_id, topic, difficulty and
+                 source_slide are indexed columns
+  question_text  assertion / reason / answer / explanation per language
+  images         image path per question
+  settings       instructor settings (active, priority, modality) per question
+
+Import and export round-trip exactly: every record keeps the order of its
+keys and any field without a column is kept as JSON, so exporting an
+imported file gives the same JSON document back. Questions without an id
+(older banks such as nephro_questions_final.json) are numbered after the
+highest id, in bank order; the number is used to get() them but is not
+added to the exported record.
+
+Usage:
+    python question_store.py import [nephro_questions_enhanced.json]
+    python question_store.py export [output.json]
+    python question_store.py query [--disease MCD] [--difficulty hard] [--topic ...] [--slide N] [--with-image]
+    python question_store.py stats
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+DEFAULT_DB = current_dir / 'nephro_questions.db'
+DEFAULT_JSON = current_dir / 'nephro_questions_enhanced.json'
+
+# Column -> Python type a value needs to be stored in that column;
+# anything else goes to the record's `extra` JSON
+QUESTION_COLUMNS = {'disease_id': str, 'topic': str, 'difficulty': str, 'source_slide': int}
+TEXT_COLUMNS = {'assertion': str, 'reason': str, 'answer': str, 'explanation': str}
+SETTINGS_COLUMNS = {'active': bool, 'priority': str, 'modality': str}
+LANGUAGES = ('en', 'lt')
+# Top-level sections kept in their own tables
+TABLE_SECTIONS = ('questions', 'question_settings')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS document (
+    key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    disease_id TEXT,
+    topic TEXT,
+    difficulty TEXT,
+    source_slide INTEGER,
+    layout TEXT NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS questions_disease ON questions (disease_id);
+CREATE INDEX IF NOT EXISTS questions_difficulty ON questions (difficulty);
+CREATE INDEX IF NOT EXISTS questions_topic ON questions (topic);
+CREATE INDEX IF NOT EXISTS questions_source_slide ON questions (source_slide);
+CREATE INDEX IF NOT EXISTS questions_position ON questions (position);
+CREATE TABLE IF NOT EXISTS question_text (
+    question_id INTEGER NOT NULL REFERENCES questions (id) ON DELETE CASCADE,
+    lang TEXT NOT NULL,
+    assertion TEXT,
+    reason TEXT,
+    answer TEXT,
+    explanation TEXT,
+    layout TEXT NOT NULL,
+    extra TEXT,
+    PRIMARY KEY (question_id, lang)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS images (
+    question_id INTEGER PRIMARY KEY REFERENCES questions (id) ON DELETE CASCADE,
+    path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    active INTEGER,
+    priority TEXT,
+    modality TEXT,
+    layout TEXT NOT NULL,
+    extra TEXT
+);
+"""
+
+def dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+def split_record(record, columns):
+    """(column values, key order, extra JSON) for one dict.
+
+    A value goes to its column only if it has exactly the column's type
+    (so 1 and True, or "13" and 13, stay distinct); everything else is kept
+    in `extra`.
+    """
+    values = {}
+    extra = {}
+    for key, value in record.items():
+        if key in columns and type(value) is columns[key]:
+            values[key] = value
+        else:
+            extra[key] = value
+    return values, dumps(list(record)), dumps(extra) if extra else None
+
+def join_record(values, layout, extra, columns, special=None):
+    """Inverse of split_record; `special` supplies keys kept in other tables"""
+    extra = json.loads(extra) if extra else {}
+    special = special or {}
+    record = {}
+    for key in json.loads(layout):
+        if key in extra:
+            record[key] = extra[key]
+        elif key in special:
+            record[key] = special[key]
+        elif key in columns:
+            value = values[key]
+            record[key] = bool(value) if columns[key] is bool else value
+    return record
+
+class QuestionStore:
+    """The question bank in SQLite; rows come back as the JSON dicts they were imported from"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = Path(path)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('PRAGMA foreign_keys=ON')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    # Whole document
+
+    def import_json(self, document):
+        """Replace the store's content with a question database dict"""
+        with self.db:
+            for table in ('images', 'question_text', 'questions', 'settings', 'document'):
+                self.db.execute(f'DELETE FROM {table}')
+            for position, (key, value) in enumerate(document.items()):
+                self.db.execute('INSERT INTO document (key, position, value) VALUES (?, ?, ?)',
+                                (key, position, None if key in TABLE_SECTIONS else dumps(value)))
+            questions = document.get('questions', [])
+            next_id = max((question['id'] for question in questions
+                           if isinstance(question.get('id'), int)), default=0) + 1
+            for position, question in enumerate(questions):
+                question_id = question.get('id')
+                if 'id' not in question:
+                    question_id = next_id
+                    next_id += 1
+                self._write_question(question, position, question_id)
+            for position, (key, settings) in enumerate(document.get('question_settings', {}).items()):
+                self._write_settings(key, settings, position)
+
+    def export_json(self):
+        """The question database dict, in the key order it was imported with"""
+        document = {}
+        for row in self.db.execute('SELECT key, value FROM document ORDER BY position'):
+            if row['key'] == 'questions':
+                document['questions'] = self.query()
+            elif row['key'] == 'question_settings':
+                document['question_settings'] = self.get_settings()
+            else:
+                document[row['key']] = json.loads(row['value'])
+        return document
+
+    def get_section(self, key):
+        row = self.db.execute('SELECT value FROM document WHERE key = ?', (key,)).fetchone()
+        return json.loads(row['value']) if row and row['value'] is not None else None
+
+    def set_section(self, key, value):
+        """Replace one top-level section (metadata, interface_translations, ...)"""
+        with self.db:
+            position = self._next_position('document')
+            self.db.execute('INSERT INTO document (key, position, value) VALUES (?, ?, ?) '
+                            'ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+                            (key, position, dumps(value)))
+
+    # Questions
+
+    def get(self, question_id):
+        """One question dict, or None"""
+        questions = self._load_questions('WHERE q.id = ?', (question_id,))
+        return questions[0] if questions else None
+
+    def query(self, disease_id=None, difficulty=None, topic=None, source_slide=None, has_image=None):
+        """Questions matching every given filter, in bank order"""
+        clauses = []
+        params = []
+        for column, value in (('disease_id', disease_id), ('difficulty', difficulty),
+                              ('topic', topic), ('source_slide', source_slide)):
+            if value is not None:
+                clauses.append(f'q.{column} = ?')
+                params.append(value)
+        if has_image is not None:
+            clauses.append(f"q.id {'IN' if has_image else 'NOT IN'} (SELECT question_id FROM images)")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self._load_questions(where, params)
+
+    def upsert(self, question):
+        """Insert or replace one question, keeping its place in the bank; returns its id
+        (the next free one for a question without an id)"""
+        with self.db:
+            question_id = question.get('id')
+            if 'id' not in question:
+                question_id = self.db.execute('SELECT COALESCE(MAX(id) + 1, 1) FROM questions').fetchone()[0]
+            row = self.db.execute('SELECT position FROM questions WHERE id = ?', (question_id,)).fetchone()
+            position = row['position'] if row else self._next_position('questions')
+            self._ensure_section('questions')
+            self.db.execute('DELETE FROM questions WHERE id = ?', (question_id,))
+            self._write_question(question, position, question_id)
+            return question_id
+
+    def delete(self, question_id):
+        with self.db:
+            return self.db.execute('DELETE FROM questions WHERE id = ?', (question_id,)).rowcount > 0
+
+    def set_image(self, question_id, path):
+        """Set (or with path None, remove) a question's image; returns False for an unknown question"""
+        with self.db:
+            row = self.db.execute('SELECT layout, extra FROM questions WHERE id = ?', (question_id,)).fetchone()
+            if row is None:
+                return False
+            layout = json.loads(row['layout'])
+            extra = json.loads(row['extra']) if row['extra'] else {}
+            extra.pop('image', None)
+            self.db.execute('DELETE FROM images WHERE question_id = ?', (question_id,))
+            if path is None:
+                layout = [key for key in layout if key != 'image']
+            else:
+                if 'image' not in layout:
+                    layout.append('image')
+                if isinstance(path, str):
+                    self.db.execute('INSERT INTO images (question_id, path) VALUES (?, ?)', (question_id, path))
+                else:
+                    extra['image'] = path
+            self.db.execute('UPDATE questions SET layout = ?, extra = ? WHERE id = ?',
+                            (dumps(layout), dumps(extra) if extra else None, question_id))
+            return True
+
+    # Instructor settings
+
+    def get_settings(self):
+        """{question id (str): settings dict}, as in the JSON's question_settings"""
+        return {row['key']: join_record(row, row['layout'], row['extra'], SETTINGS_COLUMNS)
+                for row in self.db.execute('SELECT * FROM settings ORDER BY position')}
+
+    def set_settings(self, question_id, settings):
+        with self.db:
+            key = str(question_id)
+            row = self.db.execute('SELECT position FROM settings WHERE key = ?', (key,)).fetchone()
+            position = row['position'] if row else self._next_position('settings')
+            self._ensure_section('question_settings')
+            self.db.execute('DELETE FROM settings WHERE key = ?', (key,))
+            self._write_settings(key, settings, position)
+
+    def stats(self):
+        counts = {table: self.db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                  for table in ('questions', 'question_text', 'images', 'settings')}
+        counts['by_disease'] = dict(self.db.execute(
+            'SELECT disease_id, COUNT(*) FROM questions GROUP BY disease_id ORDER BY disease_id').fetchall())
+        return counts
+
+    def _ensure_section(self, key):
+        self.db.execute('INSERT OR IGNORE INTO document (key, position, value) VALUES (?, ?, NULL)',
+                        (key, self._next_position('document')))
+
+    def _next_position(self, table):
+        return self.db.execute(f'SELECT COALESCE(MAX(position) + 1, 0) FROM {table}').fetchone()[0]
+
+    def _write_question(self, question, position, question_id):
+        record = dict(question)
+        texts = {lang: record[lang] for lang in LANGUAGES if isinstance(record.get(lang), dict)}
+        image = record.get('image')
+        values, layout, extra = split_record(
+            {key: value for key, value in record.items()
+             if key != 'id' and key not in texts and not (key == 'image' and isinstance(image, str))},
+            QUESTION_COLUMNS)
+        # The layout covers every key, including the ones stored in other tables
+        layout = dumps(list(record))
+        self.db.execute(
+            'INSERT INTO questions (id, position, disease_id, topic, difficulty, source_slide, layout, extra) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (question_id, position, values.get('disease_id'), values.get('topic'),
+             values.get('difficulty'), values.get('source_slide'), layout, extra))
+        for lang, text in texts.items():
+            text_values, text_layout, text_extra = split_record(text, TEXT_COLUMNS)
+            self.db.execute(
+                'INSERT INTO question_text (question_id, lang, assertion, reason, answer, explanation, layout, extra) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (question_id, lang, text_values.get('assertion'), text_values.get('reason'),
+                 text_values.get('answer'), text_values.get('explanation'), text_layout, text_extra))
+        if isinstance(image, str):
+            self.db.execute('INSERT INTO images (question_id, path) VALUES (?, ?)', (question_id, image))
+
+    def _write_settings(self, key, settings, position):
+        values, layout, extra = split_record(settings, SETTINGS_COLUMNS)
+        active = values.get('active')
+        self.db.execute(
+            'INSERT INTO settings (key, position, active, priority, modality, layout, extra) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (key, position, None if active is None else int(active), values.get('priority'),
+             values.get('modality'), layout, extra))
+
+    def _load_questions(self, where, params):
+        rows = self.db.execute(
+            f'SELECT q.*, i.path AS image FROM questions q LEFT JOIN images i ON i.question_id = q.id '
+            f'{where} ORDER BY q.position', params).fetchall()
+        if not rows:
+            return []
+        ids = [row['id'] for row in rows]
+        texts = {}
+        # Chunked IN lists stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            for text in self.db.execute(
+                    f"SELECT * FROM question_text WHERE question_id IN ({','.join('?' * len(chunk))})", chunk):
+                texts.setdefault(text['question_id'], {})[text['lang']] = join_record(
+                    text, text['layout'], text['extra'], TEXT_COLUMNS)
+
+        questions = []
+        for row in rows:
+            # 'id' only comes back if the layout has it (numbered questions do not)
+            special = {'id': row['id'], **texts.get(row['id'], {})}
+            if row['image'] is not None:
+                special['image'] = row['image']
+            questions.append(join_record(row, row['layout'], row['extra'], QUESTION_COLUMNS, special))
+        return questions
+
+def write_json(path, document):
+    """Write a question database dict the way the Python tools always have (indent 2, UTF-8)"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SQLite-backed question bank')
+    parser.add_argument('command', choices=['import', 'export', 'query', 'stats'])
+    parser.add_argument('json_path', nargs='?', help='JSON file to import from / export to')
+    parser.add_argument('--db', default=str(DEFAULT_DB), help='SQLite database file')
+    parser.add_argument('--disease', help='Filter by disease_id')
+    parser.add_argument('--difficulty', help='Filter by difficulty')
+    parser.add_argument('--topic', help='Filter by topic')
+    parser.add_argument('--slide', type=int, help='Filter by source slide')
+    parser.add_argument('--with-image', action='store_true', help='Only questions with an image')
+    args = parser.parse_args()
+
+    store = QuestionStore(args.db)
+    print("=" * 70)
+    print(f"QUESTION STORE - {args.command}")
+    print("=" * 70)
+
+    if args.command == 'import':
+        source = args.json_path or DEFAULT_JSON
+        with open(source, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+        store.import_json(document)
+        if dumps(store.export_json()) != dumps(document):
+            print(f"[ERROR] Round trip of {source} does not match the file")
+        print(f"[OK] Imported {len(document.get('questions', []))} questions from {source}")
+    elif args.command == 'export':
+        target = args.json_path or DEFAULT_JSON
+        document = store.export_json()
+        write_json(target, document)
+        print(f"[OK] Exported {len(document.get('questions', []))} questions to {target}")
+    elif args.command == 'query':
+        questions = store.query(disease_id=args.disease, difficulty=args.difficulty, topic=args.topic,
+                                source_slide=args.slide, has_image=True if args.with_image else None)
+        for question in questions:
+            text = question.get('en') or question
+            print(f"  #{question.get('id', '-')} [{question.get('disease_id')}/{question.get('difficulty')}] "
+                  f"{text.get('assertion', '')[:60]}")
+        print(f"[OK] {len(questions)} questions")
+
+    stats = store.stats()
+    print()
+    print(f"Questions: {stats['questions']}, texts: {stats['question_text']}, "
+          f"images: {stats['images']}, settings: {stats['settings']}")
+    store.close()
@@ -0,0 +1,329 @@
+"""
+Quiz assembly for the student portal
+Picks N question IDs from the bank under constraints, reproducibly from a seed:
+
+  - disease coverage: the quiz is split as evenly as the bank allows over
+    the chosen diseases (all of them by default)
+  - difficulty mix: e.g. easy:0.3,medium:0.5,hard:0.2
+  - priority weights: how much likelier a 'high' or 'low' priority question
+    is to be drawn, and drawn early, than a 'none' one (0 leaves it out)
+  - image ratio: the share of questions that show an image
+  - answer balance: answer letters as even as the bank allows
+
+Every disease gets a question before any gets a second. The difficulty
+mix and image ratio are quotas on strata of (difficulty, image): each
+stratum gets a target that meets both where the bank allows, and a draw
+only comes from a stratum still short of its target while one is left.
+Answer balance gives way to them (the bank's image questions may all
+share one answer letter).
+
+Active questions are grouped once, when the bank is loaded, into buckets by
+(disease, difficulty, image, answer, priority). Each draw keeps the buckets
+furthest behind their targets, picks one of them by priority weight x
+questions left in it, and takes a random question from it with a sparse
+Fisher-Yates swap. A quiz of N questions costs N draws over the (few
+hundred at most) buckets, whatever the size of the bank. Questions come
+out in draw order, so heavier priorities tend to come early without every
+student getting the same order.
+
+Settings come from the bank's question_settings, as written by the
+instructor portal.
+
+Usage:
+    python quiz_builder.py --count 20 [--seed 42] [--diseases MCD,IgAN]
+        [--difficulty easy:0.3,medium:0.5,hard:0.2] [--image-ratio 0.5]
+"""
+
+import argparse
+import json
+import random
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+current_dir = Path(__file__).resolve().parent
+DEFAULT_SOURCE = current_dir / 'nephro_questions_enhanced.json'
+DEFAULT_PRIORITY_WEIGHTS = {'high': 4.0, 'low': 2.0, 'none': 1.0}
+MAX_SEED = 2 ** 32
+# Bucket key fields, in order
+DISEASE, DIFFICULTY, IMAGE, ANSWER, PRIORITY = range(5)
+
+
+def parse_weights(text):
+    """'easy:0.3,medium:0.5' -> {'easy': 0.3, 'medium': 0.5}"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, sep, value = item.partition(':')
+        if not sep:
+            raise ValueError(f"Expected name:weight, got '{item}'")
+        try:
+            weights[name.strip()] = float(value)
+        except ValueError:
+            raise ValueError(f"Weight of '{name.strip()}' is not a number: '{value}'")
+        if weights[name.strip()] < 0:
+            raise ValueError(f"Weight of '{name.strip()}' is negative")
+    return weights
+
+def quiz_options(params):
+    """QuizBank.build() keyword arguments from URL query parameters (parse_qs form).
+
+    Raises ValueError with a message fit for the client.
+    """
+    def first(name):
+        values = params.get(name)
+        return values[0].strip() if values and values[0].strip() else None
+
+    options = {}
+    for name, convert in (('n', int), ('seed', int), ('image_ratio', float)):
+        value = first(name)
+        if value is not None:
+            try:
+                options[name] = convert(value)
+            except ValueError:
+                raise ValueError(f'{name} must be a number')
+    if 'n' in options:
+        options['count'] = options.pop('n')
+        if options['count'] < 0:
+            raise ValueError('n must not be negative')
+    if 'image_ratio' in options and not 0 <= options['image_ratio'] <= 1:
+        raise ValueError('image_ratio must be between 0 and 1')
+    if first('diseases'):
+        options['diseases'] = [part.strip() for part in first('diseases').split(',') if part.strip()]
+    if first('difficulty'):
+        options['difficulty_mix'] = parse_weights(first('difficulty'))
+    if first('weights'):
+        options['priority_weights'] = parse_weights(first('weights'))
+    if first('balance_answers'):
+        options['balance_answers'] = first('balance_answers').lower() not in ('0', 'false', 'no')
+    return options
+
+def spread(total, capacities, rng):
+    """Split total as evenly as possible over capacities' keys, none above its capacity"""
+    targets = dict.fromkeys(capacities, 0)
+    order = sorted(capacities)
+    rng.shuffle(order)  # who gets the remainder
+    total = min(total, sum(capacities.values()))
+    while total:
+        for key in order:
+            if total and targets[key] < capacities[key]:
+                targets[key] += 1
+                total -= 1
+    return targets
+
+def apportion(total, shares, capacities):
+    """Split total in proportion to shares (largest remainder), none above its capacity"""
+    shares = {key: share for key, share in shares.items() if share > 0 and capacities.get(key)}
+    targets = dict.fromkeys(shares, 0)
+    total = min(total, sum(capacities[key] for key in shares))
+    while total and shares:
+        weight = sum(shares.values())
+        exact = {key: total * share / weight for key, share in shares.items()}
+        give = {key: min(int(exact[key]), capacities[key] - targets[key]) for key in shares}
+        left = total - sum(give.values())
+        for key in sorted(shares, key=lambda key: (-(exact[key] - int(exact[key])), key)):
+            if left and give[key] < capacities[key] - targets[key]:
+                give[key] += 1
+                left -= 1
+        for key, amount in give.items():
+            targets[key] += amount
+            total -= amount
+        # Keys at capacity are out; the rest share what they could not take
+        shares = {key: share for key, share in shares.items() if targets[key] < capacities[key]}
+    return targets
+
+def split_images(difficulty_targets, with_image, capacities):
+    """Image questions per difficulty so both the mix and the image count are met.
+
+    capacities maps (difficulty, has image) to the questions available.
+    Each difficulty takes at least what its questions without an image
+    cannot cover; the rest is shared in proportion to the room left.
+    """
+    low = {name: max(0, target - capacities.get((name, False), 0)) for name, target in difficulty_targets.items()}
+    room = {name: max(0, min(target, capacities.get((name, True), 0)) - low[name])
+            for name, target in difficulty_targets.items()}
+    extra = apportion(max(0, with_image - sum(low.values())), room, room)
+    return {name: low[name] + extra.get(name, 0) for name in difficulty_targets}
+
+class QuizBank:
+    """Active questions of a bank, bucketed for quiz assembly"""
+
+    def __init__(self, document):
+        settings = document.get('question_settings') or {}
+        self.buckets = defaultdict(list)
+        for question in document.get('questions', []):
+            setting = settings.get(str(question['id'])) or question.get('settings') or {}
+            if setting.get('active', True) is False:
+                continue
+            key = (question.get('disease_id') or '',
+                   question.get('difficulty') or '',
+                   bool(question.get('image')),
+                   (question.get('en') or {}).get('answer') or question.get('answer') or '',
+                   setting.get('priority') or 'none')
+            self.buckets[key].append(question['id'])
+
+    @classmethod
+    def load(cls, path=DEFAULT_SOURCE):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def build(self, count=None, diseases=None, difficulty_mix=None, priority_weights=None,
+              image_ratio=None, balance_answers=True, seed=None):
+        """{'seed', 'ids', 'available', 'summary'} for a quiz of `count` questions (all that fit by default).
+
+        The same seed and options give the same quiz as long as the bank is unchanged.
+        """
+        if seed is None:
+            seed = random.randrange(MAX_SEED)
+        rng = random.Random(seed)
+        weights = dict(DEFAULT_PRIORITY_WEIGHTS, **(priority_weights or {}))
+        keys = sorted(key for key in self.buckets
+                      if (not diseases or key[DISEASE] in diseases)
+                      and (not difficulty_mix or difficulty_mix.get(key[DIFFICULTY], 0) > 0)
+                      and weights.get(key[PRIORITY], 0) > 0)
+        remaining = {key: len(self.buckets[key]) for key in keys}
+        available = sum(remaining.values())
+        count = available if count is None else min(count, available)
+
+        def capacities(position):
+            result = defaultdict(int)
+            for key in keys:
+                result[key[position]] += remaining[key]
+            return result
+
+        # Target count per value of each constrained key field
+        targets = {DISEASE: spread(count, capacities(DISEASE), rng)}
+        if difficulty_mix:
+            targets[DIFFICULTY] = apportion(count, difficulty_mix, capacities(DIFFICULTY))
+        if image_ratio is not None:
+            with_image = min(round(count * image_ratio), capacities(IMAGE)[True])
+            targets[IMAGE] = {True: with_image, False: count - with_image}
+        if balance_answers:
+            targets[ANSWER] = spread(count, capacities(ANSWER), rng)
+
+        # Strata whose targets are filled exactly before the rest of the pool is used
+        if DIFFICULTY in targets and IMAGE in targets:
+            cells = defaultdict(int)
+            for key in keys:
+                cells[(key[DIFFICULTY], key[IMAGE])] += remaining[key]
+            images = split_images(targets[DIFFICULTY], targets[IMAGE][True], cells)
+            stratum_targets = {}
+            for name, target in targets[DIFFICULTY].items():
+                stratum_targets[(name, True)] = images[name]
+                stratum_targets[(name, False)] = target - images[name]
+            stratum = lambda key: (key[DIFFICULTY], key[IMAGE])
+        elif DIFFICULTY in targets or IMAGE in targets:
+            field = DIFFICULTY if DIFFICULTY in targets else IMAGE
+            stratum_targets = targets[field]
+            stratum = lambda key: key[field]
+        else:
+            stratum_targets = None
+        strata_used = defaultdict(int)
+
+        used = {position: defaultdict(int) for position in (DISEASE, DIFFICULTY, IMAGE, ANSWER)}
+        swaps = defaultdict(dict)
+        ids = []
+        for _ in range(count):
+            # Buckets in strata still short of their targets, or any bucket once none is left
+            open_keys = [key for key in keys if remaining[key]]
+            within = []
+            if stratum_targets is not None:
+                within = [key for key in open_keys
+                          if strata_used[stratum(key)] < stratum_targets.get(stratum(key), 0)]
+            # Of those, the buckets furthest behind their targets
+            best = None
+            for key in within or open_keys:
+                deficits = {position: wanted.get(key[position], 0) - used[position][key[position]]
+                            for position, wanted in targets.items()}
+                # Diseases not in the quiz yet first, then the other constraints still
+                # short of their target (answer balance last), then how far short in total
+                uncovered = targets[DISEASE][key[DISEASE]] > 0 and not used[DISEASE][key[DISEASE]]
+                short = sum(deficit > 0 for position, deficit in deficits.items() if position != ANSWER)
+                behind = (uncovered, short, deficits.get(ANSWER, 0) > 0, sum(deficits.values()))
+                if best is None or behind > best:
+                    best, candidates = behind, [key]
+                elif behind == best:
+                    candidates.append(key)
+
+            # Bucket by priority weight x questions left, then a question from it
+            point = rng.random() * sum(weights[key[PRIORITY]] * remaining[key] for key in candidates)
+            for key in candidates:
+                point -= weights[key[PRIORITY]] * remaining[key]
+                if point < 0:
+                    break
+            left = remaining[key]
+            slot = rng.randrange(left)
+            taken = swaps[key]
+            ids.append(self.buckets[key][taken.get(slot, slot)])
+            taken[slot] = taken.get(left - 1, left - 1)
+            remaining[key] = left - 1
+            if stratum_targets is not None:
+                strata_used[stratum(key)] += 1
+            for position in used:
+                used[position][key[position]] += 1
+
+        return {
+            'seed': seed,
+            'ids': ids,
+            'available': available,
+            'summary': {
+                'disease': dict(sorted(used[DISEASE].items())),
+                'difficulty': dict(sorted(used[DIFFICULTY].items())),
+                'image': used[IMAGE][True],
+                'answer': dict(sorted(used[ANSWER].items())),
+            },
+        }
+
+class QuizBankFile:
+    """A QuizBank that is reloaded when its file changes (for the proxy's /api/quiz)"""
+
+    def __init__(self, path=DEFAULT_SOURCE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._bank = None
+        self._stat = None
+
+    def get(self):
+        """The current QuizBank, or None when the file does not exist"""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        key = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if self._stat != key:
+                self._bank = QuizBank.load(self.path)
+                self._stat = key
+            return self._bank
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Assemble a quiz from the question bank')
+    parser.add_argument('--source', default=str(DEFAULT_SOURCE), help='Question database JSON')
+    parser.add_argument('--store', help='Read from this SQLite question bank (question_store.py) instead')
+    parser.add_argument('--count', type=int, help='Questions in the quiz (default: all active)')
+    parser.add_argument('--seed', type=int, help='Seed to reproduce a quiz')
+    parser.add_argument('--diseases', help='Comma-separated disease IDs to cover')
+    parser.add_argument('--difficulty', help='Difficulty mix, e.g. easy:0.3,medium:0.5,hard:0.2')
+    parser.add_argument('--weights', help='Priority weights, e.g. high:4,low:2,none:1')
+    parser.add_argument('--image-ratio', type=float, help='Share of questions with an image')
+    parser.add_argument('--no-answer-balance', action='store_true', help='Do not balance answer letters')
+    args = parser.parse_args()
+
+    if args.store:
+        from question_store import QuestionStore
+        store = QuestionStore(args.store)
+        bank = QuizBank(store.export_json())
+        store.close()
+    else:
+        bank = QuizBank.load(args.source)
+
+    quiz = bank.build(count=args.count,
+                      diseases=args.diseases.split(',') if args.diseases else None,
+                      difficulty_mix=parse_weights(args.difficulty) if args.difficulty else None,
+                      priority_weights=parse_weights(args.weights) if args.weights else None,
+                      image_ratio=args.image_ratio,
+                      balance_answers=not args.no_answer_balance,
+                      seed=args.seed)
+    print(f"[OK] {len(quiz['ids'])} of {quiz['available']} questions (seed {quiz['seed']})")
+    print(f"  IDs: {quiz['ids']}")
+    for name, counts in quiz['summary'].items():
+        print(f"  {name}: {counts}")
@@ -0,0 +1,192 @@
+"""
+Client-side rate limiting for the Claude proxy
+Token buckets for requests/minute and tokens/minute keep bulk generation
+under the account's limits, waiting callers are served round-robin so one
+large batch cannot starve an instructor's single click, and a 429 pauses
+everyone until the API's retry-after has passed.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, refilled continuously at `rate` per second"""
+
+    def __init__(self, capacity, rate):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` tokens are available (0 if they already are)"""
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class FairRateLimiter:
+    """Requests/minute and tokens/minute limits shared by all proxy workers.
+
+    acquire() blocks until both buckets allow the call. Waiting callers are
+    granted in round-robin order by caller id, one call at a time, so each
+    caller gets an equal share of the throughput while the buckets are the
+    bottleneck.
+    """
+
+    def __init__(self, requests_per_minute=50, tokens_per_minute=50000):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self._cond = threading.Condition()
+        self._waiting = OrderedDict()  # caller -> deque of tickets, in round-robin order
+        self._paused_until = 0.0
+        self.granted = 0
+        self.total_wait = 0.0
+        self.pauses = 0
+
+    def acquire(self, caller, cost):
+        """Wait for a slot for one request estimated at `cost` tokens"""
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._waiting.setdefault(caller, deque()).append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    delay = self._paused_until - now
+                    if self._is_next(caller, ticket):
+                        delay = max(delay, self.requests.wait_time(1), self.tokens.wait_time(cost))
+                        if delay <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(cost)
+                            self.granted += 1
+                            self.total_wait += now - started
+                            return
+                    else:
+                        delay = None
+                    self._cond.wait(delay)
+            finally:
+                self._dequeue(caller, ticket)
+                self._cond.notify_all()
+
+    def settle(self, charged, actual):
+        """Correct the token bucket once the real usage of a call is known"""
+        with self._cond:
+            if actual < charged:
+                self.tokens.give_back(charged - actual)
+            else:
+                self.tokens.take(actual - charged)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold every caller back for `seconds` (after a 429 from the API)"""
+        with self._cond:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                self.pauses += 1
+            self._cond.notify_all()
+
+    def stats(self):
+        """Counters for /api/stats"""
+        with self._cond:
+            return {
+                'granted': self.granted,
+                'waiting': sum(len(tickets) for tickets in self._waiting.values()),
+                'waiting_callers': len(self._waiting),
+                'avg_wait_seconds': round(self.total_wait / self.granted, 3) if self.granted else 0.0,
+                'pauses': self.pauses,
+                'requests_available': round(self.requests.tokens, 1),
+                'tokens_available': round(self.tokens.tokens),
+            }
+
+    def _is_next(self, caller, ticket):
+        first_caller = next(iter(self._waiting))
+        return first_caller == caller and self._waiting[caller][0] is ticket
+
+    def _dequeue(self, caller, ticket):
+        tickets = self._waiting.get(caller)
+        if tickets is None:
+            return
+        was_head = tickets[0] is ticket
+        tickets.remove(ticket)
+        if not tickets:
+            del self._waiting[caller]
+        elif was_head:
+            # Caller has had its turn; the next caller goes first
+            self._waiting.move_to_end(caller)
+
+def estimate_tokens(claude_request):
+    """Rough token cost of a request: ~4 characters per input token plus max_tokens"""
+    prompt = json.dumps([claude_request.get('system', ''), claude_request.get('messages', [])],
+                        ensure_ascii=False)
+    return len(prompt) // 4 + int(claude_request.get('max_tokens', 1024))
+
+def usage_tokens(response_body):
+    """Actual input + output tokens from a Messages API response, or None"""
+    try:
+        usage = json.loads(response_body.decode('utf-8')).get('usage', {})
+        return int(usage.get('input_tokens', 0)) + int(usage.get('output_tokens', 0))
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+class StreamUsage:
+    """Token usage read off a Messages API event stream as it is relayed.
+
+    message_start carries the input tokens and each message_delta the
+    running output count; `tokens` stays None until message_start is seen.
+    """
+
+    def __init__(self):
+        self._partial = b''
+        self.input_tokens = None
+        self.output_tokens = 0
+
+    def feed(self, data):
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        for line in lines:
+            if not line.startswith(b'data:'):
+                continue
+            try:
+                event = json.loads(line[5:].decode('utf-8'))
+                if event.get('type') == 'message_start':
+                    usage = event['message'].get('usage', {})
+                    self.input_tokens = int(usage.get('input_tokens', 0))
+                    self.output_tokens = int(usage.get('output_tokens', 0))
+                elif event.get('type') == 'message_delta':
+                    self.output_tokens = int(event.get('usage', {}).get('output_tokens', self.output_tokens))
+            except (ValueError, KeyError, AttributeError, TypeError):
+                continue
+
+    @property
+    def tokens(self):
+        if self.input_tokens is None:
+            return None
+        return self.input_tokens + self.output_tokens
+
+def backoff_delay(attempt, retry_after=None, base=1.0, cap=60.0):
+    """Seconds to wait before retry number `attempt` (1-based).
+
+    Honors a retry-after value from the API when there is one; otherwise
+    exponential backoff with full jitter.
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), cap) + random.uniform(0, base)
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,139 @@
+"""
+On-disk response cache for the Claude proxy
+Generation responses are stored under the SHA-256 of the canonical request
+body, so re-uploading the same lecture file is answered locally.
+Entries expire after a TTL and the least recently used ones are evicted
+once the cache grows past its size limit.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+def request_key(claude_request):
+    """SHA-256 of the request with sorted keys and no insignificant whitespace.
+
+    Every field takes part (model, max_tokens, messages, system, temperature,
+    ...), so two requests only share an entry if they would ask the API for
+    exactly the same thing.
+    """
+    canonical = json.dumps(claude_request, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """Content-addressed store of response bodies, one file per entry.
+
+    A file's mtime records when the entry was written (for the TTL) and its
+    atime when it was last served (for LRU order), so the index can be
+    rebuilt from the directory after a restart.
+    """
+
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # key -> (size, created), least recently used first
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.expired = 0
+        self.evicted = 0
+        self._load_index()
+
+    def get(self, key):
+        """Return the cached body for `key`, or None"""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            size, created = entry
+            if time.time() - created > self.ttl:
+                self._remove(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                body = path.read_bytes()
+                os.utime(path, (time.time(), created))
+            except OSError:
+                self._index.pop(key, None)
+                self._total_bytes -= size
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        """Store `body` under `key`, evicting old entries if over the size limit"""
+        if len(body) > self.max_bytes:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{path.name}.{threading.get_ident()}.tmp')
+        tmp_path.write_bytes(body)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            if key in self._index:
+                self._total_bytes -= self._index[key][0]
+            self._index[key] = (len(body), now)
+            self._index.move_to_end(key)
+            self._total_bytes += len(body)
+            while self._total_bytes > self.max_bytes and self._index:
+                oldest = next(iter(self._index))
+                self._remove(oldest)
+                self.evicted += 1
+
+    def note_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self):
+        """Counters for /api/stats"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'entries': len(self._index),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _path(self, key):
+        return self.directory / key[:2] / f'{key}.json'
+
+    def _remove(self, key):
+        size, _ = self._index.pop(key)
+        self._total_bytes -= size
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self):
+        if not self.directory.exists():
+            return
+        entries = []
+        for path in self.directory.glob('*/*.json'):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_atime, path.stem, st.st_size, st.st_mtime))
+        for _, key, size, created in sorted(entries):
+            self._index[key] = (size, created)
+            self._total_bytes += size
@@ -0,0 +1,31 @@
+// Responsive images shared by the portals (include before the portal's own script)
+
+let imageDerivatives = {}; // { 'question_images/question_1.jpg': { variants: { avif: [...], ... } } }
+
+// Responsive variants built by build_image_derivatives.py; optional, {} if not built
+async function loadImageDerivatives() {
+    try {
+        const response = await fetch('image_derivatives.json');
+        if (!response.ok) return {};
+        const manifest = await response.json();
+        return manifest.images || {};
+    } catch (error) {
+        return {};
+    }
+}
+
+// <picture> offering AVIF/WebP/JPEG widths of an image; a plain <img> if it has no variants
+function responsiveImageHtml(path, sizes, imgAttributes) {
+    const entry = imageDerivatives[path];
+    if (!entry) {
+        return `<img src="${path}" ${imgAttributes}>`;
+    }
+    const srcset = items => items.map(item => `${item.src} ${item.width}w`).join(', ');
+    const sourceTypes = { avif: 'image/avif', webp: 'image/webp' };
+    const sources = Object.keys(sourceTypes)
+        .filter(format => entry.variants[format])
+        .map(format => `<source type="${sourceTypes[format]}" srcset="${srcset(entry.variants[format])}" sizes="${sizes}">`)
+        .join('');
+    const fallback = entry.variants.jpeg ? `srcset="${srcset(entry.variants.jpeg)}" sizes="${sizes}"` : '';
+    return `<picture>${sources}<img src="${path}" ${fallback} ${imgAttributes}></picture>`;
+}
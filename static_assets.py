@@ -0,0 +1,182 @@
+"""
+Static file serving for the portals from the proxy server
+Serves the portal pages, scripts, the question JSON files,
+question_shards/ and question_images/ with strong ETags, 304 answers to
+If-None-Match, and gzip/brotli variants that are compressed once each
+time a file changes. Content-hashed files are sent as immutable.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import re
+import threading
+from pathlib import Path
+from urllib.parse import unquote
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+# Text assets worth compressing; images are already compressed
+COMPRESSIBLE_TYPES = {'.html', '.js', '.json', '.css', '.txt', '.svg', '.md'}
+ROOT_EXTENSIONS = COMPRESSIBLE_TYPES - {'.md', '.txt'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.svg'}
+# Directories (relative to the root) whose images are served
+IMAGE_DIRS = ('question_images',)
+# Directories whose JSON files are served (build_question_shards.py output)
+DATA_DIRS = ('question_shards',)
+# Content-hashed file names (name.<12 hex>.ext) never change content
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[a-z]+$')
+INDEX_FILE = 'student_portal_bilingual.html'
+
+class StaticAsset:
+    """One file as it was the last time it was read: its ETag and compressed variants"""
+
+    def __init__(self, path, mtime_ns, size, digest, variants):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+        self.variants = variants  # encoding -> compressed bytes
+
+    def etag(self, encoding=None):
+        # A strong ETag names one exact byte sequence, so every encoding gets its own
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+class StaticAssets:
+    """Resolves URL paths to files under `root` and keeps per-file metadata.
+
+    Metadata is recomputed whenever a file's mtime or size changes, so the
+    hash and the gzip/brotli bodies are built once per version of the file.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root).resolve()
+        self._lock = threading.Lock()
+        self._assets = {}
+        self.not_modified = 0
+        self.served = 0
+        self.compressed_served = 0
+
+    def resolve(self, url_path):
+        """Map a URL path to a servable file, or None"""
+        relative = url_path.split('?', 1)[0].split('#', 1)[0].lstrip('/')
+        relative = unquote(relative) or INDEX_FILE
+        path = (self.root / relative).resolve()
+        try:
+            parts = path.relative_to(self.root).parts
+        except ValueError:
+            return None
+        if any(part.startswith('.') for part in parts) or not path.is_file():
+            return None
+        suffix = path.suffix.lower()
+        if len(parts) == 1:
+            allowed = suffix in ROOT_EXTENSIONS
+        else:
+            allowed = (parts[0] in IMAGE_DIRS and suffix in IMAGE_EXTENSIONS) or \
+                (parts[0] in DATA_DIRS and suffix == '.json')
+        return path if allowed else None
+
+    def get(self, path):
+        """Up-to-date StaticAsset for a resolved path"""
+        st = path.stat()
+        with self._lock:
+            asset = self._assets.get(path)
+            if asset is not None and asset.mtime_ns == st.st_mtime_ns and asset.size == st.st_size:
+                return asset
+        asset = self._build(path, st)
+        with self._lock:
+            self._assets[path] = asset
+        return asset
+
+    def warm(self):
+        """Precompute the text assets at the root so the first page load is already compressed"""
+        count = 0
+        for path in sorted(self.root.iterdir()):
+            if path.is_file() and path.suffix.lower() in ROOT_EXTENSIONS and not path.name.startswith('.'):
+                self.get(path)
+                count += 1
+        return count
+
+    def stats(self):
+        """Counters for /api/stats"""
+        with self._lock:
+            return {
+                'files_tracked': len(self._assets),
+                'served': self.served,
+                'compressed_served': self.compressed_served,
+                'not_modified': self.not_modified,
+                'compressed_bytes_held': sum(len(body) for asset in self._assets.values()
+                                             for body in asset.variants.values()),
+            }
+
+    def count(self, status, encoding):
+        with self._lock:
+            if status == 304:
+                self.not_modified += 1
+            else:
+                self.served += 1
+                if encoding:
+                    self.compressed_served += 1
+
+    @staticmethod
+    def cache_control(path):
+        """Content-hashed files may be cached for good; everything else is revalidated"""
+        if HASHED_NAME.search(path.name):
+            return 'public, max-age=31536000, immutable'
+        return 'no-cache'
+
+    @staticmethod
+    def content_type(path):
+        if path.suffix.lower() == '.js':
+            return 'application/javascript; charset=utf-8'
+        content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/json':
+            content_type += '; charset=utf-8'
+        return content_type
+
+    @staticmethod
+    def choose_encoding(asset, accept_encoding):
+        """Best precomputed variant the client accepts (br over gzip), or None"""
+        accepted = set()
+        for item in (accept_encoding or '').split(','):
+            name, _, params = item.strip().partition(';')
+            quality = 1.0
+            if params.strip().startswith('q='):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    pass
+            if quality > 0:
+                accepted.add(name.strip().lower())
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.variants and encoding in accepted:
+                return encoding
+        return None
+
+    @staticmethod
+    def matches(asset, if_none_match):
+        """True if If-None-Match names this file in any of its encodings"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        known = {asset.etag()} | {asset.etag(encoding) for encoding in asset.variants}
+        return bool(tags & known)
+
+    def _build(self, path, st):
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        variants = {}
+        if path.suffix.lower() in COMPRESSIBLE_TYPES and len(data) > 1024:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                variants['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    variants['br'] = compressed
+        return StaticAsset(path, st.st_mtime_ns, st.st_size, digest, variants)
@@ -5,46 +5,57 @@ let answers = {};
 let currentLang = 'en';
 let translations = {};
 let diseaseTranslations = {};
+let questionIndex = null;
+let shardRequests = {};
 
 // Load questions and settings
 async function loadQuestions() {
     try {
-        const response = await fetch('nephro_questions_enhanced.json');
-        const data = await response.json();
+        const derivativesPromise = loadImageDerivatives();
+        const quizPromise = loadServerQuiz();
+        const data = await loadQuestionIndex() || await loadFullBank();
+        imageDerivatives = await derivativesPromise;
 
         translations = data.interface_translations;
         diseaseTranslations = data.disease_translations;
         allQuestions = data.questions;
 
-        // Load instructor settings
-        const settings = localStorage.getItem('questionSettings');
-        let questionSettings = {};
-
-        if (settings) {
-            questionSettings = JSON.parse(settings);
+        // A quiz assembled by the proxy, or else every active question, high priority first
+        const quiz = await quizPromise;
+        if (quiz) {
+            const byId = new Map(allQuestions.map(q => [q.id, q]));
+            activeQuestions = quiz.ids.map(id => byId.get(id)).filter(Boolean);
+        } else {
+            // Load instructor settings
+            const settings = localStorage.getItem('questionSettings');
+            let questionSettings = {};
+
+            if (settings) {
+                questionSettings = JSON.parse(settings);
+            }
+
+            // Filter to only active questions
+            activeQuestions = allQuestions.filter(q => {
+                const setting = questionSettings[q.id] || q.settings;
+                return !setting || setting.active !== false;
+            });
+
+            // Sort by priority (high priority first)
+            activeQuestions.sort((a, b) => {
+                const settingA = questionSettings[a.id] || a.settings;
+                const settingB = questionSettings[b.id] || b.settings;
+                const priorityA = settingA?.priority || 'none';
+                const priorityB = settingB?.priority || 'none';
+
+                if (priorityA === 'high' && priorityB !== 'high') return -1;
+                if (priorityA !== 'high' && priorityB === 'high') return 1;
+                if (priorityA === 'low' && priorityB === 'none') return -1;
+                if (priorityA === 'none' && priorityB === 'low') return 1;
+
+                return 0;
+            });
         }
 
-        // Filter to only active questions
-        activeQuestions = allQuestions.filter(q => {
-            const setting = questionSettings[q.id];
-            return !setting || setting.active !== false;
-        });
-
-        // Sort by priority (high priority first)
-        activeQuestions.sort((a, b) => {
-            const settingA = questionSettings[a.id];
-            const settingB = questionSettings[b.id];
-            const priorityA = settingA?.priority || 'none';
-            const priorityB = settingB?.priority || 'none';
-
-            if (priorityA === 'high' && priorityB !== 'high') return -1;
-            if (priorityA !== 'high' && priorityB === 'high') return 1;
-            if (priorityA === 'low' && priorityB === 'none') return -1;
-            if (priorityA === 'none' && priorityB === 'low') return 1;
-
-            return 0;
-        });
-
         if (activeQuestions.length === 0) {
             document.getElementById('questions-container').innerHTML =
                 '<div style="background:white;padding:50px;border-radius:15px;text-align:center;color:#666;">' +
@@ -107,6 +118,20 @@ function renderCurrentQuestion() {
 
     const container = document.getElementById('questions-container');
 
+    // Sharded bank: fetch this question's text first
+    if (!question[currentLang]) {
+        container.innerHTML =
+            '<div style="background:white;padding:50px;border-radius:15px;text-align:center;color:#666;">' +
+            '<p style="font-size:20px;">Loading...</p></div>';
+        ensureQuestionText(question, currentLang).then(renderCurrentQuestion).catch(error => {
+            console.error('Error loading question text:', error);
+            container.innerHTML =
+                '<div style="background:white;padding:50px;border-radius:15px;text-align:center;color:#f56565;">' +
+                '<p style="font-size:20px;">Error loading question</p></div>';
+        });
+        return;
+    }
+
     const answerOptions = [
         { letter: 'A', text: t('both_true_explains') },
         { letter: 'B', text: t('both_true_not_explains') },
@@ -115,7 +140,7 @@ function renderCurrentQuestion() {
         { letter: 'E', text: t('both_false') }
     ];
 
-    const correctAnswer = question.en.answer;
+    const correctAnswer = question.answer;
 
     // Build image HTML if image exists
     let imageHtml = '';
@@ -128,10 +153,10 @@ function renderCurrentQuestion() {
 
         imageHtml = `
             <div class="question-image">
-                <img src="${imagePath}"
+                ${responsiveImageHtml(imagePath, '(max-width: 900px) 100vw, 900px', `
                      alt="Medical image"
                      onclick="openLightbox('${imagePath}', '${question[currentLang].assertion}')"
-                     onerror="this.parentElement.style.display='none'">
+                     onerror="this.closest('.question-image').style.display='none'"`)}
                 <div class="zoom-hint">🔍 ${imageCaption}</div>
             </div>
         `;
@@ -196,6 +221,9 @@ function renderCurrentQuestion() {
             </div>
         </div>
     `;
+
+    // Fetch the next question's shard while this one is being read
+    ensureQuestionText(activeQuestions[currentQuestionIndex + 1], currentLang).catch(() => {});
 }
 
 function selectAnswer(questionId, answer) {
@@ -234,7 +262,7 @@ function updateProgress() {
 
     // Calculate current score
     const correct = activeQuestions.filter(q =>
-        answers[q.id] === q.en.answer
+        answers[q.id] === q.answer
     ).length;
     const scorePercentage = answered > 0 ? Math.round((correct / answered) * 100) : 0;
 
@@ -251,7 +279,7 @@ function showCompletion() {
     questionsContainer.innerHTML = '';
 
     const correct = activeQuestions.filter(q =>
-        answers[q.id] === q.en.answer
+        answers[q.id] === q.answer
     ).length;
 
     const total = activeQuestions.length;
@@ -273,6 +301,98 @@ function restartAssessment() {
     updateProgress();
 }
 
+// Quiz of the proxy's /api/quiz for this page's query (?n=20&seed=7&difficulty=...); null without the proxy
+async function loadServerQuiz() {
+    try {
+        const response = await fetch('api/quiz' + window.location.search, { cache: 'no-store' });
+        if (!response.ok) return null;
+        const quiz = await response.json();
+        console.log(`Quiz seed ${quiz.seed}: ${quiz.ids.length} of ${quiz.available} questions`);
+        return quiz;
+    } catch (error) {
+        return null;
+    }
+}
+
+// Sharded bank built by build_question_shards.py: the index now, question text on demand; null if not built
+async function loadQuestionIndex() {
+    try {
+        const response = await fetch('question_shards/index.json', { cache: 'no-cache' });
+        if (!response.ok) return null;
+        questionIndex = await response.json();
+    } catch (error) {
+        return null;
+    }
+    if (!await indexMatchesBank(questionIndex)) {
+        console.warn('Question shards are older than the bank - loading the full JSON');
+        questionIndex = null;
+        return null;
+    }
+    const columns = questionIndex.questions;
+    const questions = columns.id.map((id, i) => {
+        const question = {
+            id,
+            disease_id: columns.disease_id[i],
+            difficulty: columns.difficulty[i],
+            answer: columns.answer[i],
+            shard: columns.shard[i],
+            settings: { active: columns.active[i], priority: columns.priority[i] }
+        };
+        if (columns.image[i]) question.image = columns.image[i];
+        return question;
+    });
+    return {
+        interface_translations: questionIndex.interface_translations,
+        disease_translations: questionIndex.disease_translations,
+        questions
+    };
+}
+
+// False if the bank changed after the shards were built: the proxy's ETag for the bank file
+// no longer matches source_digest, or the edit journal was compacted past journal_seq.
+// Checks the server cannot answer (no proxy, another web server's ETags) are skipped.
+async function indexMatchesBank(index) {
+    if (index.version < 2) return false;
+    const [etag, journal] = await Promise.all([
+        fetch('nephro_questions_enhanced.json', { method: 'HEAD', cache: 'no-cache' })
+            .then(response => response.ok ? response.headers.get('ETag') : null, () => null),
+        fetch(`api/edits?since=${index.journal_seq}`, { cache: 'no-store' })
+            .then(response => response.ok ? response.json() : null).catch(() => null)
+    ]);
+    // static_assets.py ETags: "<digest>" or "<digest>-<encoding>"
+    const match = /^(?:W\/)?"([0-9a-f]{32})(?:-[a-z]+)?"$/.exec(etag || '');
+    if (match && index.source_digest && match[1] !== index.source_digest) return false;
+    if (journal && journal.base_seq !== index.journal_seq) return false;
+    return true;
+}
+
+// The whole bank in one file, for when no shards were built
+async function loadFullBank() {
+    const response = await fetch('nephro_questions_enhanced.json');
+    const data = await response.json();
+    data.questions.forEach(q => { q.answer = q.en.answer; });
+    return data;
+}
+
+// Make sure question[lang] is loaded, fetching its shard once however many questions share it
+function ensureQuestionText(question, lang) {
+    if (!question || question[lang]) return Promise.resolve();
+    const url = questionIndex.shards[lang][question.shard];
+    if (!shardRequests[url]) {
+        shardRequests[url] = fetch(url).then(response => {
+            if (!response.ok) throw new Error(`${url}: HTTP ${response.status}`);
+            return response.json();
+        }).catch(error => {
+            delete shardRequests[url];
+            throw error;
+        });
+    }
+    return shardRequests[url].then(content => {
+        if (!content[question.id]) throw new Error(`Question ${question.id} missing from ${url}`);
+        question[lang] = content[question.id];
+    });
+}
+
 // Lightbox functions for image zoom
 function openLightbox(imageSrc, caption) {
     const lightbox = document.getElementById('lightbox');
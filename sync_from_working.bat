@@ -59,6 +59,11 @@ if exist "%WORKING%\student_portal_bilingual.html" (
     echo [OK] Student portal files synced
 )
 
+if exist "%WORKING%\responsive_images.js" (
+    copy /Y "%WORKING%\responsive_images.js" "%GIT_REPO%responsive_images.js" >nul
+    echo [OK] Shared portal script synced
+)
+
 echo.
 echo ========================================
 echo SYNC COMPLETE
@@ -0,0 +1,38 @@
+import shutil
+
+from PIL import Image
+
+import build_image_derivatives
+
+
+def test_duplicate_images_build_once(tmp_path):
+    source = tmp_path / 'images'
+    source.mkdir()
+    Image.new('RGB', (400, 300), 'red').save(source / 'a.png')
+    for name in ('b.png', 'c.png', 'd.png'):
+        shutil.copy(source / 'a.png', source / name)
+    Image.new('RGB', (400, 300), 'blue').save(source / 'e.png')
+    manifest = tmp_path / 'derivatives.json'
+
+    assert build_image_derivatives.build(source, manifest, workers=4)
+    images = build_image_derivatives.load_manifest(manifest)
+    assert len(images) == 5
+    copies = [images[build_image_derivatives.site_path(source / name)] for name in ('a.png', 'b.png', 'd.png')]
+    assert copies[0]['variants'] == copies[1]['variants'] == copies[2]['variants']
+    assert not list((source / 'derived').glob('*.tmp'))
+
+def test_outputs_are_served_as_immutable(tmp_path):
+    from static_assets import HASHED_NAME
+
+    source = tmp_path / 'images'
+    source.mkdir()
+    Image.new('RGB', (700, 300), 'green').save(source / 'a.png')
+    derived = source / 'derived'
+    derived.mkdir()
+    in_flight = derived / 'other.jpg.12345.tmp'
+    in_flight.write_bytes(b'partial')
+
+    assert build_image_derivatives.build(source, tmp_path / 'derivatives.json', workers=1)
+    outputs = [path for path in derived.iterdir() if path != in_flight]
+    assert outputs and all(HASHED_NAME.search(path.name) for path in outputs)
+    assert in_flight.exists()
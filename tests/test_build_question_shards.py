@@ -0,0 +1,19 @@
+import json
+
+from build_question_shards import build, source_digest
+from static_assets import StaticAssets
+
+def test_index_identifies_its_source_bank(tmp_path):
+    document = {'metadata': {'journal_seq': 42},
+                'questions': [{'id': 1, 'disease_id': 'MCD', 'en': {'answer': 'A'}, 'lt': {}}]}
+    bank = tmp_path / 'nephro_questions_enhanced.json'
+    bank.write_text(json.dumps(document), encoding='utf-8')
+
+    build(document, tmp_path / 'question_shards', bank.name, source_digest(bank.read_bytes()))
+    index = json.loads((tmp_path / 'question_shards' / 'index.json').read_text(encoding='utf-8'))
+
+    # The portal compares source_digest with the ETag the proxy sends for the bank
+    assets = StaticAssets(tmp_path)
+    etag = assets.get(assets.resolve('/' + bank.name)).etag()
+    assert etag == f'"{index["source_digest"]}"'
+    assert index['journal_seq'] == 42
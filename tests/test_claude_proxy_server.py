@@ -0,0 +1,93 @@
+import http.client
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from claude_proxy_server import ClaudeProxyHandler, ConcurrentProxyServer
+
+MESSAGE = {'id': 'msg', 'content': [{'type': 'text', 'text': 'ok'}], 'usage': {'input_tokens': 1, 'output_tokens': 1}}
+
+START = b'event: message_start\ndata: {"type": "message_start", "message": {"usage": {"input_tokens": 5}}}\n\n'
+
+class FakeUpstream(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if request.get('stream'):
+            # Promise more than is sent, then hang up mid-stream
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Content-Length', '100000')
+            self.end_headers()
+            self.wfile.write(START)
+            return
+        body = json.dumps(MESSAGE).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class QuietProxyHandler(ClaudeProxyHandler):
+    def log_message(self, format, *args):
+        pass
+
+def serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+@pytest.fixture
+def proxy():
+    upstream = serve(HTTPServer(('127.0.0.1', 0), FakeUpstream))
+    server = serve(ConcurrentProxyServer(
+        ('127.0.0.1', 0), QuietProxyHandler, workers=2,
+        upstream_url=f'http://127.0.0.1:{upstream.server_port}/v1/messages'))
+    yield server
+    server.shutdown()
+    upstream.shutdown()
+    server.server_close()
+    upstream.server_close()
+
+def request(server, method, path, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=10)
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    connection.request(method, path, body=data, headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    return response.status, response.read()
+
+def test_batch_rejects_bad_concurrency(proxy):
+    status, _ = request(proxy, 'POST', '/api/claude/batch',
+                        {'api_key': 'k', 'requests': [{}], 'concurrency': 'many'})
+    assert status == 400
+
+def test_batch_reports_bad_items_in_stream(proxy):
+    status, body = request(proxy, 'POST', '/api/claude/batch',
+                           {'api_key': 'k', 'requests': [{'model': 'm', 'messages': []}, 'oops', 7]})
+    assert status == 200
+    lines = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+    by_index = {line['index']: line for line in lines if 'index' in line}
+    assert by_index[0]['type'] == 'result'
+    assert by_index[1]['type'] == by_index[2]['type'] == 'error'
+    assert by_index[1]['status'] == 400
+    assert lines[-1] == dict(lines[-1], type='done', succeeded=1, failed=2)
+
+def test_stream_reports_upstream_failure_in_band(proxy):
+    status, body = request(proxy, 'POST', '/api/claude',
+                           {'api_key': 'k', 'request': {'model': 'm', 'messages': [], 'stream': True}})
+    assert status == 200
+    assert body.startswith(START)
+    event, data = body[len(START):].decode('utf-8').strip().split('\n')
+    assert event == 'event: error'
+    assert json.loads(data[len('data: '):])['type'] == 'error'
+
+def test_unknown_methods_share_one_metric_label(proxy):
+    for verb in ('BREW', 'PROPFIND', 'X' * 40):
+        status, _ = request(proxy, verb, '/api/stats')
+        assert status == 501
+    methods = {method for _, method, _ in proxy.metrics.requests}
+    assert methods == {'other'}
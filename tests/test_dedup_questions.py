@@ -0,0 +1,40 @@
+import random
+
+from dedup_questions import DEFAULT_THRESHOLD, find_duplicates, jaccard, shingles
+
+LETTERS = 'abcdefghijklmnopqrstuvwxyz '
+
+def near_pairs(count, low, high, edits, seed=1):
+    """Up to `count` pairs of unrelated questions whose shingle Jaccard is in [low, high).
+
+    Each pair is a random text and a copy with `edits` characters changed;
+    generation stops after a fixed number of attempts.
+    """
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count * 20):
+        if len(pairs) == count:
+            break
+        text = ''.join(rng.choice(LETTERS) for _ in range(200))
+        edited = list(text)
+        for position in rng.sample(range(len(text)), rng.choice(edits)):
+            edited[position] = rng.choice(LETTERS.replace(text[position], ''))
+        a = {'id': 2 * len(pairs), 'en': {'assertion': text}}
+        b = {'id': 2 * len(pairs) + 1, 'en': {'assertion': ''.join(edited)}}
+        if low <= jaccard(shingles(a), shingles(b)) < high:
+            pairs.append((a, b))
+    return pairs
+
+def test_recall_just_above_threshold():
+    pairs = near_pairs(300, DEFAULT_THRESHOLD, DEFAULT_THRESHOLD + 0.05, edits=(6, 7, 8))
+    assert len(pairs) == 300
+    clusters = find_duplicates([question for pair in pairs for question in pair])
+    found = {tuple(cluster['ids']) for cluster in clusters}
+    missed = [(a['id'], b['id']) for a, b in pairs if (a['id'], b['id']) not in found]
+    # 32 bands x 4 rows: at J = 0.7 a pair is missed with probability ~0.02%
+    assert len(missed) <= 3, f'{len(missed)} of {len(pairs)} near duplicates missed'
+
+def test_pairs_below_threshold_are_not_joined():
+    pairs = near_pairs(100, 0.5, 0.65, edits=(11, 12, 13), seed=2)
+    assert len(pairs) == 100
+    assert find_duplicates([question for pair in pairs for question in pair]) == []
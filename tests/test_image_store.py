@@ -0,0 +1,18 @@
+import os
+import stat
+
+from image_store import ImageStore
+
+
+def test_ingested_images_stay_writable(tmp_path):
+    images = tmp_path / 'question_images'
+    images.mkdir()
+    (images / 'a.png').write_bytes(b'same image')
+    (images / 'b.png').write_bytes(b'same image')
+    (images / 'c.png').write_bytes(b'other image')
+    store = ImageStore(tmp_path / '.image_store', base=tmp_path)
+    store.ingest([images])
+
+    assert os.path.samefile(images / 'a.png', images / 'b.png')
+    for name in ('a.png', 'b.png', 'c.png'):
+        assert os.stat(images / name).st_mode & stat.S_IWUSR
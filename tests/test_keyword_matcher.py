@@ -0,0 +1,28 @@
+import json
+from pathlib import Path
+
+from extract_and_generate import categorize_slides, disease_keywords
+from keyword_matcher import KeywordMatcher
+
+SLIDES = Path(__file__).resolve().parent.parent / 'Textbook_LT' / 'extracted_content' / 'all_slides.json'
+
+def test_word_prefix_suffix_and_substring():
+    matcher = KeywordMatcher({'word': ['ain'], 'prefix': ['podocyte*'], 'suffix': ['*sclerosis'], 'any': ['*loop*']})
+    assert list(matcher.scores('a chain of podocytes')) == ['prefix']
+    assert list(matcher.scores('nodular glomerulosclerosis, ain')) == ['word', 'suffix']
+    assert list(matcher.scores('wire loops')) == ['any']
+
+def test_categories_match_substring_search():
+    slides = json.loads(SLIDES.read_text(encoding='utf-8'))
+    expected = {disease: [] for disease in disease_keywords}
+    expected['OTHER'] = []
+    for slide in slides:
+        text = ' '.join(slide['en_text']).lower()
+        disease = next((disease for disease, keywords in disease_keywords.items()
+                        if any(keyword in text for keyword in keywords)), None)
+        if disease:
+            expected[disease].append(slide['slide_number'])
+        elif slide['en_text']:
+            expected['OTHER'].append(slide['slide_number'])
+    assert categorize_slides(slides) == expected
+    assert 5 in expected['MCD'] and 147 in expected['MCD']
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+import merge_questions
+
+def bilingual(text, **fields):
+    return {**fields, 'en': {'assertion': text, 'reason': 'r'}, 'lt': {'assertion': text, 'reason': 'r'}}
+
+MANUAL = [bilingual('Minimal change disease shows effaced podocyte foot processes on electron microscopy', id=1),
+          bilingual('Membranous nephropathy has subepithelial immune deposits with spikes on silver stain', id=2)]
+A = 'Crescents in Bowman space are the hallmark of rapidly progressive glomerulonephritis in adults'
+B = 'Amyloid deposits show apple green birefringence under polarized light after Congo red staining'
+C = 'Diabetic nephropathy shows nodular Kimmelstiel Wilson lesions in the mesangium of glomeruli'
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'generated_questions').mkdir()
+    paths = {'EXISTING_PATH': 'bilingual.json', 'NEW_PATH': 'generated_questions/expanded.json',
+             'OUTPUT_PATH': 'enhanced.json', 'BACKUP_PATH': 'backup.json'}
+    for name, path in paths.items():
+        monkeypatch.setattr(merge_questions, name, path)
+    (tmp_path / 'bilingual.json').write_text(json.dumps({'metadata': {'created': 'now'}, 'questions': MANUAL}))
+    return tmp_path
+
+def run(workspace, generated):
+    (workspace / 'generated_questions' / 'expanded.json').write_text(json.dumps({'questions': generated}))
+    merge_questions.main()
+    return {q['en']['assertion']: q for q in json.loads((workspace / 'enhanced.json').read_text())['questions']}
+
+def test_ids_do_not_shift_when_a_duplicate_is_dropped(workspace):
+    bank = run(workspace, [bilingual(A, source_slide=10), bilingual(A + ' too', source_slide=11),
+                           bilingual(B, source_slide=12)])
+    assert A + ' too' not in bank
+    assert (bank[A]['id'], bank[B]['id']) == (3, 5)
+
+    # Dropping the duplicate from the source does not renumber anything either
+    bank = run(workspace, [bilingual(A, source_slide=10), bilingual(B, source_slide=12),
+                           bilingual(C, source_slide=13)])
+    assert (bank[A]['id'], bank[B]['id'], bank[C]['id']) == (3, 5, 6)
+
+def test_edited_assertion_keeps_id_and_bank_edits(workspace):
+    run(workspace, [bilingual(A, source_slide=10), bilingual(B, source_slide=12)])
+    enhanced = json.loads((workspace / 'enhanced.json').read_text())
+    enhanced['questions'][2]['image'] = 'question_images/crescent.png'
+    (workspace / 'enhanced.json').write_text(json.dumps(enhanced))
+
+    fixed = A.replace('Bowman', "Bowman's")
+    bank = run(workspace, [bilingual(fixed, source_slide=10), bilingual(B, source_slide=12)])
+    assert A not in bank
+    assert bank[fixed]['id'] == 3
+    assert bank[fixed]['image'] == 'question_images/crescent.png'
+    assert bank[B]['id'] == 4
+
+def test_only_changed_questions_are_checked(workspace, capsys):
+    run(workspace, [bilingual(A, source_slide=10), bilingual(A + ' too', source_slide=11),
+                    bilingual(B, source_slide=12)])
+    capsys.readouterr()
+    bank = run(workspace, [bilingual(A, source_slide=10), bilingual(A + ' too', source_slide=11),
+                           bilingual(B, source_slide=12), bilingual(C, source_slide=13)])
+    assert 'Checked 1 new or changed questions' in capsys.readouterr().out
+    assert A + ' too' not in bank
+    assert bank[C]['id'] == 6
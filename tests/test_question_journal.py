@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import question_journal
+from question_journal import QuestionJournal
+
+
+def write_bank(path, questions, **metadata):
+    path.write_text(json.dumps({'metadata': metadata, 'questions': questions}), encoding='utf-8')
+
+def question(qid, text='Q'):
+    return {'id': qid, 'en': {'question': text}, 'lt': {'question': text}}
+
+@pytest.fixture
+def bank(tmp_path):
+    path = tmp_path / 'bank.json'
+    write_bank(path, [question(1), question(2)])
+    return path
+
+def load(path):
+    return json.loads(path.read_text(encoding='utf-8'))
+
+def test_edit_in_queue_survives_external_rewrite(bank, monkeypatch):
+    journal = QuestionJournal(bank, background=False)
+    release = threading.Event()
+    write_batch = journal._write_batch
+
+    def slow_write(batch):
+        release.wait(5)
+        return write_batch(batch)
+
+    monkeypatch.setattr(journal, '_write_batch', slow_write)
+    submitted = threading.Thread(target=journal.submit,
+                                 args=([{'op': 'set', 'id': 1, 'field': 'en.question', 'value': 'edited'}],))
+    submitted.start()
+    while journal.seq == 0:
+        time.sleep(0.01)
+    # Not on disk yet: not listed
+    assert journal.since(0)['edits'] == []
+
+    # Another tool rewrites the bank while the edit waits for the writer
+    time.sleep(0.01)
+    write_bank(bank, [question(1), question(2), question(3, 'merged')])
+    compacted = []
+    compaction = threading.Thread(target=lambda: compacted.append(journal.compact()))
+    compaction.start()
+    time.sleep(0.1)
+    release.set()
+    submitted.join()
+    compaction.join()
+
+    assert compacted == [True]
+    document = load(bank)
+    assert document['metadata']['journal_seq'] == 1
+    assert [q['en']['question'] for q in document['questions']] == ['edited', 'Q', 'merged']
+    assert journal._by_id[1]['en']['question'] == 'edited'
+    assert journal.since(0)['reload'] is True
+    journal.close()
+
+def test_rebase_keeps_durable_edits(bank):
+    journal = QuestionJournal(bank, background=False)
+    journal.submit([{'op': 'set', 'id': 2, 'field': 'settings.priority', 'value': 'high'}])
+    time.sleep(0.01)
+    write_bank(bank, [question(1), question(2), question(3, 'merged')])
+    assert journal.compact() is True
+    document = load(bank)
+    assert len(document['questions']) == 3
+    assert document['question_settings']['2']['priority'] == 'high'
+    journal.close()
+
+def test_failed_write_is_rolled_back(bank, monkeypatch):
+    journal = QuestionJournal(bank, background=False)
+    journal.submit([{'op': 'set', 'id': 1, 'field': 'en.question', 'value': 'kept'}])
+
+    def failing_fsync(fd):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(question_journal.os, 'fsync', failing_fsync)
+    with pytest.raises(OSError):
+        journal.submit([{'op': 'set', 'id': 2, 'field': 'en.question', 'value': 'lost'}])
+    monkeypatch.undo()
+
+    assert journal._by_id[2]['en']['question'] == 'Q'
+    assert [edit['value'] for edit in journal.since(0)['edits']] == ['kept']
+    assert journal.compact() is True
+    assert [q['en']['question'] for q in load(bank)['questions']] == ['kept', 'Q']
+
+    # The journal keeps working after the failure
+    results = journal.submit([{'op': 'set', 'id': 2, 'field': 'en.question', 'value': 'again'}])
+    assert 'error' not in results[0]
+    journal.close()
+    assert [q['en']['question'] for q in load(bank)['questions']] == ['kept', 'again']
+
+def test_add_is_kept_when_bank_reuses_its_id(bank):
+    journal = QuestionJournal(bank, background=False)
+    results = journal.submit([{'op': 'add', 'question': question(3, 'ours')},
+                              {'op': 'set', 'id': 3, 'field': 'difficulty', 'value': 'hard'}])
+    assert results[0]['seq'] == 1
+    time.sleep(0.01)
+    # Another tool adds its own question 3
+    write_bank(bank, [question(1), question(2), question(3, 'theirs')])
+    assert journal.compact() is True
+    questions = load(bank)['questions']
+    assert [(q['id'], q['en']['question']) for q in questions] == [(1, 'Q'), (2, 'Q'), (3, 'theirs'), (4, 'ours')]
+    assert questions[3]['difficulty'] == 'hard'
+    assert 'difficulty' not in questions[2]
+    journal.close()
+
+def test_add_already_in_rewritten_bank_is_not_duplicated(bank):
+    journal = QuestionJournal(bank, background=False)
+    journal.submit([{'op': 'add', 'question': question(3, 'ours')},
+                    {'op': 'set', 'id': 3, 'field': 'en.question', 'value': 'ours, edited'}])
+    time.sleep(0.01)
+    # A portal export of the current bank, edits included
+    write_bank(bank, journal.document['questions'])
+    assert journal.compact() is True
+    assert [q['en']['question'] for q in load(bank)['questions']] == ['Q', 'Q', 'ours, edited']
+    journal.close()
+
+def test_restart_replays_journal(bank):
+    journal = QuestionJournal(bank, background=False)
+    journal.submit([{'op': 'set', 'id': 1, 'field': 'en.question', 'value': 'first'}])
+    journal.submit([{'op': 'add', 'question': question(3, 'added')}])
+    # Crash: the bank was never compacted, and the last write was torn
+    with open(journal.journal_path, 'ab') as f:
+        f.write(b'{"op": "set", "id": 2, "fie')
+    assert load(bank)['metadata'] == {}
+
+    restarted = QuestionJournal(bank, background=False)
+    assert restarted.seq == 2
+    assert restarted._by_id[1]['en']['question'] == 'first'
+    assert restarted._by_id[3]['en']['question'] == 'added'
+    assert [edit['seq'] for edit in restarted.since(0)['edits']] == [1, 2]
+    restarted.close()
+    document = load(bank)
+    assert document['metadata']['journal_seq'] == 2
+    assert [q['en']['question'] for q in document['questions']] == ['first', 'Q', 'added']
+
+def test_restart_during_compaction(bank):
+    journal = QuestionJournal(bank, background=False)
+    journal.submit([{'op': 'set', 'id': 1, 'field': 'en.question', 'value': 'moved aside'}])
+    # Crash after the journal was rotated but before the bank was written
+    os.replace(journal.journal_path, journal.compacting_path)
+    journal.journal_path.touch()
+
+    restarted = QuestionJournal(bank, background=False)
+    assert restarted._by_id[1]['en']['question'] == 'moved aside'
+    restarted.submit([{'op': 'set', 'id': 2, 'field': 'en.question', 'value': 'after'}])
+    restarted.close()
+    assert [q['en']['question'] for q in load(bank)['questions']] == ['moved aside', 'after']
+    assert not restarted.compacting_path.exists()
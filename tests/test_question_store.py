@@ -0,0 +1,37 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from question_store import QuestionStore, dumps
+
+root = Path(__file__).resolve().parent.parent
+
+def question_banks():
+    banks = []
+    for path in sorted(root.glob('**/*.json')):
+        try:
+            document = json.loads(path.read_text(encoding='utf-8'))
+        except ValueError:
+            continue
+        if isinstance(document, dict) and isinstance(document.get('questions'), list):
+            banks.append(path)
+    return banks
+
+@pytest.mark.parametrize('path', question_banks(), ids=lambda path: path.relative_to(root).as_posix())
+def test_round_trip(path, tmp_path):
+    document = json.loads(path.read_text(encoding='utf-8'))
+    store = QuestionStore(tmp_path / 'bank.db')
+    store.import_json(document)
+    assert dumps(store.export_json()) == dumps(document)
+    store.close()
+
+def test_questions_without_id_are_numbered(tmp_path):
+    document = {'questions': [{'id': 7, 'assertion': 'a'}, {'assertion': 'b'}, {'assertion': 'c'}]}
+    store = QuestionStore(tmp_path / 'bank.db')
+    store.import_json(document)
+    assert store.get(8) == {'assertion': 'b'}
+    assert store.get(9) == {'assertion': 'c'}
+    assert store.upsert({'assertion': 'd'}) == 10
+    assert store.export_json()['questions'][-1] == {'assertion': 'd'}
+    store.close()
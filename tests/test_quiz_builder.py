@@ -0,0 +1,37 @@
+import pytest
+
+from quiz_builder import QuizBank, split_images
+
+MIX = {'easy': 0.3, 'medium': 0.5, 'hard': 0.2}
+
+@pytest.fixture(scope='module')
+def bank():
+    return QuizBank.load()
+
+@pytest.mark.parametrize('seed', range(10))
+def test_image_ratio_is_met(bank, seed):
+    quiz = bank.build(count=30, image_ratio=0.5, seed=seed)
+    assert len(quiz['ids']) == 30
+    assert quiz['summary']['image'] == 15
+
+@pytest.mark.parametrize('seed', range(10))
+def test_difficulty_mix_and_image_ratio_are_met_together(bank, seed):
+    quiz = bank.build(count=30, image_ratio=0.5, difficulty_mix=MIX, seed=seed)
+    assert quiz['summary']['image'] == 15
+    assert quiz['summary']['difficulty'] == {'easy': 9, 'hard': 6, 'medium': 15}
+    # Coverage still comes first
+    assert len(quiz['summary']['disease']) == len({key[0] for key in bank.buckets})
+
+def test_ratio_is_capped_by_the_bank(bank):
+    available = sum(len(ids) for key, ids in bank.buckets.items() if key[2])
+    quiz = bank.build(count=100, image_ratio=0.9, seed=1)
+    assert quiz['summary']['image'] == available
+    assert len(set(quiz['ids'])) == 100
+
+def test_split_images_meets_both_targets():
+    capacities = {('easy', False): 8, ('easy', True): 3, ('medium', False): 63, ('medium', True): 25,
+                  ('hard', False): 2, ('hard', True): 9}
+    split = split_images({'easy': 9, 'medium': 15, 'hard': 6}, 15, capacities)
+    assert sum(split.values()) == 15
+    assert split['easy'] >= 1 and split['hard'] >= 4
+    assert all(split[name] <= capacities[(name, True)] for name in split)
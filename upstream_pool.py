@@ -0,0 +1,175 @@
+"""
+Keep-alive connection pool for the proxy's upstream calls
+Keeps a few warm HTTP/1.1 connections per host so repeated calls to the
+Messages API skip DNS, TCP and TLS setup.
+"""
+
+import http.client
+import select
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# Errors that mean a pooled socket was closed by the other side while idle
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+)
+
+class UpstreamPool:
+    """Pool of idle keep-alive connections, keyed by (scheme, host, port).
+
+    At most `max_per_host` idle connections are kept per host; extra
+    connections opened under load are closed when they are returned.
+    Connections idle for longer than `idle_timeout` seconds, or whose socket
+    has been closed by the server, are evicted instead of reused.
+    """
+
+    def __init__(self, max_per_host=8, idle_timeout=30.0, timeout=300.0):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.stale_retries = 0
+
+    def request(self, method, url, body=None, headers=None):
+        """Send a request over a pooled connection and read the whole response.
+
+        Returns (status, headers, body). If a reused connection turns out to
+        be dead, it is dropped and the request is sent once more on a fresh one.
+        """
+        key, conn, response = self._open(method, url, body, headers)
+        try:
+            data = response.read()
+        except Exception:
+            conn.close()
+            raise
+        self._release(key, conn, response)
+        return response.status, response.getheaders(), data
+
+    @contextmanager
+    def stream(self, method, url, body=None, headers=None):
+        """Send a request and yield the unread http.client response.
+
+        The caller reads the body incrementally (e.g. with read1). The
+        connection goes back to the pool only if the body was read to the
+        end; otherwise it is closed.
+        """
+        key, conn, response = self._open(method, url, body, headers)
+        try:
+            yield response
+        except BaseException:
+            conn.close()
+            raise
+        if response.isclosed():
+            self._release(key, conn, response)
+        else:
+            conn.close()
+
+    def stats(self):
+        """Counters for /api/stats"""
+        with self._lock:
+            idle = sum(len(conns) for conns in self._idle.values())
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evicted': self.evicted,
+                'stale_retries': self.stale_retries,
+                'idle_connections': idle,
+            }
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            conns = [conn for idle in self._idle.values() for conn, _ in idle]
+            self._idle.clear()
+        for conn in conns:
+            conn.close()
+
+    def _split(self, url):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        return (parts.scheme, parts.hostname, port), path
+
+    def _open(self, method, url, body, headers):
+        key, path = self._split(url)
+        conn, reused = self._acquire(key)
+        try:
+            response = self._send(conn, method, path, body, headers)
+        except STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+            with self._lock:
+                self.stale_retries += 1
+            conn = self._connect(key)
+            response = self._send(conn, method, path, body, headers)
+        return key, conn, response
+
+    def _send(self, conn, method, path, body, headers):
+        conn.request(method, path, body=body, headers=headers or {})
+        return conn.getresponse()
+
+    def _connect(self, key):
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _acquire(self, key):
+        now = time.monotonic()
+        discard = []
+        conn = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                candidate, last_used = idle.pop()
+                if now - last_used > self.idle_timeout or not self._is_alive(candidate):
+                    discard.append(candidate)
+                    self.evicted += 1
+                    continue
+                conn = candidate
+                break
+            if conn is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        for stale in discard:
+            stale.close()
+        if conn is not None:
+            return conn, True
+        return self._connect(key), False
+
+    def _release(self, key, conn, response):
+        if response.will_close or conn.sock is None:
+            conn.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_per_host:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    @staticmethod
+    def _is_alive(conn):
+        # An idle keep-alive socket should have nothing to read; if it is
+        # readable the server has closed it (or sent junk) and it can't be reused
+        if conn.sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable